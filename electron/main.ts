@@ -298,8 +298,12 @@ ipcMain.handle('dialog:openFile', async () => {
   return result.filePaths[0]
 })
 
-// 智能扫描疑似标题（scan_headings）
-ipcMain.handle('document:scan_headings', async (_event, inputPath: string, baseFontSize: number = 16) => {
+// 智能扫描疑似标题（scan_headings --ndjson）
+// 每识别出一个段落，Python 输出一行 {"type": "paragraph", ...} 记录，最后输出一行 {"type": "summary", ...} 汇总。
+// 记录逐条通过 document:scan_headings:record 转发给渲染进程，扫描结束后以 {success, structure, total, hasMore, ...} 返回。
+// page.offset / page.limit 分页，只返回 structure 中第 offset 项起的 limit 项
+ipcMain.handle('document:scan_headings', async (event, inputPath: string, baseFontSize: number = 16,
+  page: { offset?: number; limit?: number } = {}) => {
   return new Promise((resolve, reject) => {
     let formatterPath: string
     if (isDev) {
@@ -312,30 +316,65 @@ ipcMain.handle('document:scan_headings', async (_event, inputPath: string, baseF
       const exeName = process.platform === 'win32' ? 'formatter.exe' : 'formatter'
       formatterPath = path.join(process.resourcesPath, 'scripts', exeName)
     }
-    const args = ['scan_headings', inputPath, String(baseFontSize)]
+    const args = ['scan_headings', inputPath, String(baseFontSize), '--ndjson']
+    if (page.offset) args.push(`--offset=${page.offset}`)
+    if (page.limit != null) args.push(`--limit=${page.limit}`)
     const proc = spawn(formatterPath, args)
-    let stdoutData = ''
+    const structure: any[] = []
+    let summary: any = null
+    let pending = ''
     let stderrData = ''
-    proc.stdout.on('data', (data) => {
-      stdoutData += data.toString('utf8')
+
+    const handleLine = (line: string) => {
+      if (!line.trim()) return
+      let record: any
+      try {
+        record = JSON.parse(line)
+      } catch (e) {
+        console.warn('[scan_headings] 无法解析的输出行:', line)
+        return
+      }
+      if (record.type === 'paragraph') {
+        delete record.type
+        structure.push(record)
+        if (!event.sender.isDestroyed()) {
+          event.sender.send('document:scan_headings:record', record)
+        }
+      } else if (record.type === 'summary') {
+        summary = record
+      }
+    }
+
+    // 按行切分；setEncoding 保证多字节字符不会在 chunk 边界被截断
+    proc.stdout.setEncoding('utf8')
+    proc.stdout.on('data', (data: string) => {
+      pending += data
+      const lines = pending.split('\n')
+      pending = lines.pop() || ''
+      lines.forEach(handleLine)
     })
     proc.stderr.on('data', (data) => {
       stderrData += data.toString('utf8')
     })
     proc.on('close', (code) => {
-      console.log('[scan_headings] exit code:', code)
-      console.log('[scan_headings] stdout:', stdoutData)
-      console.log('[scan_headings] stderr:', stderrData)
-
-      if (code === 0) {
-        try {
-          const result = JSON.parse(stdoutData)
-          resolve(result)
-        } catch (e) {
-          reject(new Error(`Python返回内容解析失败: ${(e as Error).message}\nstdout: ${stdoutData}\nstderr: ${stderrData}`))
-        }
+      handleLine(pending)
+      pending = ''
+      console.log('[scan_headings] exit code:', code, 'records:', structure.length)
+      if (stderrData) console.log('[scan_headings] stderr:', stderrData)
+
+      if (!summary) {
+        reject(new Error('扫描失败: ' + (stderrData || `未收到扫描汇总（退出码 ${code}）`)))
+      } else if (!summary.success) {
+        reject(new Error('扫描失败: ' + (summary.error || stderrData)))
       } else {
-        reject(new Error('扫描失败: ' + (stderrData || stdoutData)))
+        resolve({
+          success: true,
+          structure,
+          total: summary.total,
+          offset: summary.offset,
+          limit: summary.limit,
+          hasMore: summary.hasMore
+        })
       }
     })
     proc.on('error', (error) => {
@@ -344,6 +383,28 @@ ipcMain.handle('document:scan_headings', async (_event, inputPath: string, baseF
   })
 })
 
+// 把 {段落索引: 样式键} 压缩为区间形式 {ranges: [[起始, 结束, 样式键], ...]}，body 段落省略，其余键原样保留
+function encodeMappingRanges(mappings: Record<string, string>) {
+  const encoded: Record<string, any> = {}
+  const indexed: [number, string][] = []
+  for (const [key, styleKey] of Object.entries(mappings)) {
+    if (/^\d+$/.test(key)) {
+      if (styleKey !== 'body') indexed.push([Number(key), styleKey])
+    } else {
+      encoded[key] = styleKey
+    }
+  }
+  indexed.sort((a, b) => a[0] - b[0])
+  const ranges: [number, number, string][] = []
+  for (const [index, styleKey] of indexed) {
+    const last = ranges[ranges.length - 1]
+    if (last && last[1] === index - 1 && last[2] === styleKey) last[1] = index
+    else ranges.push([index, index, styleKey])
+  }
+  encoded.ranges = ranges
+  return encoded
+}
+
 // 格式化文档（支持 mappings 纠偏）
 ipcMain.handle('document:format', async (_event, inputPath: string, payload: { profile: any, mappings: Record<string, string> }) => {
   return new Promise(async (resolve, reject) => {
@@ -371,11 +432,16 @@ ipcMain.handle('document:format', async (_event, inputPath: string, payload: { p
       const exeName = process.platform === 'win32' ? 'formatter.exe' : 'formatter'
       formatterPath = path.join(process.resourcesPath, 'scripts', exeName)
     }
-    // 新参数格式：['format', inputPath, desiredOutputPath, JSON.stringify(payload)]
-    const args = ['format', inputPath, desiredOutputPath, JSON.stringify(payload)]
+    // 参数格式：['format', inputPath, desiredOutputPath, '-']，payload 从标准输入传入（长文档的 payload 会超出命令行长度限制）
+    const args = ['format', inputPath, desiredOutputPath, '-']
     const proc = spawn(formatterPath, args, {
       env: { ...process.env, PYTHONIOENCODING: 'utf-8' }
     })
+    // 进程未能启动或在读取 stdin 之前退出时写入会产生 EPIPE，作为格式化失败返回，不能成为主进程未处理的 error 事件
+    proc.stdin.on('error', (error) => {
+      reject(new Error('无法向格式化程序传递参数: ' + error.message))
+    })
+    proc.stdin.end(JSON.stringify({ ...payload, mappings: encodeMappingRanges(payload.mappings || {}) }), 'utf8')
     let stdoutData = ''
     let stderrData = ''
     proc.stdout.on('data', (data) => {
@@ -6,7 +6,13 @@ const safeIpcInvoke = (channel, ...args) => ipcRenderer.invoke(channel, ...args)
 
 const api = Object.freeze({
   openFile: () => safeIpcInvoke('dialog:openFile'),
-  scanHeadings: (inputPath, baseFontSize) => safeIpcInvoke('document:scan_headings', inputPath, baseFontSize),
+  scanHeadings: (inputPath, baseFontSize, page) => safeIpcInvoke('document:scan_headings', inputPath, baseFontSize, page),
+  // 扫描过程中逐条收到的段落记录，返回取消订阅的函数
+  onScanRecord: (callback) => {
+    const listener = (_event, record) => callback(record)
+    ipcRenderer.on('document:scan_headings:record', listener)
+    return () => { ipcRenderer.removeListener('document:scan_headings:record', listener) }
+  },
   formatDocument: (inputPath, payload) => safeIpcInvoke('document:format', inputPath, payload),
   saveProfiles: (profiles) => safeIpcInvoke('store:saveProfiles', profiles),
   loadProfiles: () => safeIpcInvoke('store:loadProfiles'),
@@ -6,7 +6,14 @@ const safeInvoke = (channel: string, ...args: any[]) => ipcRenderer.invoke(chann
 
 const api = Object.freeze({
   openFile: () => safeInvoke('dialog:openFile'),
-  scanHeadings: (inputPath: string, baseFontSize?: number) => safeInvoke('document:scan_headings', inputPath, baseFontSize),
+  scanHeadings: (inputPath: string, baseFontSize?: number, page?: { offset?: number; limit?: number }) =>
+    safeInvoke('document:scan_headings', inputPath, baseFontSize, page),
+  // 扫描过程中逐条收到的段落记录，返回取消订阅的函数
+  onScanRecord: (callback: (record: any) => void) => {
+    const listener = (_event: any, record: any) => callback(record)
+    ipcRenderer.on('document:scan_headings:record', listener)
+    return () => { ipcRenderer.removeListener('document:scan_headings:record', listener) }
+  },
   formatDocument: (inputPath: string, payload: any) => safeInvoke('document:format', inputPath, payload),
   saveProfiles: (profiles: any[]) => safeInvoke('store:saveProfiles', profiles),
   loadProfiles: () => safeInvoke('store:loadProfiles'),
@@ -0,0 +1,153 @@
+"""
+批量并行格式化
+在多个子进程中并行执行格式化任务，每个任务完成后立即回调结果。
+
+每个子进程通过独立的管道接收任务，因此单个任务超时或崩溃时只需终止并替换对应的子进程，
+其余任务不受影响。
+"""
+import multiprocessing
+import os
+import time
+import traceback
+from multiprocessing.connection import wait
+from typing import Callable, Dict, List, Optional
+
+
+def default_workers(job_count: int) -> int:
+    """默认并行度：CPU 核数，且不超过任务数"""
+    return max(1, min(os.cpu_count() or 1, job_count))
+
+
+def _worker_loop(conn, job_fn):
+    """子进程主循环：接收 (index, kwargs)，执行 job_fn(**kwargs)，回传 (index, result)"""
+    while True:
+        try:
+            message = conn.recv()
+        except (EOFError, KeyboardInterrupt):
+            break
+        if message is None:
+            break
+        index, kwargs = message
+        try:
+            result = job_fn(**kwargs)
+        except Exception as e:
+            traceback.print_exc()
+            result = {"success": False, "error": str(e)}
+        conn.send((index, result))
+    conn.close()
+
+
+class _Slot:
+    """一个子进程及其当前任务"""
+
+    def __init__(self, ctx, job_fn):
+        self.conn, child_conn = ctx.Pipe()
+        self.process = ctx.Process(target=_worker_loop, args=(child_conn, job_fn), daemon=True)
+        self.process.start()
+        child_conn.close()
+        self.index = None
+        self.started = 0.0
+
+    def assign(self, index: int, kwargs: Dict) -> None:
+        self.index = index
+        self.started = time.perf_counter()
+        self.conn.send((index, kwargs))
+
+    def stop(self) -> None:
+        try:
+            self.conn.send(None)
+        except (OSError, ValueError):
+            pass
+        self.process.join(timeout=1)
+        self.kill()
+
+    def kill(self) -> None:
+        if self.process.is_alive():
+            self.process.terminate()
+            self.process.join(timeout=1)
+        try:
+            self.conn.close()
+        except OSError:
+            pass
+
+
+def run_batch(jobs: List[Dict], job_fn: Callable[..., Dict], on_result: Callable[[int, Dict], None],
+              workers: Optional[int] = None, timeout: Optional[float] = None) -> Dict:
+    """
+    并行执行一组任务
+
+    Args:
+        jobs: 任务参数列表，每项作为关键字参数传给 job_fn
+        job_fn: 模块级函数（需可被子进程导入），返回结果字典
+        on_result: 每个任务结束时调用 on_result(index, result)，按完成顺序而非提交顺序
+        workers: 子进程数量，默认为 CPU 核数
+        timeout: 单个任务的超时时间（秒），超时的子进程会被终止并替换
+
+    Returns:
+        统计信息: {"total", "succeeded", "failed", "timedOut", "workers"}
+    """
+    stats = {"total": len(jobs), "succeeded": 0, "failed": 0, "timedOut": 0, "workers": 0}
+    if not jobs:
+        return stats
+
+    workers = workers or default_workers(len(jobs))
+    workers = max(1, min(workers, len(jobs)))
+    stats["workers"] = workers
+
+    def finish(index: int, result: Dict, elapsed: float) -> None:
+        result = dict(result) if isinstance(result, dict) else {"success": False, "error": "任务返回值无效"}
+        result["elapsedMs"] = round(elapsed * 1000, 1)
+        if result.get("success"):
+            stats["succeeded"] += 1
+        else:
+            stats["failed"] += 1
+        on_result(index, result)
+
+    ctx = multiprocessing.get_context()
+    pending = list(enumerate(jobs))
+    pending.reverse()
+    slots = [_Slot(ctx, job_fn) for _ in range(workers)]
+    try:
+        while True:
+            # 为空闲子进程分配任务
+            for slot in slots:
+                if slot.index is None and pending:
+                    index, kwargs = pending.pop()
+                    slot.assign(index, kwargs)
+            busy = [slot for slot in slots if slot.index is not None]
+            if not busy:
+                break
+
+            wait_timeout = None
+            if timeout:
+                now = time.perf_counter()
+                wait_timeout = max(0.0, min(slot.started + timeout for slot in busy) - now)
+            ready = wait([slot.conn for slot in busy], timeout=wait_timeout)
+
+            for i, slot in enumerate(slots):
+                if slot.index is None:
+                    continue
+                elapsed = time.perf_counter() - slot.started
+                if slot.conn in ready:
+                    try:
+                        _, result = slot.conn.recv()
+                    except (EOFError, OSError):
+                        # 子进程异常退出（如解析器崩溃），替换后继续
+                        index = slot.index
+                        slot.kill()
+                        slots[i] = _Slot(ctx, job_fn)
+                        finish(index, {"success": False, "error": "格式化进程异常退出"}, elapsed)
+                        continue
+                    index = slot.index
+                    slot.index = None
+                    finish(index, result, elapsed)
+                elif timeout and elapsed >= timeout:
+                    index = slot.index
+                    slot.kill()
+                    slots[i] = _Slot(ctx, job_fn)
+                    stats["timedOut"] += 1
+                    finish(index, {"success": False, "error": f"处理超时（超过 {timeout} 秒）", "timedOut": True}, elapsed)
+    finally:
+        for slot in slots:
+            slot.stop()
+    return stats
@@ -0,0 +1,4 @@
+"""
+性能基准
+各脚本可以直接运行: python benchmarks/bench_cleaner.py
+"""
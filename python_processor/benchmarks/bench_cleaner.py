@@ -0,0 +1,109 @@
+"""
+ManualNumberingCleaner 微基准：逐段 detect / 批量 detect_many 与原逐模式实现对比（段落/秒）
+
+用法: python benchmarks/bench_cleaner.py [--count=200000] [--repeat=3]
+运行前先核对三种实现在语料上的结果完全一致。
+"""
+import os
+import random
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from cleaner import ManualNumberingCleaner
+
+# 语料：各类编号、熔断保护触发的情况与普通正文
+SAMPLES = [
+    "1.1 项目建设目标", "2. 项目范围", "3.2.1 详细设计说明", "一、总体要求", "第二章 技术方案", "十二，补充条款",
+    "(1) 需求分析", "（一）实施步骤", "【3】参考资料", "[二] 附录", "2025. 年度规划", "10kg 重量标准",
+    "5 mm 螺栓", "7. %增长", "12. 年度总结", "123456789012345. 超长编号", "正常文本无编号",
+    "这是正文段落，包含 English words 与数字 123，用于格式化流程验证。", "1. A", "", "   ", "第三条、保密义务",
+    "１２. 全角数字", "4.Hello World", "（12）GB 存储", "六、 关于进一步加强管理的通知",
+]
+
+
+def legacy_detect(text):
+    """改造前的 detect：依次尝试三个模式"""
+    if not text or not isinstance(text, str):
+        return None
+    text = text.strip()
+    if not text:
+        return None
+    for pattern_type, pattern in ManualNumberingCleaner.PATTERNS.items():
+        match = pattern.match(text)
+        if match:
+            raw_match = match.group(1) if match.lastindex >= 1 else match.group(0)
+            clean_text = text[match.end():].strip()
+            if len(raw_match) > 15:
+                continue
+            if pattern_type == 'arabic':
+                first_num_match = re.match(r'^(\d+)', raw_match)
+                if first_num_match and int(first_num_match.group(1)) > 50:
+                    continue
+            if clean_text:
+                clean_lower = clean_text.lower()
+                if any(clean_lower.startswith(unit.lower()) for unit in ManualNumberingCleaner.UNIT_KEYWORDS):
+                    continue
+            if not clean_text or len(clean_text) < 2:
+                continue
+            return {'type': pattern_type, 'raw_match': raw_match, 'clean_text': clean_text}
+    return None
+
+
+def build_corpus(count, seed=0):
+    rng = random.Random(seed)
+    alphabet = "0123456789.．、，,()（）【】[]第章节条一二三四五六七八九十百 kgmcG%年月日时分秒TBabcXYZ项目建设"
+    corpus = []
+    for _ in range(count):
+        if rng.random() < 0.8:
+            corpus.append(rng.choice(SAMPLES))
+        else:
+            # 随机拼接的文本，覆盖各模式的边界情况
+            corpus.append(''.join(rng.choice(alphabet) for _ in range(rng.randint(0, 12))))
+    return corpus
+
+
+def best_of(repeat, fn):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    options = dict(arg[2:].partition('=')[::2] for arg in sys.argv[1:] if arg.startswith('--'))
+    count = int(options.get('count', 200000))
+    repeat = int(options.get('repeat', 3))
+    corpus = build_corpus(count)
+    cleaner = ManualNumberingCleaner()
+
+    expected = [legacy_detect(text) for text in corpus]
+    single = [cleaner.detect(text) for text in corpus]
+    columns = cleaner.detect_many(corpus)
+    batched = [None] * len(corpus)
+    for i, position in enumerate(columns['index']):
+        batched[position] = {'type': columns['type'][i], 'raw_match': columns['raw_match'][i],
+                             'clean_text': columns['clean_text'][i]}
+    if single != expected or batched != expected:
+        print("✗ 结果与原实现不一致")
+        return 1
+    print(f"✓ {count} 段结果与原实现一致（检测到编号 {len(columns['index'])} 段）")
+
+    timings = {
+        "原实现 detect": best_of(repeat, lambda: [legacy_detect(text) for text in corpus]),
+        "detect": best_of(repeat, lambda: [cleaner.detect(text) for text in corpus]),
+        "detect_many": best_of(repeat, lambda: cleaner.detect_many(corpus)),
+    }
+    baseline = timings["原实现 detect"]
+    for name, elapsed in timings.items():
+        print(f"{name:<14} {count / elapsed:>12,.0f} 段/秒  {baseline / elapsed:5.2f}x")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,103 @@
+"""
+单个大文档的并行格式化基准
+
+生成合成文档（见 synthetic.py），先用流式引擎逐段格式化一次作为对照，再以 parallelWorkers=2/4/8 分块并行格式化，
+记录耗时与相对逐段处理的加速比，并核对并行输出与逐段输出逐字节相同。规范开启自动编号与全部特殊规则。
+
+用法:
+    python benchmarks/bench_parallel.py [--size=20000] [--workers=2,4,8] [--seed=0] [--repeat=1] [--workdir=目录]
+
+加速比受 CPU 核数限制（结果中输出本机核数）；主进程的解析、序列化与压缩不能并行，文档越大、
+逐段处理的开销（特殊规则、run 数量）越大，加速比越接近子进程数。
+"""
+import filecmp
+import json
+import os
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+sys.path.insert(0, BENCH_DIR)
+
+from bench_scaling import ALL_RULES, STYLES
+from formatter import format_document, parse_cli_args
+from synthetic import generate
+
+DEFAULT_SIZE = 20000
+DEFAULT_WORKERS = (2, 4, 8)
+
+NUMBERING = {
+    "heading1": {"enabled": True, "counterType": "一", "prefix": "第", "suffix": "章"},
+    "heading2": {"enabled": True, "counterType": "1", "cascade": True, "separator": "."},
+}
+PROFILE = {
+    "styles": dict(STYLES, **{key: dict(STYLES[key], numbering=config) for key, config in NUMBERING.items()}),
+    "specialRules": ALL_RULES,
+}
+
+
+def _timed(input_path, output_path, mappings, options, repeat):
+    """格式化 repeat 次，返回最短耗时（毫秒）与最后一次的结果"""
+    best = None
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = format_document(input_path, PROFILE, output_path, mappings, options=dict(options, outputCache=False))
+        elapsed = (time.perf_counter() - start) * 1000
+        if not result.get("success"):
+            return None, result
+        best = elapsed if best is None else min(best, elapsed)
+    return round(best, 1), result
+
+
+def main():
+    _, options = parse_cli_args(sys.argv[1:])
+    size = int(options.get('size', DEFAULT_SIZE))
+    workers_list = [int(n) for n in options['workers'].split(',')] if 'workers' in options else list(DEFAULT_WORKERS)
+    seed = int(options.get('seed', 0))
+    repeat = int(options.get('repeat', 1))
+    workdir = options.get('workdir') or os.path.join(tempfile.gettempdir(), 'document-formatter-bench')
+    os.makedirs(workdir, exist_ok=True)
+
+    input_path = os.path.join(workdir, f"parallel-{size}-{seed}.docx")
+    mappings_path = input_path[:-5] + ".json"
+    if not (os.path.exists(input_path) and os.path.exists(mappings_path)):
+        info = generate(input_path, size, seed=seed)
+        with open(mappings_path, 'w', encoding='utf-8') as f:
+            json.dump({"paragraphs": info["paragraphs"], "mappings": info["mappings"]}, f)
+    with open(mappings_path, 'r', encoding='utf-8') as f:
+        info = json.load(f)
+    mappings = info["mappings"]
+
+    sequential_path = input_path[:-5] + ".sequential.out.docx"
+    parallel_path = input_path[:-5] + ".parallel.out.docx"
+    print(f"{info['paragraphs']} 段落，CPU 核数 {os.cpu_count()}")
+    print(f"{'子进程数':<10}{'块数':>8}{'耗时(ms)':>12}{'加速比':>10}{'输出一致':>10}")
+    baseline, result = _timed(input_path, sequential_path, mappings, {"engine": "stream"}, repeat)
+    if baseline is None:
+        print(f"逐段格式化失败: {result.get('error')}")
+        return 1
+    print(f"{1:<10}{'-':>8}{baseline:>12.1f}{1:>10.2f}{'-':>10}", flush=True)
+
+    failed = False
+    for workers in workers_list:
+        elapsed, result = _timed(input_path, parallel_path, mappings, {"parallelWorkers": workers}, repeat)
+        if elapsed is None:
+            print(f"{workers:<10}失败: {result.get('error')}")
+            failed = True
+            continue
+        same = filecmp.cmp(sequential_path, parallel_path, shallow=False)
+        failed = failed or not same
+        print(f"{workers:<10}{result['parallel']['chunks']:>8}{elapsed:>12.1f}{baseline / elapsed:>10.2f}"
+              f"{'✓' if same else '✗':>10}", flush=True)
+
+    for path in (sequential_path, parallel_path):
+        if os.path.exists(path):
+            os.remove(path)
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,206 @@
+"""
+scan_headings / format_document 规模基准
+
+生成 1k/10k/100k 段落的合成文档（见 synthetic.py），分别计时扫描、关闭全部特殊规则的格式化、
+开启全部特殊规则的格式化，记录耗时、每秒段落数与峰值常驻内存。
+每个测试项在单独的子进程中运行，峰值内存互不影响。
+
+用法:
+    python benchmarks/bench_scaling.py [--sizes=1000,10000,100000] [--mix=heading=0.1,table=0.05]
+        [--seed=0] [--repeat=1] [--engine=auto] [--workdir=目录]
+        [--save-baseline=baseline.json] [--baseline=baseline.json] [--threshold=0.25]
+
+--baseline 时与基线比较：耗时或峰值内存超出基线 threshold 比例、每秒段落数低于基线 threshold 比例即为回退，
+退出码为 1。基线文件只应在同一台机器上比较。
+"""
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+sys.path.insert(0, BENCH_DIR)
+
+from formatter import format_document, parse_cli_args, scan_headings
+from procinfo import peak_rss_mb
+from synthetic import DEFAULT_MIX, generate, parse_mix
+
+BASELINE_VERSION = 1
+DEFAULT_SIZES = (1000, 10000, 100000)
+DEFAULT_THRESHOLD = 0.25
+
+STYLES = {
+    "documentTitle": {"fontFamily": "方正小标宋简体", "fontSize": 22, "alignment": "center"},
+    "heading1": {"fontFamily": "黑体", "fontSize": 16, "firstLineIndent": 2},
+    "heading2": {"fontFamily": "楷体_GB2312", "fontSize": 16, "firstLineIndent": 2},
+    "heading3": {"fontFamily": "仿宋_GB2312", "fontSize": 16, "bold": True, "firstLineIndent": 2},
+    "body": {"fontFamily": "仿宋_GB2312", "fontSize": 16, "lineSpacing": 28, "firstLineIndent": 2,
+             "alignment": "justify"},
+}
+ALL_RULES = {"removeManualNumberPrefixes": True, "pictureLineSpacing": True, "pictureCenterAlign": True,
+             "resetIndentsAndSpacing": True, "autoTimesNewRoman": True}
+
+# 测试项 → 子进程中执行的操作
+CASES = ("scan", "format", "format-rules")
+
+# 指标 → 数值越大越好（True）还是越小越好（False）
+METRICS = {"wallMs": False, "paragraphsPerSec": True, "peakRssMb": False}
+
+
+def run_case(case, input_path, mappings_path, engine):
+    """在当前进程中执行一个测试项，返回指标"""
+    with open(mappings_path, 'r', encoding='utf-8') as f:
+        info = json.load(f)
+    start = time.perf_counter()
+    if case == "scan":
+        result = scan_headings(input_path, use_cache=False, engine=engine)
+    else:
+        profile = {"styles": STYLES, "specialRules": ALL_RULES if case == "format-rules" else {}}
+        output_path = input_path[:-5] + f'.{case}.out.docx'
+        result = format_document(input_path, profile, output_path, info["mappings"],
+                                 options={"engine": engine, "outputCache": False})
+        if os.path.exists(output_path):
+            os.remove(output_path)
+    elapsed = time.perf_counter() - start
+    if not result.get("success"):
+        return {"success": False, "error": result.get("error")}
+    return {
+        "success": True,
+        "engine": result.get("engine"),
+        "wallMs": round(elapsed * 1000, 1),
+        "paragraphsPerSec": round(info["paragraphs"] / elapsed, 1),
+        "peakRssMb": round(peak_rss_mb() or 0, 1),
+    }
+
+
+def _measure(case, input_path, mappings_path, engine, repeat):
+    """在子进程中运行 repeat 次，取耗时最短的一次与最低的峰值内存"""
+    best = None
+    for _ in range(repeat):
+        completed = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), f'--run-case={case}', f'--input={input_path}',
+             f'--mappings={mappings_path}', f'--engine={engine}'],
+            stdout=subprocess.PIPE, text=True, encoding='utf-8')
+        lines = completed.stdout.strip().splitlines()
+        metrics = json.loads(lines[-1]) if lines else {"success": False, "error": f"退出码 {completed.returncode}"}
+        if not metrics.get("success"):
+            return metrics
+        if best is None:
+            best = metrics
+        else:
+            peak = min(best["peakRssMb"], metrics["peakRssMb"])
+            if metrics["wallMs"] < best["wallMs"]:
+                best = metrics
+            best["peakRssMb"] = peak
+    return best
+
+
+def _prepare_documents(workdir, sizes, mix, seed):
+    """生成（或复用已生成的）各规模的合成文档，返回 {段落数: (文档路径, mappings 路径, 段落数)}"""
+    tag = f"{seed}-" + "-".join(f"{mix[name]:g}" for name in DEFAULT_MIX)
+    documents = {}
+    for size in sizes:
+        path = os.path.join(workdir, f"synthetic-{size}-{tag}.docx")
+        mappings_path = path[:-5] + ".json"
+        if not (os.path.exists(path) and os.path.exists(mappings_path)):
+            info = generate(path, size, mix, seed)
+            with open(mappings_path, 'w', encoding='utf-8') as f:
+                json.dump({"paragraphs": info["paragraphs"], "mappings": info["mappings"]}, f)
+        with open(mappings_path, 'r', encoding='utf-8') as f:
+            documents[size] = (path, mappings_path, json.load(f)["paragraphs"])
+    return documents
+
+
+def compare(results, baseline, threshold):
+    """
+    与基线比较
+
+    Returns:
+        回退列表 [{"case", "metric", "baseline", "current", "change"}]，change 为相对变化（正数表示变差）
+    """
+    regressions = []
+    for name, current in results.items():
+        reference = baseline.get("results", {}).get(name)
+        if not reference or not current.get("success"):
+            continue
+        for metric, higher_is_better in METRICS.items():
+            old, new = reference.get(metric), current.get(metric)
+            if not old or new is None:
+                continue
+            change = (old - new) / old if higher_is_better else (new - old) / old
+            if change > threshold:
+                regressions.append({"case": name, "metric": metric, "baseline": old, "current": new,
+                                    "change": round(change, 3)})
+    return regressions
+
+
+def main():
+    _, options = parse_cli_args(sys.argv[1:])
+    engine = options.get('engine', 'auto')
+
+    if 'run_case' in options:
+        # 子进程：执行单个测试项，最后一行输出指标
+        print(json.dumps(run_case(options['run_case'], options['input'], options['mappings'], engine)))
+        return 0
+
+    sizes = [int(s) for s in options['sizes'].split(',')] if 'sizes' in options else list(DEFAULT_SIZES)
+    mix = parse_mix(options.get('mix', ''))
+    seed = int(options.get('seed', 0))
+    repeat = int(options.get('repeat', 1))
+    threshold = float(options.get('threshold', DEFAULT_THRESHOLD))
+    workdir = options.get('workdir') or os.path.join(tempfile.gettempdir(), 'document-formatter-bench')
+    os.makedirs(workdir, exist_ok=True)
+
+    documents = _prepare_documents(workdir, sizes, mix, seed)
+    results = {}
+    failed = False
+    print(f"{'测试项':<24}{'引擎':<10}{'耗时(ms)':>12}{'段落/秒':>14}{'峰值内存(MB)':>14}")
+    for size, (path, mappings_path, paragraphs) in documents.items():
+        for case in CASES:
+            name = f"{case}/{size}"
+            metrics = _measure(case, path, mappings_path, engine, repeat)
+            results[name] = dict(metrics, paragraphs=paragraphs)
+            if metrics.get("success"):
+                print(f"{name:<24}{metrics['engine'] or '-':<10}{metrics['wallMs']:>12.1f}"
+                      f"{metrics['paragraphsPerSec']:>14,.0f}{metrics['peakRssMb']:>14.1f}", flush=True)
+            else:
+                print(f"{name:<24}失败: {metrics.get('error')}", flush=True)
+                failed = True
+
+    report = {
+        "version": BASELINE_VERSION,
+        "createdAt": time.strftime('%Y-%m-%dT%H:%M:%S'),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "mix": mix,
+        "seed": seed,
+        "repeat": repeat,
+        "results": results,
+    }
+    if 'save_baseline' in options:
+        with open(options['save_baseline'], 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"基线已保存: {options['save_baseline']}")
+
+    if 'baseline' in options:
+        with open(options['baseline'], 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        if baseline.get("version") != BASELINE_VERSION or baseline.get("mix") != mix or baseline.get("seed") != seed:
+            print("✗ 基线的版本、内容比例或随机种子与本次不同，无法比较")
+            return 1
+        regressions = compare(results, baseline, threshold)
+        for item in regressions:
+            print(f"✗ {item['case']} {item['metric']}: {item['baseline']} → {item['current']}"
+                  f"（变差 {item['change']:.0%}，阈值 {threshold:.0%}）")
+        if regressions:
+            return 1
+        print(f"✓ 与基线相比没有超过 {threshold:.0%} 的回退")
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
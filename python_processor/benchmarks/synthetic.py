@@ -0,0 +1,178 @@
+"""
+确定性的合成文档生成
+同样的段落数、内容比例与随机种子总是生成字节完全相同的 .docx（zip 条目时间固定），
+用于基准测试与回归比较。
+
+正文 XML 直接按模板拼接，不逐段调用 python-docx，10 万段落的文档也只需几秒。
+"""
+import io
+import json
+import random
+import struct
+import zipfile
+import zlib
+from typing import Dict, Optional
+from xml.sax.saxutils import escape
+
+from docx import Document
+from docx.shared import Inches
+
+# 各类内容占正文块的比例，其余为普通正文段落
+DEFAULT_MIX = {
+    'heading': 0.08,      # Heading 1-3 样式的标题
+    'numbering': 0.08,    # 手动编号的段落（"1.1 "、"（一）"、"第二章 "）
+    'table': 0.03,        # 2x3 表格
+    'image': 0.02,        # 嵌入图片的段落
+    'fragmented': 0.10,   # 每个字一个 run 的段落
+}
+
+FIXED_DATE_TIME = (1980, 1, 1, 0, 0, 0)
+
+BODY_TEXTS = (
+    '这是正文段落，包含 English words 与数字 123，用于格式化流程验证。',
+    '根据年度计划，本项目于 2024 年 3 月启动，预计投入资金 500 万元。',
+    '各部门应当按照统一部署，认真落实各项工作任务，确保按期完成。',
+)
+HEADING_TEXTS = ('总体情况', '项目建设目标 Project', '实施步骤说明', '保障措施', '预算与进度安排')
+FRAGMENTED_TEXT = '这是被拆分的 Word 2024 文本片段'
+
+
+def parse_mix(spec: str) -> Dict[str, float]:
+    """解析 "heading=0.1,table=0.05" 形式的比例设置，未指定的项取默认值"""
+    mix = dict(DEFAULT_MIX)
+    for item in filter(None, (part.strip() for part in spec.split(','))):
+        name, _, value = item.partition('=')
+        if name not in DEFAULT_MIX:
+            raise ValueError(f"未知的内容类型: {name}")
+        mix[name] = float(value)
+    if sum(mix.values()) > 1:
+        raise ValueError("各内容比例之和不能超过 1")
+    return mix
+
+
+def _png_bytes(width=8, height=8) -> bytes:
+    """生成一张纯色 PNG，不依赖外部图片文件"""
+    def chunk(kind, data):
+        return struct.pack('>I', len(data)) + kind + data + struct.pack('>I', zlib.crc32(kind + data) & 0xffffffff)
+    raw = b''.join(b'\x00' + b'\x4f\x81\xbd' * width for _ in range(height))
+    return (b'\x89PNG\r\n\x1a\n' + chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0))
+            + chunk(b'IDAT', zlib.compress(raw)) + chunk(b'IEND', b''))
+
+
+def _seed_package():
+    """
+    python-docx 默认模板加一个图片段落，返回 (zip 条目 {名称: 数据}, 图片 run 的 XML 模板)
+
+    模板中的 {id} 为 wp:docPr 的 id，每个图片段落各不相同。
+    """
+    doc = Document()
+    run = doc.add_paragraph().add_run()
+    run.add_picture(io.BytesIO(_png_bytes()), width=Inches(1))
+    drawing = run._r.xml
+    doc_pr_id = run._r.xpath('.//wp:docPr/@id')[0]
+    drawing = drawing.replace('{', '{{').replace('}', '}}').replace(f'id="{doc_pr_id}"', 'id="{id}"', 1)
+    buffer = io.BytesIO()
+    doc.save(buffer)
+    with zipfile.ZipFile(buffer) as z:
+        parts = {info.filename: z.read(info.filename) for info in z.infolist()}
+    return parts, drawing
+
+
+def _run(text, extra_rpr=''):
+    rpr = f'<w:rPr>{extra_rpr}</w:rPr>' if extra_rpr else ''
+    return f'<w:r>{rpr}<w:t xml:space="preserve">{escape(text)}</w:t></w:r>'
+
+
+def _paragraph(runs, style=None):
+    ppr = f'<w:pPr><w:pStyle w:val="{style}"/></w:pPr>' if style else ''
+    return f'<w:p>{ppr}{runs}</w:p>'
+
+
+def _table(rng):
+    cells = ''.join(
+        '<w:tr>' + ''.join(
+            f'<w:tc><w:tcPr><w:tcW w:w="2880" w:type="dxa"/></w:tcPr>'
+            f'{_paragraph(_run(f"表格内容 {r}{c} {rng.randint(1, 999)}"))}</w:tc>'
+            for c in range(3)) + '</w:tr>'
+        for r in range(2))
+    return ('<w:tbl><w:tblPr><w:tblStyle w:val="TableGrid"/><w:tblW w:w="0" w:type="auto"/></w:tblPr>'
+            '<w:tblGrid><w:gridCol w:w="2880"/><w:gridCol w:w="2880"/><w:gridCol w:w="2880"/></w:tblGrid>'
+            f'{cells}</w:tbl>')
+
+
+def generate(path: str, paragraphs: int, mix: Optional[Dict[str, float]] = None, seed: int = 0) -> Dict:
+    """
+    生成合成文档
+
+    Args:
+        paragraphs: 正文块数（段落与表格，表格计为一块）
+        mix: 各类内容的比例，见 DEFAULT_MIX
+        seed: 随机种子
+
+    Returns:
+        {"paragraphs": doc.paragraphs 中的段落数, "blocks": 正文块数, "counts": {类型: 数量},
+         "mappings": {段落索引: 样式键}}，mappings 对应标题段落，可直接传给 format_document
+    """
+    mix = dict(DEFAULT_MIX, **(mix or {}))
+    rng = random.Random(seed)
+    parts, drawing = _seed_package()
+    thresholds = []
+    total = 0.0
+    for name in ('heading', 'numbering', 'table', 'image', 'fragmented'):
+        total += mix[name]
+        thresholds.append((total, name))
+
+    body = [_paragraph(_run('年度工作报告'), 'Title')]
+    mappings = {'0': 'documentTitle'}
+    counts = {name: 0 for name in DEFAULT_MIX}
+    counts['body'] = 0
+    index = 1
+    chapter = section = 0
+    for _ in range(paragraphs - 1):
+        roll = rng.random()
+        kind = next((name for limit, name in thresholds if roll < limit), 'body')
+        counts[kind] += 1
+        if kind == 'heading':
+            level = rng.choice((1, 1, 2, 2, 2, 3))
+            if level == 1:
+                chapter += 1
+                section = 0
+            else:
+                section += 1
+            body.append(_paragraph(_run(rng.choice(HEADING_TEXTS)), f'Heading{level}'))
+            mappings[str(index)] = f'heading{level}'
+        elif kind == 'numbering':
+            prefix = rng.choice((f'{chapter}.{section + 1} ', f'（{"一二三四五六七八九十"[section % 10]}）',
+                                 f'第{"一二三四五六七八九十"[chapter % 10]}章 '))
+            body.append(_paragraph(_run(prefix + rng.choice(HEADING_TEXTS), '<w:b/><w:sz w:val="32"/>')))
+        elif kind == 'table':
+            body.append(_table(rng))
+            index -= 1
+        elif kind == 'image':
+            body.append(_paragraph(drawing.format(id=index + 1)))
+        elif kind == 'fragmented':
+            body.append(_paragraph(''.join(_run(ch, '<w:sz w:val="24"/>') for ch in FRAGMENTED_TEXT)))
+        else:
+            body.append(_paragraph(_run(rng.choice(BODY_TEXTS)) + _run('第二个 run', '<w:i/>')))
+        index += 1
+
+    document_xml = parts['word/document.xml'].decode('utf-8')
+    head, _, rest = document_xml.partition('<w:body>')
+    sect_pr = rest[rest.index('<w:sectPr'):rest.index('</w:body>')]
+    parts['word/document.xml'] = f'{head}<w:body>{"".join(body)}{sect_pr}</w:body></w:document>'.encode('utf-8')
+
+    with zipfile.ZipFile(path, 'w', zipfile.ZIP_DEFLATED) as z:
+        for name, data in parts.items():
+            info = zipfile.ZipInfo(name, FIXED_DATE_TIME)
+            info.compress_type = zipfile.ZIP_DEFLATED
+            z.writestr(info, data)
+
+    return {"paragraphs": index, "blocks": paragraphs, "counts": counts, "mappings": mappings}
+
+
+if __name__ == '__main__':
+    import sys
+    # python benchmarks/synthetic.py out.docx 1000 [mix] [seed]
+    info = generate(sys.argv[1], int(sys.argv[2]), parse_mix(sys.argv[3]) if len(sys.argv) > 3 else None,
+                    int(sys.argv[4]) if len(sys.argv) > 4 else 0)
+    print(json.dumps({k: v for k, v in info.items() if k != 'mappings'}, ensure_ascii=False))
@@ -3,7 +3,7 @@
 识别并清理文档中的手动编号（数字编号、中文数字、括号编号等）
 """
 import re
-from typing import Optional, Dict
+from typing import Dict, Iterable, List, Optional
 
 
 class ManualNumberingCleaner:
@@ -16,12 +16,61 @@ class ManualNumberingCleaner:
         'parenthesis': re.compile(r'^([\(（\【\[]((\d+)|([一二三四五六七八九十]+))[\)）\】\]])'),  # 括号: "(1)", "（一）"
     }
     
+    # 三种模式合并成的单个交替模式，命名分组即编号部分（与 PATTERNS 中的分组 1 相同）
+    # 三种编号的首字符互不重叠（数字 / 中文数字或"第" / 括号），因此最多只有一个分支能匹配，结果与逐个尝试相同
+    FUSED_PATTERN = re.compile(
+        r'(?P<arabic>\d+(?:\.\d+)*)[.．\s]+'
+        r'|(?P<chinese>第?[一二三四五六七八九十百]+[章节条]? ?[、，,])'
+        r'|(?P<parenthesis>[\(（\【\[](?:\d+|[一二三四五六七八九十]+)[\)）\】\]])'
+    )
+    
     # 单位关键字（用于熔断保护）
     UNIT_KEYWORDS = ['kg', 'g', 'mg', 'km', 'm', 'cm', 'mm', '%', '年', '月', '日', '时', '分', '秒', 'G', 'GB', 'MB', 'TB']
     
+    # 小写后的单位关键字集合与各关键字长度：只需取剩余文本开头几个字符做集合查找
+    _UNIT_SET = frozenset(unit.lower() for unit in UNIT_KEYWORDS)
+    _UNIT_LENGTHS = tuple(sorted({len(unit) for unit in _UNIT_SET}))
+    _LEADING_NUMBER = re.compile(r'\d+')
+    
     def __init__(self):
         pass
     
+    def _match(self, text: str):
+        """
+        检测单个已去除首尾空白的非空文本
+
+        Returns:
+            (类型, 编号, 清洗后文本)；未检测到或触发熔断保护时返回 None
+        """
+        match = self.FUSED_PATTERN.match(text)
+        if match is None:
+            return None
+        pattern_type = match.lastgroup
+        raw_match = match.group(pattern_type)
+        
+        # 熔断保护 1: 编号长度检查
+        if len(raw_match) > 15:
+            return None
+        
+        # 熔断保护 2: 数字编号年份检查（如 "2025. 年度规划"）
+        if pattern_type == 'arabic' and int(self._LEADING_NUMBER.match(raw_match).group(0)) > 50:
+            return None
+        
+        clean_text = text[match.end():].strip()
+        # 熔断保护 4: 清洗后文本为空或过短
+        if len(clean_text) < 2:
+            return None
+        
+        # 熔断保护 3: 剩余文本以单位开头（如 "10kg 重量"）
+        # 逐字符小写，开头若干字符小写后的前缀与整段文本小写后的前缀相同
+        head = clean_text[:self._UNIT_LENGTHS[-1]].lower()
+        unit_set = self._UNIT_SET
+        for length in self._UNIT_LENGTHS:
+            if head[:length] in unit_set:
+                return None
+        
+        return pattern_type, raw_match, clean_text
+    
     def detect(self, text: str) -> Optional[Dict]:
         """
         检测文本中的手动编号
@@ -44,44 +93,46 @@ class ManualNumberingCleaner:
         if not text:
             return None
         
-        # 遍历所有模式
-        for pattern_type, pattern in self.PATTERNS.items():
-            match = pattern.match(text)
-            if match:
-                raw_match = match.group(1) if match.lastindex >= 1 else match.group(0)
-                clean_text = text[match.end():].strip()
-                
-                # 熔断保护 1: 编号长度检查
-                if len(raw_match) > 15:
-                    continue
-                
-                # 熔断保护 2: 数字编号年份检查（如 "2025. 年度规划"）
-                if pattern_type == 'arabic':
-                    # 提取第一个数字
-                    first_num_match = re.match(r'^(\d+)', raw_match)
-                    if first_num_match:
-                        first_num = int(first_num_match.group(1))
-                        if first_num > 50:  # 可能是年份
-                            continue
-                
-                # 熔断保护 3: 剩余文本以单位开头（如 "10kg 重量"）
-                if clean_text:
-                    # 检查是否以单位关键字开头
-                    clean_lower = clean_text.lower()
-                    if any(clean_lower.startswith(unit.lower()) for unit in self.UNIT_KEYWORDS):
-                        continue
-                
-                # 熔断保护 4: 清洗后文本为空或过短
-                if not clean_text or len(clean_text) < 2:
-                    continue
-                
-                return {
-                    'type': pattern_type,
-                    'raw_match': raw_match,
-                    'clean_text': clean_text
-                }
+        result = self._match(text)
+        if result is None:
+            return None
+        return {
+            'type': result[0],
+            'raw_match': result[1],
+            'clean_text': result[2]
+        }
+    
+    def detect_many(self, texts: Iterable[str]) -> Dict[str, List]:
+        """
+        批量检测，结果按列存放，只包含检测到编号的文本
         
-        return None
+        Args:
+            texts: 要检测的文本序列
+            
+        Returns:
+            {
+                'index': [0, 3],                  # 检测到编号的文本在 texts 中的位置
+                'type': ['arabic', 'chinese'],
+                'raw_match': ['1.1', '一、'],
+                'clean_text': ['项目建设目标', '总体要求']
+            }
+            各列等长，第 i 项与 detect(texts[index[i]]) 的结果相同
+        """
+        indexes, types, raw_matches, clean_texts = [], [], [], []
+        match = self._match
+        for position, text in enumerate(texts):
+            if not text or not isinstance(text, str):
+                continue
+            text = text.strip()
+            if not text:
+                continue
+            result = match(text)
+            if result is not None:
+                indexes.append(position)
+                types.append(result[0])
+                raw_matches.append(result[1])
+                clean_texts.append(result[2])
+        return {'index': indexes, 'type': types, 'raw_match': raw_matches, 'clean_text': clean_texts}
 
 
 # 测试代码
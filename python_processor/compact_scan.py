@@ -0,0 +1,85 @@
+"""
+以标题为主的紧凑扫描结果
+scan_headings 的 structure 为每个非空段落一项，长文档中绝大部分是用户不会修改的正文段落。compact 模式下:
+    - 标题/文档标题候选与检测到手动编号的段落保留完整记录，以列存储（每个字段一个数组），不再逐项重复键名
+    - 其余连续的正文段落合并为区间 {start, end, count, offset}：start/end 为首末段落的 index，
+      count 为区间内的 structure 项数（空段落不计），offset 为区间首项在完整 structure 中的位置
+界面需要展开某个区间时，用 offset/limit=count 再次请求 scan_headings（命中扫描缓存，不再解析文档）即可取得
+该区间的完整记录；按 offset 把区间与完整记录交错排列即可还原完整 structure。
+"""
+from typing import Dict, List
+
+# 完整记录的列；suggested_key 与 suggestedStyle 相同，不重复输出
+RECORD_COLUMNS = ('index', 'text', 'suggestedStyle', 'style', 'styleId', 'originalStyleName')
+
+
+def is_collapsible(item: Dict) -> bool:
+    """正文段落且没有手动编号时合并到区间中"""
+    return item.get('suggestedStyle') == 'body' and 'manual_numbering' not in item
+
+
+def compact_structure(structure: List[Dict]) -> Dict:
+    """
+    把 scan_headings 的 structure 转为紧凑形式
+
+    Returns:
+        {
+            "total": 926,  # 完整 structure 的项数
+            "records": {"index": [0, 12], "text": [...], "suggestedStyle": [...], "style": [...],
+                        "styleId": [...], "originalStyleName": [...],
+                        "manualNumbering": [None, {"type", "match", "clean_text"}],
+                        "location": [...]},  # location 仅当有 story 段落时存在
+            "bodyRanges": {"start": [1], "end": [11], "count": [9], "offset": [1]}
+        }
+    """
+    records = {column: [] for column in RECORD_COLUMNS}
+    records['manualNumbering'] = []
+    locations = []
+    ranges = {'start': [], 'end': [], 'count': [], 'offset': []}
+    # 正文段落与 story 段落（index 为段落键）不合并到同一区间
+    previous_story = None
+    for position, item in enumerate(structure):
+        story = 'location' in item
+        if is_collapsible(item):
+            if ranges['offset'] and ranges['offset'][-1] + ranges['count'][-1] == position and story == previous_story:
+                ranges['end'][-1] = item['index']
+                ranges['count'][-1] += 1
+            else:
+                ranges['start'].append(item['index'])
+                ranges['end'].append(item['index'])
+                ranges['count'].append(1)
+                ranges['offset'].append(position)
+        else:
+            for column in RECORD_COLUMNS:
+                records[column].append(item.get(column))
+            records['manualNumbering'].append(item.get('manual_numbering'))
+            locations.append(item.get('location'))
+        previous_story = story
+    if any(location is not None for location in locations):
+        records['location'] = locations
+    return {"total": len(structure), "records": records, "bodyRanges": ranges}
+
+
+def expand_structure(compact: Dict, ranges_items: Dict[int, List[Dict]]) -> List[Dict]:
+    """
+    由紧凑结果与各区间的完整记录（{区间 offset: 该区间的 structure 项}）还原完整 structure
+    """
+    records = compact['records']
+    ranges = compact['bodyRanges']
+    starts = dict(zip(ranges['offset'], ranges['count']))
+    structure = []
+    record = 0
+    while len(structure) < compact['total']:
+        count = starts.get(len(structure))
+        if count is not None:
+            structure.extend(ranges_items[len(structure)][:count])
+            continue
+        item = {column: records[column][record] for column in RECORD_COLUMNS}
+        item['suggested_key'] = item['suggestedStyle']
+        if records['manualNumbering'][record] is not None:
+            item['manual_numbering'] = records['manualNumbering'][record]
+        if 'location' in records and records['location'][record] is not None:
+            item['location'] = records['location'][record]
+        structure.append(item)
+        record += 1
+    return structure
@@ -0,0 +1,207 @@
+"""
+本地磁盘缓存
+以内容哈希为键的文件缓存，按总大小做 LRU 淘汰（以文件 mtime 作为最近使用时间），可选按闲置时间淘汰
+"""
+import hashlib
+import os
+import shutil
+import sys
+import tempfile
+import time
+from typing import Optional
+
+DEFAULT_MAX_MB = 64
+
+
+def default_cache_dir(namespace: str) -> str:
+    """
+    返回缓存目录
+
+    优先使用环境变量 FORMATTER_CACHE_DIR，其次是系统缓存目录：
+    Windows 为 %LOCALAPPDATA%，macOS 为 ~/Library/Caches，其他平台为 $XDG_CACHE_HOME 或 ~/.cache
+    """
+    root = os.environ.get('FORMATTER_CACHE_DIR')
+    if not root:
+        if sys.platform == 'win32':
+            base = os.environ.get('LOCALAPPDATA') or tempfile.gettempdir()
+        elif sys.platform == 'darwin':
+            base = os.path.expanduser('~/Library/Caches')
+        else:
+            base = os.environ.get('XDG_CACHE_HOME') or os.path.expanduser('~/.cache')
+        root = os.path.join(base, 'document-formatter')
+    return os.path.join(root, namespace)
+
+
+def hash_file(path: str, chunk_size: int = 1024 * 1024) -> str:
+    """计算文件内容的 SHA-256（分块读取，不整体载入内存）"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def make_key(*parts) -> str:
+    """将多个键组成部分合并为一个 SHA-256 键"""
+    return hashlib.sha256('\x1f'.join(str(p) for p in parts).encode('utf-8')).hexdigest()
+
+
+class DiskCache:
+    """
+    大小受限的 LRU 磁盘缓存
+
+    Args:
+        cache_dir: 缓存目录（不存在时自动创建）
+        max_bytes: 缓存总大小上限，写入后超出则从最久未使用的条目开始淘汰
+        suffix: 缓存文件扩展名
+        max_age: 条目最长闲置时间（秒），写入时淘汰超过该时间未使用的条目；None 表示不限
+    """
+
+    def __init__(self, cache_dir: str, max_bytes: int = DEFAULT_MAX_MB * 1024 * 1024, suffix: str = '.bin',
+                 max_age: Optional[float] = None):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.suffix = suffix
+        self.max_age = max_age
+
+    def path_for(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key + self.suffix)
+
+    def get(self, key: str) -> Optional[bytes]:
+        """读取缓存条目，命中时刷新其最近使用时间；未命中或读取失败返回 None"""
+        path = self.path_for(key)
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+        except OSError:
+            return None
+        try:
+            os.utime(path, None)
+        except OSError:
+            pass
+        return data
+
+    def put(self, key: str, data: bytes) -> bool:
+        """原子写入缓存条目（先写临时文件再替换），失败时返回 False"""
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix='.tmp')
+            try:
+                with os.fdopen(fd, 'wb') as f:
+                    f.write(data)
+                os.replace(tmp_path, self.path_for(key))
+            except BaseException:
+                try:
+                    os.remove(tmp_path)
+                except OSError:
+                    pass
+                raise
+        except OSError:
+            return False
+        self.evict()
+        return True
+
+    def put_file(self, key: str, source_path: str, link: bool = False) -> bool:
+        """
+        把文件存为缓存条目（先写临时文件再替换），失败时返回 False
+
+        link 为 True 时优先建立硬链接（不复制数据；跨文件系统等无法链接时退回复制）。
+        """
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            _place_file(source_path, self.path_for(key), link)
+        except OSError:
+            return False
+        self.evict()
+        return True
+
+    def get_file(self, key: str, dest_path: str, link: bool = False) -> bool:
+        """把缓存条目复制（或硬链接）到 dest_path，命中时刷新其最近使用时间；未命中或失败时返回 False"""
+        path = self.path_for(key)
+        try:
+            _place_file(path, dest_path, link)
+        except OSError:
+            return False
+        try:
+            os.utime(path, None)
+        except OSError:
+            pass
+        return True
+
+    def remove(self, key: str) -> None:
+        self._remove(self.path_for(key))
+
+    def _remove(self, path: str) -> bool:
+        """删除一个条目文件；子类可以重写以同时删除附属文件"""
+        try:
+            os.remove(path)
+        except OSError:
+            return False
+        return True
+
+    def _entries(self):
+        """列出缓存条目: [(mtime, size, path)]"""
+        entries = []
+        try:
+            with os.scandir(self.cache_dir) as it:
+                for entry in it:
+                    if not entry.name.endswith(self.suffix):
+                        continue
+                    try:
+                        st = entry.stat()
+                    except OSError:
+                        continue
+                    entries.append((st.st_mtime, st.st_size, entry.path))
+        except OSError:
+            pass
+        return entries
+
+    def evict(self) -> int:
+        """淘汰闲置超过 max_age 的条目，再按最近使用时间淘汰，直到总大小不超过上限，返回淘汰数量"""
+        entries = self._entries()
+        removed = 0
+        if self.max_age is not None:
+            cutoff = time.time() - self.max_age
+            kept = []
+            for entry in entries:
+                if entry[0] < cutoff and self._remove(entry[2]):
+                    removed += 1
+                else:
+                    kept.append(entry)
+            entries = kept
+        total = sum(size for _, size, _ in entries)
+        if total <= self.max_bytes:
+            return removed
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            if not self._remove(path):
+                continue
+            total -= size
+            removed += 1
+        return removed
+
+
+def _place_file(source_path: str, dest_path: str, link: bool) -> None:
+    """把 source_path 原子地放到 dest_path：先在目标目录中建立临时文件（硬链接或复制），再替换"""
+    directory = os.path.dirname(os.path.abspath(dest_path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    os.close(fd)
+    try:
+        linked = False
+        if link:
+            try:
+                os.remove(tmp_path)
+                os.link(source_path, tmp_path)
+                linked = True
+            except OSError:
+                linked = False
+        if not linked:
+            shutil.copyfile(source_path, tmp_path)
+        os.replace(tmp_path, dest_path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
@@ -0,0 +1,253 @@
+"""
+文档预建索引
+在格式化主循环之前对文档 XML 做一次遍历，预先收集逐段落需要的信息，避免在循环中反复序列化或查找。
+"""
+import hashlib
+from collections import OrderedDict, namedtuple
+from typing import Dict
+
+from docx.oxml.ns import qn
+from docx.styles import BabelFish
+from lxml import etree
+
+W_P = qn('w:p')
+MC_FALLBACK = '{http://schemas.openxmlformats.org/markup-compatibility/2006}Fallback'
+V_SHAPE = '{urn:schemas-microsoft-com:vml}shape'
+
+# 图片元素：DrawingML 图片、VML 图片及 VML 形状
+PICTURE_TAGS = (qn('w:drawing'), qn('w:pict'), V_SHAPE)
+_PICTURE_TAG_SET = frozenset(PICTURE_TAGS)
+
+
+def build_picture_index(root) -> Dict[object, int]:
+    """
+    一次遍历统计每个段落包含的图片数量
+
+    每个图片元素归属到最近的 w:p 祖先。为避免重复计数：
+    - 嵌套在另一个图片元素中的元素（如 w:pict 内的 v:shape）不计数
+    - mc:Fallback 中的兼容副本不计数（mc:Choice 中的版本已计数）
+
+    Args:
+        root: 要遍历的 lxml 元素，通常为 document.element.body
+
+    Returns:
+        {w:p 元素: 图片数量}，只包含至少有一张图片的段落
+    """
+    index = {}
+    for element in root.iter(*PICTURE_TAGS):
+        paragraph = None
+        for ancestor in element.iterancestors():
+            tag = ancestor.tag
+            if tag in _PICTURE_TAG_SET or tag == MC_FALLBACK:
+                break
+            if tag == W_P:
+                paragraph = ancestor
+                break
+        if paragraph is not None:
+            index[paragraph] = index.get(paragraph, 0) + 1
+    return index
+
+
+def get_display_style_name(style_name_raw):
+    """将 Word 内部样式名转换为用户友好的中文名称"""
+    if not style_name_raw:
+        return '正文'
+    style_display_map = {
+        'Normal': '正文',
+        'List Paragraph': '正文（列表）',
+        'Body Text': '正文',
+        'Body Text First Indent': '正文（首行缩进）',
+        'Body Text First Indent 2': '正文（首行缩进2）',
+        'Body Text Indent': '正文（缩进）',
+        'Heading 1': '标题 1',
+        'Heading 2': '标题 2',
+        'Heading 3': '标题 3',
+        'Heading 4': '标题 4',
+        'Title': '标题',
+    }
+    # 模糊匹配 Body Text 开头的样式
+    if style_name_raw.startswith('Body Text'):
+        return style_display_map.get(style_name_raw, '正文（' + style_name_raw.replace('Body Text', '').strip() + '）')
+    # 模糊匹配 List Paragraph 开头的样式
+    if style_name_raw.startswith('List Paragraph'):
+        suffix = style_name_raw.replace('List Paragraph', '').strip()
+        return '正文（列表' + (suffix if suffix else '') + '）'
+    return style_display_map.get(style_name_raw, style_name_raw)
+
+
+def clean_style_name(raw_name):
+    """去掉样式名中的格式描述：'样式 ' 前缀、'+' 之后与 ':' 之后的部分"""
+    # 1. 如果以"样式 "开头，去掉这个前缀
+    if raw_name.startswith('样式 '):
+        raw_name = raw_name[3:]
+    # 2. 如果包含'+', 取第一部分作为纯样式名
+    if '+' in raw_name:
+        raw_name = raw_name.split('+')[0].strip()
+    # 3. 如果包含':', 取冒号前的部分
+    if ':' in raw_name:
+        raw_name = raw_name.split(':')[0].strip()
+    return raw_name.strip()
+
+
+# 清洗后的样式名（小写）→ 建议样式键；Body Text、List Paragraph 等变体见 suggest_style_key
+_SUGGESTED_KEYS = {
+    'title': 'documentTitle', '标题': 'documentTitle',
+    'heading 1': 'heading1', '标题 1': 'heading1',
+    'heading 2': 'heading2', '标题 2': 'heading2',
+    'heading 3': 'heading3', '标题 3': 'heading3',
+    'heading 4': 'heading4', '标题 4': 'heading4',
+}
+
+
+def suggest_style_key(style_name):
+    """
+    按清洗后的样式名给出建议样式键
+
+    只有标题类样式（Title、Heading 1-4 及中文名）映射为对应样式键，
+    其余样式（Normal、Body Text、List Paragraph 等）均为 "body"。
+    """
+    return _SUGGESTED_KEYS.get(style_name.lower(), 'body')
+
+
+W_STYLE = qn('w:style')
+W_NAME = qn('w:name')
+W_BASED_ON = qn('w:basedOn')
+W_STYLE_ID = qn('w:styleId')
+W_TYPE = qn('w:type')
+W_DEFAULT = qn('w:default')
+W_VAL = qn('w:val')
+_ON_VALUES = ('1', 'true', 'on')
+
+# 段落样式的预解析信息
+#   style_id: styleId；name: 清洗后的样式名（样式没有名称时为 None）
+#   display_name: 用户友好的显示名称；suggested_key: 建议样式键；based_on: basedOn 链上的 styleId（由近及远）
+StyleInfo = namedtuple('StyleInfo', 'style_id name display_name suggested_key based_on')
+
+# 样式定义记录：styleId、styles.xml 中的名称、w:type 原值、是否为默认样式
+_StyleRecord = namedtuple('_StyleRecord', 'style_id name type default')
+
+
+class StyleIndex:
+    """
+    段落样式解析的索引
+
+    python-docx 按 styleId 或样式名查找样式时每次都要在 styles.xml 中做 XPath 查询，
+    扫描时还要对每个段落清洗样式名、做一串字符串比较。这里对 styles.xml 只遍历一次，
+    预先建立 styleId → StyleInfo 与样式名 → styleId 的映射，语义与 Paragraph.style 的读取与赋值保持一致。
+
+    索引只保存样式的标识信息，不引用文档中的元素，可以在 styles.xml 相同的文档之间复用（见 for_styles）。
+    """
+
+    def __init__(self, styles):
+        """
+        Args:
+            styles: python-docx Styles 对象；文档没有样式部件时为 None
+        """
+        records = []
+        if styles is not None:
+            for style in styles.element.iterchildren(W_STYLE):
+                name = style.find(W_NAME)
+                based_on = style.find(W_BASED_ON)
+                records.append((_StyleRecord(style.get(W_STYLE_ID), name.get(W_VAL) if name is not None else None,
+                                             style.get(W_TYPE), style.get(W_DEFAULT) in _ON_VALUES),
+                                based_on.get(W_VAL) if based_on is not None else None))
+
+        self._by_id = {}
+        self._by_name = {}
+        self._default = None
+        based_on_ids = {}
+        for record, based_on in records:
+            if record.style_id is not None:
+                self._by_id.setdefault(record.style_id, record)
+                based_on_ids.setdefault(record.style_id, based_on)
+            if record.name is not None:
+                self._by_name.setdefault(record.name, record)
+            if record.type == 'paragraph' and record.default:
+                # 与 python-docx 一致：同类型有多个默认样式时取文档顺序中的最后一个
+                self._default = record
+
+        self._info = {}
+        for record, _ in records:
+            if record.type == 'paragraph' and record not in self._info:
+                self._info[record] = self._describe(record, based_on_ids)
+        self._style_ids = {}
+
+    @staticmethod
+    def _describe(record, based_on_ids):
+        chain = []
+        style_id = based_on_ids.get(record.style_id)
+        while style_id is not None and style_id not in chain and style_id != record.style_id:
+            chain.append(style_id)
+            style_id = based_on_ids.get(style_id)
+        # python-docx 的 Style.name 为界面名称（如 heading 1 → Heading 1）
+        raw_name = BabelFish.internal2ui(record.name) if record.name else None
+        if not raw_name:
+            return StyleInfo(record.style_id, None, None, 'body', tuple(chain))
+        name = clean_style_name(raw_name)
+        return StyleInfo(record.style_id, name, get_display_style_name(name),
+                         suggest_style_key(name), tuple(chain))
+
+    @classmethod
+    def for_styles(cls, styles):
+        """
+        返回 styles 的索引；styles.xml 内容相同的文档共用同一个索引（按内容的 SHA-256 缓存在进程内）
+
+        常驻模式下连续处理同一模板生成的文档时不必重复建立索引。
+        """
+        if styles is None:
+            return cls(None)
+        key = hashlib.sha256(etree.tostring(styles.element)).digest()
+        index = _INDEX_CACHE.get(key)
+        if index is not None:
+            _INDEX_CACHE.move_to_end(key)
+            return index
+        index = cls(styles)
+        _INDEX_CACHE[key] = index
+        if len(_INDEX_CACHE) > INDEX_CACHE_SIZE:
+            _INDEX_CACHE.popitem(last=False)
+        return index
+
+    def paragraph_info(self, style_id):
+        """
+        等价于读取 Paragraph.style 后取其名称等信息
+
+        styleId 为 None、不存在或不是段落样式时返回默认段落样式的信息；文档没有默认段落样式时返回 None。
+        """
+        record = self._by_id.get(style_id) if style_id else None
+        if record is None or record.type != 'paragraph':
+            record = self._default
+        return self._info.get(record) if record is not None else None
+
+    def paragraph_style_id(self, style_name):
+        """
+        等价于给 Paragraph.style 赋样式名时解析出的 styleId
+
+        样式为默认段落样式时返回 None（即移除 w:pStyle）；
+        样式不存在或类型不符时抛出与 python-docx 相同的异常。
+        """
+        if style_name not in self._style_ids:
+            self._style_ids[style_name] = self._resolve_style_id(style_name)
+        found, value = self._style_ids[style_name]
+        if not found:
+            error_type, message = value
+            raise error_type(message)
+        return value
+
+    def _resolve_style_id(self, style_name):
+        record = self._by_name.get(BabelFish.ui2internal(style_name))
+        if record is None:
+            # python-docx 按名称找不到时退回按 styleId 查找（已弃用）
+            record = self._by_id.get(style_name)
+        if record is None:
+            return False, (KeyError, f"no style with name '{style_name}'")
+        # 没有 w:type 的样式按段落样式处理
+        if (record.type or 'paragraph') != 'paragraph':
+            return False, (ValueError, f"assigned style is type {record.type}, need type paragraph")
+        if record is self._default:
+            return True, None
+        return True, record.style_id
+
+
+# StyleIndex.for_styles 的进程内缓存 {styles.xml 的 SHA-256: StyleIndex}
+INDEX_CACHE_SIZE = 32
+_INDEX_CACHE = OrderedDict()
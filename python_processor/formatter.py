@@ -1,9 +1,18 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
+import time
+# 模块导入耗时（--profile 时计入 timings 的 import 阶段）
+_IMPORT_STARTED = (time.perf_counter(), time.process_time())
 import sys
 import os
 import json
+import logging
+import copy
+import multiprocessing
+import collections
+import signal
 import re
+import zlib
 from docx import Document
 from docx.shared import Pt, RGBColor, Cm
 from docx.enum.text import WD_ALIGN_PARAGRAPH
@@ -11,6 +20,33 @@ from docx.enum.style import WD_STYLE_TYPE
 from docx.oxml.ns import qn
 from docx.oxml import OxmlElement
 from cleaner import ManualNumberingCleaner
+from worker import FormatterWorker, require_params, DEFAULT_MAX_JOBS, DEFAULT_MAX_RSS_MB
+from batch import run_batch
+from docx.styles.styles import Styles
+from docx.text.paragraph import Paragraph
+from doc_index import build_picture_index, StyleIndex, W_P
+from runs import coalesce_runs
+from style_plan import StylePlan, get_or_add_child, pin_inherited_properties, PPR_TAG_SEQ
+from passes import PassPipeline, logger
+from streaming import StreamingPackage, parse_body_fragments, serialize_body_child, serialize_part
+from stories import StoryWalker, STORY_RELTYPES, dom_story_parts, location_info
+from package_writer import rewrite_package, save_document
+from docx.opc.constants import RELATIONSHIP_TYPE as RT
+from docx.opc.part import XmlPart
+from docx.oxml.parser import parse_xml
+from disk_cache import DiskCache, default_cache_dir, hash_file, make_key, DEFAULT_MAX_MB
+import profiling
+import progress
+from progress import CANCEL_CHECK_INTERVAL, Cancelled, cancelled_result
+from incremental import FormatState, load_state, save_state, profile_fingerprint
+from output_cache import get_output_cache, request_key
+from paragraphs import ParagraphProxy, iter_paragraphs
+from native_numbering import apply_list_level, ensure_list_definition, list_levels, native_unsupported
+from procinfo import current_rss_mb, peak_rss_mb
+from payload import has_story_keys, load_payload, parse_mappings
+from compact_scan import compact_structure
+
+_IMPORT_TIMES = (time.perf_counter() - _IMPORT_STARTED[0], time.process_time() - _IMPORT_STARTED[1])
 
 # 配置UTF-8输出，避免Windows控制台编码问题（stdout/stderr 同时设置）
 if sys.stdout is not None:
@@ -121,7 +157,21 @@ class NumberingManager:
         }
         # Cache for the "cascade string" (the parent part of the number)
         # e.g. for H2 "1.1", the cascade string from H1 might be "1"
-        self.cascade_cache = {} 
+        # Maintained incrementally: advancing a level only invalidates that level and its children,
+        # so each heading costs O(1) regardless of how deep the document is.
+        self.cascade_cache = {}
+        # Levels whose cascade string depends on each level (the level itself and its children)
+        levels = list(self.hierarchy)
+        self.dependents = {level: levels[i:] for i, level in enumerate(levels)}
+
+    def snapshot(self):
+        """Current counter state, for restore()."""
+        return dict(self.counters)
+
+    def restore(self, counters):
+        """Roll back to a state returned by snapshot()."""
+        self.counters = counters
+        self.cascade_cache.clear()
 
     def reset_children(self, level):
         """Reset counters for children of the given level."""
@@ -168,6 +218,12 @@ class NumberingManager:
         Get the string that this level contributes to its children.
         This handles the 'Chinese H1 Exception' (第一章 -> 1).
         """
+        cached = self.cascade_cache.get(style_key)
+        if cached is None:
+            cached = self.cascade_cache[style_key] = self._cascade_string(style_key)
+        return cached
+
+    def _cascade_string(self, style_key):
         styles = self.profile.get('styles', {})
         config = styles.get(style_key, {}).get('numbering')
         
@@ -199,18 +255,28 @@ class NumberingManager:
         
         return current_str
 
-    def process_paragraph(self, para, style_key):
-        """Update counters and apply numbering to paragraph."""
+    def next_number(self, style_key):
+        """
+        Advance the counter for style_key and return its number string.
+        Returns None for keys that do not take part in numbering, '' when numbering is disabled for the key.
+        """
         if style_key not in self.counters:
-            return
+            return None
 
         # Increment counter
         self.counters[style_key] += 1
         # Reset children
         self.reset_children(style_key)
+        # Cascade strings of this level and its children are stale
+        for level in self.dependents[style_key]:
+            self.cascade_cache.pop(level, None)
         
         # Generate number string
-        num_str = self.get_number_string(style_key)
+        return self.get_number_string(style_key) or ''
+
+    def process_paragraph(self, para, style_key):
+        """Update counters and apply numbering to paragraph. Returns the result of next_number."""
+        num_str = self.next_number(style_key)
         
         if num_str:
             # Prepend to paragraph text
@@ -227,14 +293,107 @@ class NumberingManager:
                 para.runs[0].text = full_text + para.runs[0].text
             else:
                 para.add_run(full_text)
+        return num_str
+
+# auto 引擎切换到流式处理的 document.xml 大小阈值（MB，解压后）
+STREAM_THRESHOLD_MB = 32
+
+# 估算 DOM 引擎峰值内存：document.xml（解压后）每 MB 约占用的常驻内存（MB），按 10 万段落的合成文档实测约 36
+DOM_MEMORY_FACTOR = 40
 
-def scan_headings(input_path, base_font_size=12):
+# 分类器版本：修改 scan_headings 的识别逻辑或 ManualNumberingCleaner 时必须递增，使旧的扫描缓存失效
+CLASSIFIER_VERSION = 1
+
+def select_engine(input_path, engine='auto', threshold_mb=None):
+    """
+    选择文档处理引擎
+
+    "dom" 使用 python-docx 对象模型，整个 document.xml 常驻内存；
+    "stream" 使用流式引擎（见 streaming.py），内存占用与文档大小无关；
+    "auto" 在 document.xml 解压后大小达到阈值时选择 "stream"。
+    阈值（MB）依次取 threshold_mb、环境变量 FORMATTER_STREAM_THRESHOLD_MB、STREAM_THRESHOLD_MB。
+    """
+    if engine in ('dom', 'stream'):
+        return engine
+    if engine not in (None, 'auto'):
+        raise ValueError(f"未知的引擎: {engine}")
+    if threshold_mb is None:
+        threshold_mb = os.environ.get('FORMATTER_STREAM_THRESHOLD_MB', STREAM_THRESHOLD_MB)
+    size = _main_part_size(input_path)
+    if size is None:
+        # 文件无法作为 docx 打开时交给 Document() 报告原始错误
+        return 'dom'
+    return 'stream' if size >= float(threshold_mb) * 1024 * 1024 else 'dom'
+
+def _main_part_size(input_path):
+    """document.xml 解压后的大小（字节），文件无法作为 docx 打开时返回 None"""
+    try:
+        with StreamingPackage(input_path) as package:
+            return package.part_size(package.main_part)
+    except Exception:
+        return None
+
+def _has_numbering_part(input_path):
+    """文档是否有 numbering.xml"""
+    try:
+        with StreamingPackage(input_path) as package:
+            return package.read_part(package.numbering_part) is not None
+    except Exception:
+        return False
+
+def select_memory_mode(input_path, options):
+    """
+    判断是否使用低内存模式
+
+    options.lowMemory 为 true/false 时按其设置；未指定时，若设置了内存预算（options.memoryBudgetMb，
+    或环境变量 FORMATTER_MEMORY_BUDGET_MB，单位 MB）且估算的 DOM 引擎峰值内存超出预算，则自动开启。
+    估算值为当前常驻内存加上 document.xml 大小乘以 DOM_MEMORY_FACTOR。
+
+    Returns:
+        (是否低内存模式, 结果中的 memory 字段)；既未指定 lowMemory 也没有预算时 memory 字段为 None
+    """
+    low_memory = options.get('lowMemory')
+    budget = options.get('memoryBudgetMb')
+    if budget is None:
+        budget = os.environ.get('FORMATTER_MEMORY_BUDGET_MB') or None
+    if low_memory is None and budget is None:
+        return False, None
+    info = {}
+    if budget is not None:
+        budget = float(budget)
+        size = _main_part_size(input_path) or 0
+        estimated = (current_rss_mb() or 0) + size / (1024 * 1024) * DOM_MEMORY_FACTOR
+        info["budgetMb"] = budget
+        info["estimatedMb"] = round(estimated, 1)
+        if low_memory is None:
+            low_memory = estimated > budget
+    info["lowMemory"] = bool(low_memory)
+    return bool(low_memory), info
+
+def _get_scan_cache():
+    """扫描缓存实例；设置环境变量 FORMATTER_SCAN_CACHE=0 可关闭缓存"""
+    if os.environ.get('FORMATTER_SCAN_CACHE', '1') == '0':
+        return None
+    max_mb = float(os.environ.get('FORMATTER_CACHE_MAX_MB', DEFAULT_MAX_MB))
+    return DiskCache(default_cache_dir('scan'), max_bytes=int(max_mb * 1024 * 1024), suffix='.json.z')
+
+def scan_headings(input_path, base_font_size=12, use_cache=True, engine='auto', stories=False, offset=0, limit=None,
+                  compact=False):
     """
     扫描Word文档中的标题，智能识别并返回文档结构
     
+    扫描结果按 (文档内容 SHA-256, base_font_size, CLASSIFIER_VERSION) 缓存在本地磁盘，
+    重复扫描未修改的文档时直接返回缓存结果，不再解析文档。
+    
     Args:
         input_path: 输入Word文档路径
         base_font_size: 基础字号，默认12磅
+        use_cache: 是否使用扫描缓存
+        engine: "dom" | "stream" | "auto"（默认，document.xml 超过阈值时使用流式引擎，见 select_engine）
+        stories: 是否同时扫描表格、文本框、页眉页脚、脚注/尾注中的段落（见 stories.py）
+        offset/limit: 分页，只返回 structure 中第 offset 项起的 limit 项（limit 为 None 时到末尾）
+        compact: 以标题为主的紧凑结果：只有标题候选与有手动编号的段落保留完整记录，连续的正文段落合并为区间，
+                 返回 records / bodyRanges / total 代替 structure（见 compact_scan.py），忽略 offset/limit
         
     Returns:
         {
@@ -250,179 +409,215 @@ def scan_headings(input_path, base_font_size=12):
                         "clean_text": "项目建设目标"
                     }
                 },
+                {
+                    "index": "word/header1.xml:0",  # story 段落（仅 stories=True）：index 为段落键，可用于 mappings
+                    "location": {"story": "header", "part": "word/header1.xml", "container": "table",
+                                 "table": 0, "row": 1, "col": 2},
+                    ...
+                },
                 ...
             ],
-            "error": "错误信息"  # 仅当success=False时存在
+            "engine": "dom" | "stream",  # 实际使用的引擎，命中缓存时不存在
+            "total": 926,  # 仅分页或 compact 时存在，未分页的 structure 总项数
+            # 仅 compact 时存在，代替 structure（见 compact_scan.compact_structure）
+            "format": "compact",
+            "records": {"index": [...], "text": [...], "suggestedStyle": [...], ...},
+            "bodyRanges": {"start": [...], "end": [...], "count": [...], "offset": [...]},
+            "cache": {"hit": True/False, "lookupMs": 1.2},  # 仅当启用缓存时存在
+            "error": "错误信息",  # 仅当success=False时存在
+            "cancelled": True, "completed": {...}  # 仅当被取消时存在，见 format_document
         }
     """
     try:
-        doc = Document(input_path)
-        structure = []
-        
-        # 初始化编号清洗器
-        cleaner = ManualNumberingCleaner()
-        
-        # 定义样式名称转换函数（移到循环外部）
-        def get_display_style_name(style_name_raw):
-            """将 Word 内部样式名转换为用户友好的中文名称"""
-            if not style_name_raw:
-                return '正文'
-            style_display_map = {
-                'Normal': '正文',
-                'List Paragraph': '正文（列表）',
-                'Body Text': '正文',
-                'Body Text First Indent': '正文（首行缩进）',
-                'Body Text First Indent 2': '正文（首行缩进2）',
-                'Body Text Indent': '正文（缩进）',
-                'Heading 1': '标题 1',
-                'Heading 2': '标题 2',
-                'Heading 3': '标题 3',
-                'Heading 4': '标题 4',
-                'Title': '标题',
+        timings = profiling.active()
+        with timings.phase('cacheLookup'):
+            cache, cache_key, cache_info, structure = _lookup_scan_cache(input_path, base_font_size, stories, use_cache)
+        if structure is not None:
+            result = {
+                "success": True,
+                "structure": structure,
+                "cache": cache_info
             }
-            # 模糊匹配 Body Text 开头的样式
-            if style_name_raw.startswith('Body Text'):
-                return style_display_map.get(style_name_raw, '正文（' + style_name_raw.replace('Body Text', '').strip() + '）')
-            # 模糊匹配 List Paragraph 开头的样式
-            if style_name_raw.startswith('List Paragraph'):
-                suffix = style_name_raw.replace('List Paragraph', '').strip()
-                return '正文（列表' + (suffix if suffix else '') + '）'
-            return style_display_map.get(style_name_raw, style_name_raw)
-        
-        for idx, para in enumerate(doc.paragraphs):
-            text = para.text.strip()
-            if not text:
-                continue
-            
-            # 智能判断样式 - 优先使用 Word 原生样式名称
-            suggested_style = "body"  # 默认为正文
-            
-            # 1. 先检查 Word 样式名称（最可靠）
-            style_name = None
-            style_id = None
-            try:
-                if para.style:
-                    # 获取样式名称，并清理可能的格式描述
-                    raw_name = str(para.style.name) if para.style.name else None
-                    if raw_name:
-                        # 清洗逻辑：
-                        # 1. 如果以"样式 "开头，去掉这个前缀
-                        if raw_name.startswith('样式 '):
-                            raw_name = raw_name[3:]
-                        # 2. 如果包含'+', 取第一部分作为纯样式名
-                        if '+' in raw_name:
-                            raw_name = raw_name.split('+')[0].strip()
-                        # 3. 如果包含':', 取冒号前的部分
-                        if ':' in raw_name:
-                            raw_name = raw_name.split(':')[0].strip()
-                        style_name = raw_name.strip()
-                    style_id = para.style.style_id if hasattr(para.style, 'style_id') else None
-            except Exception:
-                pass
-            if style_name:
-                # 使用模糊匹配将 Word 样式名映射到我们的样式键
-                # 这样可以自动支持所有样式变体，无需硬编码完整列表
-                style_lower = style_name.lower()
-                
-                # 精确匹配优先
-                if style_lower == 'title' or style_lower == '标题':
-                    suggested_style = 'documentTitle'
-                elif style_lower == 'heading 1' or style_lower == '标题 1':
-                    suggested_style = 'heading1'
-                elif style_lower == 'heading 2' or style_lower == '标题 2':
-                    suggested_style = 'heading2'
-                elif style_lower == 'heading 3' or style_lower == '标题 3':
-                    suggested_style = 'heading3'
-                elif style_lower == 'heading 4' or style_lower == '标题 4':
-                    suggested_style = 'heading4'
-                # 模糊匹配：所有 Body Text、List Paragraph、Normal 及其变体都识别为 body
-                elif (style_lower == 'normal' or 
-                      style_lower == '正文' or 
-                      style_lower.startswith('body text') or 
-                      style_lower.startswith('list paragraph') or 
-                      style_lower.startswith('列出段落')):
-                    suggested_style = 'body'
-                
-                # 使用转换函数获取显示名称
-                display_style_name = get_display_style_name(style_name)
-                
-                # 如果匹配到已知样式，使用识别的样式键
-                if suggested_style != 'body':
-                    # 检测手动编号
-                    numbering_detection = cleaner.detect(text)
-                    
-                    item = {
-                        "index": idx,
-                        "text": text[:100],
-                        "suggestedStyle": suggested_style,
-                        "suggested_key": suggested_style,
-                        "style": display_style_name,  # 使用用户友好的显示名称
-                        "styleId": style_id or "",
-                        "originalStyleName": style_name  # 保留原始样式名称供调试
-                    }
-                    
-                    # 如果检测到手动编号，添加 manual_numbering 字段
-                    if numbering_detection:
-                        item["manual_numbering"] = {
-                            "type": numbering_detection["type"],
-                            "match": numbering_detection["raw_match"],
-                            "clean_text": numbering_detection["clean_text"]
-                        }
-                    
-                    structure.append(item)
-                    continue
-            
-            # 2. 如果样式名称无法识别，使用格式推断（兜底逻辑）
-            font_size = None
-            is_bold = False
-            alignment = para.alignment
-            
-            if para.runs:
-                first_run = para.runs[0]
-                if first_run.font.size:
-                    font_size = first_run.font.size.pt
-                if first_run.font.bold:
-                    is_bold = True
-            
-            # 格式推断判断逻辑
-            # 1. 文档标题：居中、加粗、字号最大（通常>=16pt）
-            if alignment == WD_ALIGN_PARAGRAPH.CENTER and is_bold and font_size and font_size >= 16:
-                suggested_style = "documentTitle"
-            # 2. 一级标题：加粗、字号较大（14-15pt）
-            elif is_bold and font_size and 14 <= font_size < 16:
-                suggested_style = "heading1"
-            # 3. 二级标题：加粗、字号中等（13pt左右）
-            elif is_bold and font_size and font_size == 13:
-                suggested_style = "heading2"
-            # 4. 三级标题：加粗、字号稍大于正文（12-12.5pt）
-            elif is_bold and font_size and 12 <= font_size < 13:
-                suggested_style = "heading3"
-            # 5. 四级标题：加粗、字号与正文相同
-            elif is_bold and font_size and font_size == base_font_size:
-                suggested_style = "heading4"
-            # 6. 正文：非加粗、普通字号
-            else:
-                suggested_style = "body"
+        else:
+            # DOM 引擎在 open 阶段加载整个文档；流式引擎边解析边识别，解析耗时计入 classify 阶段
+            progress.active().phase('open')
+            with timings.phase('open'):
+                engine = select_engine(input_path, engine)
+                items = _iter_structure(input_path, base_font_size, engine, stories)
+            with timings.phase('classify'):
+                structure = list(items)
+            result = {
+                "success": True,
+                "structure": structure,
+                "engine": engine
+            }
+            if cache is not None:
+                with timings.phase('cacheStore'):
+                    _store_scan_cache(cache, cache_key, structure)
+                result["cache"] = cache_info
+        if compact:
+            del result["structure"]
+            result["format"] = "compact"
+            result.update(compact_structure(structure))
+        elif offset or limit is not None:
+            result["total"] = len(structure)
+            result["structure"] = structure[offset:offset + limit if limit is not None else None]
+        return result
+    
+    except Cancelled as e:
+        return cancelled_result(e)
+    except Exception as e:
+        return {
+            "success": False,
+            "error": str(e)
+        }
 
-            # 汇总（使用友好的显示名称）
-            if style_name:
-                display_name = get_display_style_name(style_name)
-            else:
-                display_name = style_id or "正文"
-            
+def _lookup_scan_cache(input_path, base_font_size, stories, use_cache=True):
+    """
+    查询扫描缓存
+
+    Returns:
+        (cache, cache_key, cache_info, 缓存的 structure)；未启用缓存时前三项为 None，未命中时 structure 为 None
+    """
+    cache = _get_scan_cache() if use_cache else None
+    if cache is None:
+        return None, None, None, None
+    lookup_start = time.perf_counter()
+    try:
+        key_parts = (hash_file(input_path), base_font_size, CLASSIFIER_VERSION) + (('stories',) if stories else ())
+        cache_key = make_key(*key_parts)
+    except OSError:
+        # 文件无法读取时交给 Document() 报告原始错误
+        return None, None, None, None
+    cached = cache.get(cache_key)
+    structure = None
+    if cached is not None:
+        try:
+            structure = json.loads(zlib.decompress(cached).decode('utf-8'))
+        except Exception:
+            structure = None
+    cache_info = {
+        "hit": structure is not None,
+        "lookupMs": round((time.perf_counter() - lookup_start) * 1000, 3)
+    }
+    return cache, cache_key, cache_info, structure
+
+def _store_scan_cache(cache, cache_key, structure):
+    cache.put(cache_key, zlib.compress(
+        json.dumps(structure, ensure_ascii=False, separators=(',', ':')).encode('utf-8')))
+
+def scan_headings_stream(input_path, emit, base_font_size=12, use_cache=True, engine='stream', stories=False,
+                         offset=0, limit=None):
+    """
+    流式扫描：每识别出一个段落就立即通过 emit 输出一条记录，界面不必等整个文档扫描完成
+
+    只输出 structure 中第 offset 项起的 limit 项（limit 为 None 时输出到末尾）。输出够 limit 项后扫描仍会继续到
+    文档末尾，用于统计总数并写入扫描缓存，之后的翻页请求直接从缓存输出。
+
+    Args:
+        emit: 输出回调，每项接收 {"type": "paragraph", ...structure 项（见 scan_headings）}
+        engine: 默认 "stream"，边解析边输出；"dom" 需要先加载整个文档
+
+    Returns:
+        汇总信息: {"type": "summary", "success", "total", "offset", "limit", "emitted", "hasMore",
+                   "engine"（命中缓存时不存在）, "cache", "firstRecordMs", "elapsedMs", "error",
+                   "cancelled"/"completed"（仅当被取消时）}
+    """
+    started = time.perf_counter()
+    summary = {"type": "summary", "success": True, "total": 0, "offset": offset, "limit": limit, "emitted": 0}
+    first_record_ms = None
+    end = offset + limit if limit is not None else None
+    try:
+        timings = profiling.active()
+        with timings.phase('cacheLookup'):
+            cache, cache_key, cache_info, cached = _lookup_scan_cache(input_path, base_font_size, stories, use_cache)
+        if cached is not None:
+            items = iter(cached)
+        else:
+            progress.active().phase('open')
+            with timings.phase('open'):
+                engine = select_engine(input_path, engine)
+                summary["engine"] = engine
+                items = _iter_structure(input_path, base_font_size, engine, stories)
+        structure = []
+        # classify 阶段包含逐条输出记录的耗时
+        with timings.phase('classify'):
+            for position, item in enumerate(items):
+                structure.append(item)
+                if position >= offset and (end is None or position < end):
+                    record = {"type": "paragraph"}
+                    record.update(item)
+                    emit(record)
+                    summary["emitted"] += 1
+                    if first_record_ms is None:
+                        first_record_ms = round((time.perf_counter() - started) * 1000, 1)
+        summary["total"] = len(structure)
+        if cached is None and cache is not None:
+            with timings.phase('cacheStore'):
+                _store_scan_cache(cache, cache_key, structure)
+        if cache_info is not None:
+            summary["cache"] = cache_info
+    except Cancelled as e:
+        # 已输出的记录仍然有效
+        summary.update(cancelled_result(e))
+    except Exception as e:
+        summary["success"] = False
+        summary["error"] = str(e)
+    summary["hasMore"] = summary["success"] and offset + summary["emitted"] < summary["total"]
+    summary["firstRecordMs"] = first_record_ms
+    summary["elapsedMs"] = round((time.perf_counter() - started) * 1000, 1)
+    return summary
+
+def _classify_paragraph(idx, para, resolve_style, base_font_size, cleaner):
+    """
+    识别单个段落的建议样式，DOM 引擎与流式引擎共用
+
+    Args:
+        resolve_style: 返回段落样式信息（doc_index.StyleInfo）的函数 resolve_style(para)
+
+    Returns:
+        structure 中的一项；空段落返回 None
+    """
+    text = para.text.strip()
+    if not text:
+        return None
+
+    # 智能判断样式 - 优先使用 Word 原生样式名称
+    suggested_style = "body"  # 默认为正文
+
+    # 1. 先检查 Word 样式名称（最可靠）
+    # 样式名的清洗、显示名称与建议样式键都已在 StyleIndex 中按样式预先计算
+    style_name = None
+    style_id = None
+    info = None
+    try:
+        info = resolve_style(para)
+        if info is not None:
+            style_name = info.name
+            style_id = info.style_id
+    except Exception:
+        pass
+    if style_name:
+        suggested_style = info.suggested_key
+
+        # 用户友好的显示名称
+        display_style_name = info.display_name
+
+        # 如果匹配到已知样式，使用识别的样式键
+        if suggested_style != 'body':
             # 检测手动编号
             numbering_detection = cleaner.detect(text)
-            
+
             item = {
                 "index": idx,
                 "text": text[:100],
                 "suggestedStyle": suggested_style,
                 "suggested_key": suggested_style,
-                "style": display_name,
+                "style": display_style_name,  # 使用用户友好的显示名称
                 "styleId": style_id or "",
                 "originalStyleName": style_name  # 保留原始样式名称供调试
             }
-            
+
             # 如果检测到手动编号，添加 manual_numbering 字段
             if numbering_detection:
                 item["manual_numbering"] = {
@@ -430,461 +625,1490 @@ def scan_headings(input_path, base_font_size=12):
                     "match": numbering_detection["raw_match"],
                     "clean_text": numbering_detection["clean_text"]
                 }
-            
-            structure.append(item)
-        
-        return {
-            "success": True,
-            "structure": structure
-        }
-    
-    except Exception as e:
-        return {
-            "success": False,
-            "error": str(e)
+
+            return item
+
+    # 2. 如果样式名称无法识别，使用格式推断（兜底逻辑）
+    font_size = None
+    is_bold = False
+    alignment = para.alignment
+
+    if para.runs:
+        first_run = para.runs[0]
+        if first_run.font.size:
+            font_size = first_run.font.size.pt
+        if first_run.font.bold:
+            is_bold = True
+
+    # 格式推断判断逻辑
+    # 1. 文档标题：居中、加粗、字号最大（通常>=16pt）
+    if alignment == WD_ALIGN_PARAGRAPH.CENTER and is_bold and font_size and font_size >= 16:
+        suggested_style = "documentTitle"
+    # 2. 一级标题：加粗、字号较大（14-15pt）
+    elif is_bold and font_size and 14 <= font_size < 16:
+        suggested_style = "heading1"
+    # 3. 二级标题：加粗、字号中等（13pt左右）
+    elif is_bold and font_size and font_size == 13:
+        suggested_style = "heading2"
+    # 4. 三级标题：加粗、字号稍大于正文（12-12.5pt）
+    elif is_bold and font_size and 12 <= font_size < 13:
+        suggested_style = "heading3"
+    # 5. 四级标题：加粗、字号与正文相同
+    elif is_bold and font_size and font_size == base_font_size:
+        suggested_style = "heading4"
+    # 6. 正文：非加粗、普通字号
+    else:
+        suggested_style = "body"
+
+    # 汇总（使用友好的显示名称）
+    if style_name:
+        display_name = info.display_name
+    else:
+        display_name = style_id or "正文"
+
+    # 检测手动编号
+    numbering_detection = cleaner.detect(text)
+
+    item = {
+        "index": idx,
+        "text": text[:100],
+        "suggestedStyle": suggested_style,
+        "suggested_key": suggested_style,
+        "style": display_name,
+        "styleId": style_id or "",
+        "originalStyleName": style_name  # 保留原始样式名称供调试
+    }
+
+    # 如果检测到手动编号，添加 manual_numbering 字段
+    if numbering_detection:
+        item["manual_numbering"] = {
+            "type": numbering_detection["type"],
+            "match": numbering_detection["raw_match"],
+            "clean_text": numbering_detection["clean_text"]
         }
 
-def remove_style_level_numbering(doc):
-    """
-    移除文档样式定义中的自动编号配置 (w:numPr)
+    return item
+
+def _classify_stories(walker, root, resolve_style, base_font_size, cleaner):
+    """逐个产生 root 子树中 story 段落的识别结果，index 为段落键，并带有 location 字段"""
+    for key, location, p in walker.walk(root):
+        if key is None:
+            continue
+        item = _classify_paragraph(key, Paragraph(p, None), resolve_style, base_font_size, cleaner)
+        if item is not None:
+            item["location"] = location_info(location)
+            yield item
+
+def _classify_paragraphs(doc, base_font_size, stories=False):
+    """逐段识别样式，按文档顺序逐个产生 scan_headings 的 structure 项"""
+    cleaner = ManualNumberingCleaner()
+    style_index = StyleIndex.for_styles(doc.styles)
+    resolve_style = lambda p: style_index.paragraph_info(p._p.style)
+    timings = profiling.active()
+    if timings.enabled:
+        timings.count_elements(doc.element.body)
+        timings.count('images', sum(build_picture_index(doc.element.body).values()))
+    tracker = progress.active()
+    paragraphs = doc.paragraphs
+    tracker.phase('classify', len(paragraphs))
+    for idx, para in enumerate(paragraphs):
+        item = _classify_paragraph(idx, para, resolve_style, base_font_size, cleaner)
+        if item is not None:
+            yield item
+        tracker.step()
+    if stories:
+        walker = StoryWalker(str(doc.part.partname)[1:], 'body')
+        yield from _classify_stories(walker, doc.element.body, resolve_style, base_font_size, cleaner)
+        for part, part_name, story in dom_story_parts(doc.part):
+            element = part.element if isinstance(part, XmlPart) else parse_xml(part.blob)
+            yield from _classify_stories(StoryWalker(part_name, story), element, resolve_style, base_font_size, cleaner)
+
+def _classify_paragraphs_stream(input_path, base_font_size, stories=False):
+    """流式引擎：增量解析 document.xml，每识别一个 w:body 下的段落就立即产生对应的 structure 项"""
+    cleaner = ManualNumberingCleaner()
+    # 正文中的 story 段落先单独收集，保证与 DOM 引擎相同的顺序（正文段落在前）
+    story_structure = []
+    timings = profiling.active()
+    with StreamingPackage(input_path) as package:
+        style_index = StyleIndex.for_styles(_load_styles(package))
+        resolve_style = lambda p: style_index.paragraph_info(p._p.style)
+        walker = StoryWalker(package.main_part, 'body') if stories else None
+        idx = 0
+        # 按 w:body 子元素计数，总数未知
+        tracker = progress.active()
+        tracker.phase('classify')
+        for event, element in package.iter_body():
+            if event != 'body_child':
+                continue
+            tracker.step()
+            if timings.enabled:
+                timings.count_elements(element)
+                timings.count('images', sum(build_picture_index(element).values()))
+            if walker is not None:
+                story_structure.extend(_classify_stories(walker, element, resolve_style, base_font_size, cleaner))
+            if element.tag != W_P:
+                continue
+            item = _classify_paragraph(idx, Paragraph(element, None), resolve_style, base_font_size, cleaner)
+            if item is not None:
+                yield item
+            idx += 1
+        if stories:
+            yield from story_structure
+            for part_name, reltype in package.related_parts(package.main_part, STORY_RELTYPES):
+                element = package.read_part(part_name)
+                if element is not None:
+                    yield from _classify_stories(StoryWalker(part_name, STORY_RELTYPES[reltype]), element,
+                                                 resolve_style, base_font_size, cleaner)
+
+def _iter_structure(input_path, base_font_size, engine, stories):
+    """按 engine（"dom" | "stream"）逐个产生 structure 项"""
+    if engine == 'stream':
+        return _classify_paragraphs_stream(input_path, base_font_size, stories)
+    return _classify_paragraphs(Document(input_path), base_font_size, stories)
+
+def _load_styles(package):
+    """解析包中的 styles.xml，返回 python-docx Styles 对象；文档没有样式部件时返回 None"""
+    styles_element = package.read_part(package.styles_part)
+    return Styles(styles_element) if styles_element is not None else None
+
+def _apply_style_reference(para, style_config):
+    """参考实现：逐属性调用 python-docx setter 应用段落与字符格式"""
+    # 应用段落格式
+    para_format = para.paragraph_format
     
-    这会清除样式本身携带的编号定义,防止应用样式时自动添加编号
+    # 对齐方式
+    alignment_map = {
+        "left": WD_ALIGN_PARAGRAPH.LEFT,
+        "center": WD_ALIGN_PARAGRAPH.CENTER,
+        "right": WD_ALIGN_PARAGRAPH.RIGHT,
+        "justify": WD_ALIGN_PARAGRAPH.JUSTIFY,
+        "distribute": WD_ALIGN_PARAGRAPH.DISTRIBUTE
+    }
+    if "alignment" in style_config:
+        para_format.alignment = alignment_map.get(style_config["alignment"], WD_ALIGN_PARAGRAPH.LEFT)
     
-    Args:
-        doc: python-docx Document 对象
+    # 缩进（使用字符单位解决误差）
+    if "firstLineIndent" in style_config:
+        indent_chars = style_config["firstLineIndent"]
+        # 直接通过 XML 设置字符单位缩进 (100 = 1 字符)
+        pPr = para._element.get_or_add_pPr()
+        ind = pPr.get_or_add_ind()
+        ind.set(qn('w:firstLineChars'), str(int(indent_chars * 100)))
+        # 必须清除绝对单位的缩进设置，否则 Word 会优先使用它
+        para_format.first_line_indent = None
+    
+    # 行距：数值<=3 视为倍数，否则按磅数
+    if "lineSpacing" in style_config and style_config["lineSpacing"] is not None:
+        ls = style_config["lineSpacing"]
+        try:
+            pPr = para._element.get_or_add_pPr()
+            # 禁用网格对齐，确保磅数设置绝对精确 (1px 误差通常由于对齐网格引起)
+            snap = get_or_add_child(pPr, 'w:snapToGrid', PPR_TAG_SEQ)
+            snap.set(qn('w:val'), '0')
+            
+            if isinstance(ls, (int, float)) and ls <= 3:
+                para_format.line_spacing = float(ls)
+            else:
+                para_format.line_spacing = Pt(float(ls))
+        except Exception:
+            pass
+    
+    # 段前段后间距（磅）
+    if "spaceBefore" in style_config and style_config["spaceBefore"] is not None:
+        try:
+            para_format.space_before = Pt(float(style_config["spaceBefore"]))
+            # 清理 Word 可能残留的“行”单位间距属性，防止干扰
+            pPr = para._element.get_or_add_pPr()
+            spacing = pPr.get_or_add_spacing()
+            if spacing.get(qn('w:beforeLines')):
+                spacing.attrib.pop(qn('w:beforeLines'))
+        except Exception:
+            pass
+    if "spaceAfter" in style_config and style_config["spaceAfter"] is not None:
+        try:
+            para_format.space_after = Pt(float(style_config["spaceAfter"]))
+            # 同上，清理“行”单位间距属性
+            pPr = para._element.get_or_add_pPr()
+            spacing = pPr.get_or_add_spacing()
+            if spacing.get(qn('w:afterLines')):
+                spacing.attrib.pop(qn('w:afterLines'))
+        except Exception:
+            pass
+
+    # 应用字体格式到所有run
+    for run in para.runs:
+        # 字体
+        if "fontFamily" in style_config:
+            font_name = style_config["fontFamily"]
+            run.font.name = font_name
+            # 设置中文/西文字体
+            try:
+                r_pr = run._element.get_or_add_rPr()
+                r_fonts = r_pr.get_or_add_rFonts()
+                r_fonts.set(qn('w:ascii'), font_name)
+                r_fonts.set(qn('w:eastAsia'), font_name)
+                r_fonts.set(qn('w:hAnsi'), font_name)
+                r_fonts.set(qn('w:cs'), font_name)
+            except Exception:
+                pass
         
-    Returns:
-        移除的样式编号定义数量
-    """
-    removed_count = 0
-    try:
-        # 获取文档样式部件
-        styles_part = doc.part.styles
-        if not styles_part:
-            return 0
+        # 字号（磅）
+        if "fontSize" in style_config:
+            run.font.size = Pt(style_config["fontSize"])
+        
+        # 加粗
+        if "bold" in style_config:
+            run.font.bold = style_config["bold"]
         
-        # 遍历所有段落样式
-        for style in styles_part:
+        # 颜色（十六进制）
+        if "color" in style_config:
+            color_hex = style_config["color"].lstrip('#')
+            r = int(color_hex[0:2], 16)
+            g = int(color_hex[2:4], 16)
+            b = int(color_hex[4:6], 16)
+            run.font.color.rgb = RGBColor(r, g, b)
+
+# 样式键对应的 Word 内置段落样式名
+STYLE_NAME_MAP = {
+    'documentTitle': 'Title',
+    'heading1': 'Heading 1',
+    'heading2': 'Heading 2',
+    'heading3': 'Heading 3',
+    'heading4': 'Heading 4',
+    'body': 'Normal'
+}
+
+# 兼容前端别名：title/normal -> documentTitle/body
+STYLE_KEY_ALIASES = {'title': 'documentTitle', 'normal': 'body'}
+
+class _FormatJob:
+    """单次格式化任务的状态与逐段落处理逻辑，DOM 引擎与流式引擎共用"""
+
+    def __init__(self, profile, mappings, text_replacements, enable_auto_numbering, options):
+        # 兼容前端 profile 结构：可能为 { styles: {...}, specialRules: {...} }
+        self.styles_dict = profile.get('styles') if isinstance(profile, dict) and 'styles' in profile else profile
+        self.special_rules = profile.get('specialRules', {}) if isinstance(profile, dict) else {}
+        self.mappings = mappings
+        self.text_replacements = text_replacements
+        self.enable_auto_numbering = enable_auto_numbering
+        self.options = options
+        self.format_mode = options.get('formatMode', 'direct')
+        if self.format_mode not in ('direct', 'styles'):
+            raise ValueError(f"未知的格式化模式: {self.format_mode}")
+        # 编译式样式计划（参考模式下为 None，走逐属性设置的原始路径；样式模式总是使用编译模板）
+        use_reference = options.get('styleEngine') == 'reference' and self.format_mode == 'direct'
+        self.style_plan = None if use_reference else StylePlan(self.styles_dict)
+        # 样式模式下已写入样式定义的样式键 {样式键: styleId}
+        self.style_definitions = {}
+        # 剖析会话的计时器（未开启时为空实现，见 profiling.py）
+        self.timings = profiling.active()
+        # 进度事件与取消（未开启时为空实现，见 progress.py）
+        self.progress = progress.active()
+        # 特殊规则：在同一次遍历中执行的各个 pass（见 passes.py）
+        self.passes = PassPipeline(self.special_rules, self.timings)
+        # 表格、文本框、页眉页脚、脚注等位置的段落使用的样式键 {位置: 样式键}（见 stories.py）
+        self.location_styles = (profile.get('locationStyles') or {}) if isinstance(profile, dict) else {}
+        # 只有配置了位置样式，或 mappings 中指定了 story 段落键（"部件名:序号"）时才遍历这些段落
+        self.stories = bool(self.location_styles) or has_story_keys(mappings)
+        self.story_paragraphs = 0
+        # 初始化编号管理器
+        self.numbering_manager = NumberingManager(profile)
+        # 自动编号方式："text"（默认，在段落前插入编号文本）| "native"（numbering.xml 中的多级列表，见 native_numbering.py）
+        numbering_mode = options.get('numberingMode', 'text')
+        if numbering_mode not in ('text', 'native'):
+            raise ValueError(f"未知的编号方式: {numbering_mode}")
+        # 原生编号：加入列表的标题级别、标题列表的 numId（prepare_numbering 之后）与当前段落引用的级别
+        self.list_levels = list_levels(profile.get('styles')) if isinstance(profile, dict) else ()
+        native = numbering_mode == 'native' and enable_auto_numbering and bool(self.list_levels)
+        # 原生列表无法显示与文本模式相同的编号时退回文本模式，结果中给出原因
+        self.numbering_fallback = native_unsupported(profile.get('styles')) if native else None
+        self.native_numbering = native and self.numbering_fallback is None
+        self.list_num_id = None
+        self.list_level = None
+        # 推进了自动编号计数的正文段落 {段落索引: 编号文本}，增量格式化据此判断编号是否变化（见 incremental.py）
+        self.numbers = {}
+        self.body_paragraphs = 0
+        self.image_paragraphs = {}
+        # 低内存模式：逐个产生轻量段落代理，不建立整份 Paragraph 列表（见 paragraphs.py、select_memory_mode）
+        self.low_memory = False
+
+    def paragraph(self, p):
+        """w:p 元素对应的段落对象：低内存模式下为 ParagraphProxy"""
+        return ParagraphProxy(p) if self.low_memory else Paragraph(p, None)
+
+    def prepare_styles(self, styles, style_index):
+        """
+        遍历正文之前处理样式定义：特殊规则（如移除样式级编号）与样式模式下写入规范
+
+        Returns:
+            是否修改了 styles.xml
+        """
+        modified = False
+        if styles is not None and self.passes.needs_styles:
+            modified = self.passes.prepare_styles(styles)
+        if self.write_style_definitions(styles, style_index):
+            modified = True
+        return modified
+
+    def prepare_numbering(self, numbering):
+        """原生编号：遍历正文之前在 numbering.xml 的根元素中写入标题多级列表定义"""
+        self.list_num_id = ensure_list_definition(numbering, self.numbering_manager.profile.get('styles'))
+
+    def write_style_definitions(self, styles, style_index):
+        """
+        样式模式：把各样式键编译后的模板写入对应 Word 样式（Title、Heading 1-4、Normal）的定义
+
+        文档中找不到的样式跳过，映射到该样式键的段落仍使用直接格式。
+        写入之前先把基于这些样式的其他段落样式原先继承的取值写入其定义（见 pin_inherited_properties），
+        避免正文配置经 Normal 传给标题、题注、目录等样式。
+
+        Returns:
+            是否修改了样式定义
+        """
+        if self.format_mode != 'styles' or not self.styles_dict:
+            return False
+        targets = []
+        for style_key, style_name in STYLE_NAME_MAP.items():
+            if style_key not in self.styles_dict:
+                continue
+            try:
+                style = styles.get_by_id(style_index.paragraph_style_id(style_name), WD_STYLE_TYPE.PARAGRAPH)
+            except Exception:
+                continue
+            if style is None:
+                continue
+            targets.append((style_key, style, self.style_plan.get(style_key)))
+        if not targets:
+            return False
+        pinned = pin_inherited_properties(styles.element, {style.style_id: compiled for _, style, compiled in targets})
+        logger.debug(f"样式模式：{pinned} 个样式写入了继承值")
+        for style_key, style, compiled in targets:
+            compiled.apply_definition(style.element)
+            self.style_definitions[style_key] = style.style_id
+        return True
+
+    def format_paragraph(self, idx, para, image_count, assign_style):
+        """
+        格式化正文中的单个段落（doc.paragraphs 中的第 idx 个），并在段落结束时执行各特殊规则的收尾处理
+
+        Args:
+            image_count: 段落包含的图片数量
+            assign_style: 为段落设置 Word 样式的函数 assign_style(para, 样式名)，失败时抛出异常
+        """
+        self._format_paragraph(idx, str(idx), para, image_count, self.body_style_key(idx), assign_style)
+        self.passes.finish(idx, para)
+        # 原生编号在最后引用列表：应用样式与特殊规则都会清除段落上的 w:numPr
+        if self.list_level is not None:
+            apply_list_level(para._p, self.list_num_id, self.list_level)
+            self.list_level = None
+        self.body_paragraphs += 1
+
+    def advance_numbering(self, idx, p):
+        """
+        只推进自动编号计数，与 format_paragraph 处理正文第 idx 个段落（w:p 元素 p）时对计数的修改相同；
+        用于并行引擎计算每块开始时的计数
+        """
+        style_key = STYLE_KEY_ALIASES.get(self.body_style_key(idx), self.body_style_key(idx))
+        if style_key not in self.numbering_manager.counters:
+            return
+        # 没有文字的纯图片段落不编号
+        if build_picture_index(p).get(p, 0):
+            key = str(idx)
+            if self.text_replacements and key in self.text_replacements:
+                text = self.text_replacements[key]
+            else:
+                text = p.text
+            if not text.strip():
+                return
+        self.numbering_manager.next_number(style_key)
+
+    def body_style_key(self, idx):
+        """正文第 idx 个段落的样式键（未映射时为 body）"""
+        return self.mappings.get(str(idx), "body") if self.mappings else "body"
+
+    def format_story_paragraph(self, key, location, para, image_count, assign_style):
+        """
+        格式化表格、文本框、页眉页脚、脚注等位置的段落（见 stories.py）
+
+        样式键依次取 mappings[段落键]、locationStyles[容器]（table/textbox）、locationStyles[story]
+        （body/header/footer/footnote/endnote）；都没有时不处理该段落。story 段落不应用自动编号。
+
+        Returns:
+            是否处理了该段落
+        """
+        style_key = self.mappings.get(key) if self.mappings and key is not None else None
+        if style_key is None:
+            style_key = self.location_styles.get(location.container) or self.location_styles.get(location.story)
+        if style_key is None:
+            return False
+        self._format_paragraph(key, key, para, image_count, style_key, assign_style, numbering=False)
+        self.passes.finish(key, para)
+        self.story_paragraphs += 1
+        return True
+
+    def format_stories(self, walker, root, picture_index, assign_style):
+        """
+        格式化 root 子树中的 story 段落
+
+        Returns:
+            处理的段落数
+        """
+        formatted = 0
+        for key, location, p in walker.walk(root):
+            if self.format_story_paragraph(key, location, self.paragraph(p), picture_index.get(p, 0), assign_style):
+                formatted += 1
+            self.progress.step()
+        return formatted
+
+    def _format_paragraph(self, idx, key, para, image_count, style_key, assign_style, numbering=True):
+        styles_dict = self.styles_dict
+        passes = self.passes
+
+        # 0. 优先应用文本替换 (用户纠偏)
+        if self.text_replacements and key in self.text_replacements:
+            new_text = self.text_replacements[key]
+            # 如果新文本为空，是否应该删除段落？
+            # 目前逻辑：如果为空字符串，则清空段落内容
+            # 注意：直接赋值 para.text 会清除所有原有格式(runs)，但对于标题纠偏通常是可以接受的
+            para.text = new_text
+
+        text = para.text.strip()
+
+        # 检测图片段落（特殊规则优先处理）
+        has_picture = image_count > 0
+        if has_picture and key is not None:
+            self.image_paragraphs[key] = image_count
+
+        # 特殊规则：图片单倍行距、图片居中等
+        passes.before_style(idx, para, image_count)
+
+        # 如果是纯图片段落且无文本，跳过后续文字格式处理
+        if has_picture and not text:
+            return
+
+        style_key = STYLE_KEY_ALIASES.get(style_key, style_key)
+
+        # --- 关键：先应用 Word 内置样式，防止覆盖后续的直接格式 ---
+        if style_key in STYLE_NAME_MAP:
             try:
-                # 只处理段落样式
-                if not hasattr(style, 'type') or style.type != WD_STYLE_TYPE.PARAGRAPH:
+                assign_style(para, STYLE_NAME_MAP[style_key])
+            except Exception:
+                pass
+
+        # 应用自动编号（受开关控制，且样式中需启用numbering）
+        # 注意：这会修改段落文本，必须在后续格式应用之前执行
+        if numbering and self.enable_auto_numbering:
+            if self.list_num_id is not None:
+                # 原生编号：只推进计数，段落处理结束时引用列表的对应级别
+                number = self.numbering_manager.next_number(style_key)
+                if number is not None and style_key in self.list_levels:
+                    self.list_level = style_key
+            else:
+                number = self.numbering_manager.process_paragraph(para, style_key)
+            if number is not None:
+                self.numbers[key] = number
+
+        # 获取对应的样式配置
+        if not styles_dict or style_key not in styles_dict:
+            return
+        style_config = styles_dict[style_key]
+
+        p = para._p
+        if self.style_plan is not None:
+            compiled_style = self.style_plan.get(style_key)
+            if style_key in self.style_definitions:
+                # 样式模式：格式已写入样式定义，只去掉会覆盖样式的直接格式
+                compiled_style.strip_paragraph(p)
+                apply_run = compiled_style.strip_run
+            else:
+                # 编译模式：把预编译的 pPr/rPr 模板直接合并进 XML
+                compiled_style.apply_paragraph(p)
+                apply_run = compiled_style.apply_run
+            run_hooks = passes.has_run_hooks
+            for r in p.r_lst:
+                apply_run(r)
+                if run_hooks:
+                    passes.on_run(idx, r)
+        else:
+            _apply_style_reference(para, style_config)
+            if passes.has_run_hooks:
+                for r in p.r_lst:
+                    passes.on_run(idx, r)
+
+        # 特殊规则：重置缩进与间距等
+        passes.after_style(idx, para)
+
+        # 再次移除自动编号，避免样式切换引入的编号定义残留
+        try:
+            pPr = p.pPr
+            if pPr is not None and pPr.numPr is not None:
+                pPr.remove(pPr.numPr)
+        except Exception:
+            pass
+
+def _style_assigner(style_index):
+    """
+    返回为段落设置 Word 样式的函数 assign_style(para, 样式名)
+
+    等价于 para.style = 样式名，但样式名到 styleId 的解析由 StyleIndex 缓存，不必每个段落都查找 styles.xml。
+    """
+    def assign_style(para, style_name):
+        para._p.style = style_index.paragraph_style_id(style_name)
+    return assign_style
+
+def _format_with_dom(job, input_path, output_path):
+    """
+    DOM 引擎：用 python-docx 加载整个文档，处理后只重新写出修改过的部件
+
+    Returns:
+        (run 合并统计, 部件写出统计)
+    """
+    timings = job.timings
+    tracker = job.progress
+    tracker.phase('open')
+    with timings.phase('open'):
+        doc = Document(input_path)
+    # 会被修改、需要重新序列化的部件；其余部件保存时原样复制
+    changed_parts = [doc.part]
+    timings.count_elements(doc.element.body)
+
+    tracker.phase('styles')
+    with timings.phase('styles'):
+        styles = doc.styles
+        style_index = StyleIndex.for_styles(styles)
+        assign_style = _style_assigner(style_index)
+
+        # 遍历正文前处理样式定义（特殊规则、样式模式）
+        if job.prepare_styles(styles, style_index):
+            changed_parts.append(doc.part.part_related_by(RT.STYLES))
+        if job.native_numbering:
+            # 文档没有 numbering.xml 时 python-docx 会新建（保存时退回整体保存）
+            numbering_part = doc.part.numbering_part
+            job.prepare_numbering(numbering_part.element)
+            changed_parts.append(numbering_part)
+
+    # 规范化：合并相邻的同格式 run，减少后续逐 run 处理的次数
+    run_counts = None
+    if job.options.get('coalesceRuns'):
+        with timings.phase('coalesceRuns'):
+            runs_before, runs_after = coalesce_runs(doc.element.body)
+        run_counts = {"before": runs_before, "after": runs_after}
+
+    # 一次遍历建立图片段落索引 {w:p 元素: 图片数量}
+    with timings.phase('pictureIndex'):
+        picture_index = build_picture_index(doc.element.body)
+
+    # 遍历段落应用格式（特殊规则在同一次遍历中执行）
+    tracker.phase('paragraphs', sum(1 for _ in doc.element.body.iterchildren(W_P)) if tracker.enabled else None)
+    with timings.phase('paragraphs'):
+        paragraphs = iter_paragraphs(doc.element.body) if job.low_memory else doc.paragraphs
+        for idx, para in enumerate(paragraphs):
+            job.format_paragraph(idx, para, picture_index.get(para._p, 0), assign_style)
+            tracker.step()
+
+    # 表格、文本框、页眉页脚、脚注等位置的段落：每个部件一次遍历
+    if job.stories:
+        tracker.phase('stories')
+        with timings.phase('stories'):
+            job.format_stories(StoryWalker(str(doc.part.partname)[1:], 'body'), doc.element.body, picture_index,
+                               assign_style)
+            for part, part_name, story in dom_story_parts(doc.part):
+                # 页眉页脚为 XmlPart；python-docx 不解析脚注/尾注部件，需要自行解析并回写 blob
+                element = part.element if isinstance(part, XmlPart) else parse_xml(part.blob)
+                if job.format_stories(StoryWalker(part_name, story), element, build_picture_index(element),
+                                      assign_style):
+                    if not isinstance(part, XmlPart):
+                        part._blob = serialize_part(element)
+                    changed_parts.append(part)
+
+    # 保存文档：只重新压缩修改过的部件，图片等其余部件直接复制压缩数据
+    tracker.phase('save')
+    with timings.phase('save'):
+        package_stats = save_document(doc, input_path, output_path, changed_parts)
+    return run_counts, package_stats
+
+def _format_with_stream(job, input_path, output_path):
+    """
+    流式引擎：逐个解析、处理并写出 w:body 的子元素，内存中只保留当前元素
+
+    Returns:
+        (run 合并统计, 部件写出统计)
+
+    与 DOM 引擎逐段落等价；样式定义的修改作用于单独解析的 styles.xml，
+    其余部件（图片、页眉页脚等）按原样复制。
+    """
+    timings = job.timings
+    tracker = job.progress
+    with StreamingPackage(input_path) as package:
+        tracker.phase('styles')
+        with timings.phase('styles'):
+            assign_style, replaced_parts = _prepare_stream_parts(job, package)
+
+        # 页眉页脚、脚注等部件较小，整体解析后处理，随包一起写出
+        body_walker = None
+        if job.stories:
+            body_walker = StoryWalker(package.main_part, 'body')
+            tracker.phase('stories')
+            with timings.phase('stories'):
+                for part_name, reltype in package.related_parts(package.main_part, STORY_RELTYPES):
+                    element = package.read_part(part_name)
+                    if element is None:
+                        continue
+                    walker = StoryWalker(part_name, STORY_RELTYPES[reltype])
+                    if job.format_stories(walker, element, build_picture_index(element), assign_style):
+                        replaced_parts[part_name] = element
+
+        coalesce = job.options.get('coalesceRuns')
+        run_counts = {"before": 0, "after": 0} if coalesce else None
+        paragraph_count = 0
+        # 开启剖析时逐元素计时；未开启时直接使用不计时的 transform
+        phase = timings.phase if timings.enabled else None
+
+        def transform(element):
+            nonlocal paragraph_count
+            tracker.step()
+            timings.count_elements(element)
+            if coalesce:
+                runs_before, runs_after = coalesce_runs(element)
+                run_counts["before"] += runs_before
+                run_counts["after"] += runs_after
+            if element.tag != W_P and body_walker is None:
+                return
+            picture_index = build_picture_index(element)
+            if element.tag == W_P:
+                job.format_paragraph(paragraph_count, job.paragraph(element), picture_index.get(element, 0), assign_style)
+                paragraph_count += 1
+            if body_walker is not None:
+                job.format_stories(body_walker, element, picture_index, assign_style)
+
+        def timed_transform(element):
+            with phase('paragraphs'):
+                transform(element)
+
+        # 流式引擎边解析边处理边写出：rewrite 阶段包含解析、写出与 paragraphs 阶段；
+        # 进度按 w:body 子元素计数，总数未知。被取消时 rewrite 删除临时文件
+        tracker.phase('paragraphs')
+        with timings.phase('rewrite'):
+            package_stats = package.rewrite(output_path, timed_transform if phase else transform, replaced_parts)
+    return run_counts, package_stats
+
+def _prepare_stream_parts(job, package):
+    """
+    流式引擎遍历正文前处理样式定义（特殊规则、样式模式）与原生编号的列表定义
+
+    Returns:
+        (assign_style, 需要替换的部件 {部件名: 元素})
+    """
+    styles = _load_styles(package)
+    style_index = StyleIndex.for_styles(styles)
+    replaced_parts = {}
+    if job.prepare_styles(styles, style_index):
+        replaced_parts[package.styles_part] = styles.element
+    if job.native_numbering:
+        numbering = package.read_part(package.numbering_part)
+        job.prepare_numbering(numbering)
+        replaced_parts[package.numbering_part] = numbering
+    return _style_assigner(style_index), replaced_parts
+
+# 并行引擎：每个子进程平均分到的块数（块越多负载越均衡，但每块都要单独传输与解析）
+PARALLEL_CHUNKS_PER_WORKER = 4
+# 块的最小大小（document.xml 解压后的字节数），块太小时进程间传输的开销超过并行的收益
+PARALLEL_MIN_CHUNK_BYTES = 256 * 1024
+
+def select_parallel_workers(options):
+    """options.parallelWorkers 对应的子进程数："auto" 为 CPU 核数；未指定时为 1（不并行）"""
+    workers = options.get('parallelWorkers')
+    if workers is None or workers is False:
+        return 1
+    if workers == 'auto':
+        return os.cpu_count() or 1
+    return max(1, int(workers))
+
+# 并行引擎子进程中的 (job, assign_style)，由 _init_chunk_worker 设置
+_chunk_worker = None
+
+def _init_chunk_worker(input_path, job_args, low_memory):
+    """并行引擎子进程的初始化：按同样的参数建立任务，在自己的副本上处理样式定义与原生编号的列表定义"""
+    global _chunk_worker
+    # 取消由主进程处理（见 progress.py），子进程不响应终端的 Ctrl+C；
+    # 命令行在主进程中把 SIGTERM 改为设置取消标记，fork 出的子进程恢复默认处理，Pool 退出时才能结束子进程
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    if hasattr(signal, 'SIGTERM'):
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    job = _FormatJob(*job_args)
+    job.low_memory = low_memory
+    with StreamingPackage(input_path) as package:
+        assign_style, _ = _prepare_stream_parts(job, package)
+    _chunk_worker = (job, assign_style)
+
+def _format_chunk(context, fragments, start, counters):
+    """
+    在子进程中格式化一块连续的 w:body 子元素，与流式引擎逐元素的处理相同
+
+    Args:
+        context: 解析片段所需的上下文（streaming.FragmentContext）
+        fragments: serialize_body_child 产生的片段
+        start: 块中第一个段落在正文中的索引
+        counters: 块开始时的自动编号计数（NumberingManager.snapshot）
+
+    Returns:
+        (处理后的片段拼接成的字节串, 块内的统计)
+    """
+    job, assign_style = _chunk_worker
+    job.numbering_manager.restore(dict(counters))
+    job.passes = PassPipeline(job.special_rules)
+    job.numbers = {}
+    job.image_paragraphs = {}
+    job.body_paragraphs = 0
+    coalesce = job.options.get('coalesceRuns')
+    runs = [0, 0]
+    output = []
+    idx = start
+    for element in parse_body_fragments(context, fragments):
+        if coalesce:
+            runs_before, runs_after = coalesce_runs(element)
+            runs[0] += runs_before
+            runs[1] += runs_after
+        if element.tag == W_P:
+            picture_index = build_picture_index(element)
+            job.format_paragraph(idx, job.paragraph(element), picture_index.get(element, 0), assign_style)
+            idx += 1
+        output.append(serialize_body_child(element, context.declarations))
+    stats = {"paragraphs": job.body_paragraphs, "numbers": job.numbers, "images": job.image_paragraphs,
+             "rules": job.passes.counters(), "durations": job.passes.durations(), "runs": runs}
+    return b''.join(output), stats
+
+def _format_with_parallel(job, input_path, output_path, workers, job_args):
+    """
+    并行引擎：把正文分成连续的块，在多个子进程中格式化后按顺序写回，输出与流式引擎逐字节相同
+
+    主进程增量解析 document.xml，把 w:body 子元素序列化为片段并按大小分块，同时按顺序执行一遍只推进
+    自动编号计数的前缀扫描（advance_numbering），记下每块开始时的计数；子进程恢复计数后逐段处理（_format_chunk）。
+    同时在处理中的块不超过子进程数的两倍，内存中只保留这些块。
+
+    Args:
+        job_args: 建立 _FormatJob 的参数，子进程按同样的参数建立任务
+
+    Returns:
+        (run 合并统计, 部件写出统计, {"workers": 子进程数, "chunks": 块数})
+    """
+    timings = job.timings
+    tracker = job.progress
+    with StreamingPackage(input_path) as package:
+        tracker.phase('styles')
+        with timings.phase('styles'):
+            assign_style, replaced_parts = _prepare_stream_parts(job, package)
+        chunk_bytes = max(PARALLEL_MIN_CHUNK_BYTES,
+                          package.part_size(package.main_part) // (workers * PARALLEL_CHUNKS_PER_WORKER))
+        run_counts = {"before": 0, "after": 0} if job.options.get('coalesceRuns') else None
+        info = {"workers": workers, "chunks": 0}
+        numbering = job.enable_auto_numbering
+
+        def write_main_part(stream):
+            # 按输出顺序排列的待写内容：原样写出的字节串，或子进程中处理中的块
+            pending = collections.deque()
+            in_flight = 0
+
+            def drain(limit):
+                nonlocal in_flight
+                while pending:
+                    head = pending[0]
+                    if isinstance(head, bytes):
+                        stream.write(head)
+                    elif head.ready() or in_flight > limit:
+                        if not head.ready():
+                            head.wait(CANCEL_CHECK_INTERVAL)
+                            tracker.check()
+                            continue
+                        data, stats = head.get()
+                        stream.write(data)
+                        in_flight -= 1
+                        job.body_paragraphs += stats["paragraphs"]
+                        job.numbers.update(stats["numbers"])
+                        job.image_paragraphs.update(stats["images"])
+                        job.passes.add_counters(stats["rules"], stats["durations"])
+                        if run_counts is not None:
+                            run_counts["before"] += stats["runs"][0]
+                            run_counts["after"] += stats["runs"][1]
+                        tracker.step(stats["paragraphs"])
+                    else:
+                        return
+                    pending.popleft()
+
+            with multiprocessing.get_context().Pool(workers, initializer=_init_chunk_worker,
+                                                    initargs=(input_path, job_args, job.low_memory)) as pool:
+                fragments = []
+                size = 0
+                start = paragraph = 0
+                counters = None
+
+                def submit():
+                    nonlocal fragments, size, in_flight
+                    if fragments:
+                        pending.append(pool.apply_async(_format_chunk, (package.fragment_context, fragments,
+                                                                        start, counters)))
+                        in_flight += 1
+                        info["chunks"] += 1
+                        fragments, size = [], 0
+
+                for event, data in package.iter_main_part():
+                    if event != 'body_child':
+                        submit()
+                        pending.append(data)
+                        continue
+                    timings.count_elements(data)
+                    # 进度按完成的块计数，这里只检查取消（按间隔节流）
+                    tracker.step(0)
+                    if not fragments:
+                        start = paragraph
+                        counters = job.numbering_manager.snapshot()
+                    if data.tag == W_P:
+                        if numbering:
+                            job.advance_numbering(paragraph, data)
+                        paragraph += 1
+                    fragment = serialize_body_child(data, package.fragment_context.declarations)
+                    fragments.append(fragment)
+                    size += len(fragment)
+                    if size >= chunk_bytes:
+                        submit()
+                        drain(workers * 2)
+                submit()
+                drain(0)
+
+        # 主进程的解析、分块、前缀扫描、写出与子进程的处理并行进行，都计入 rewrite 阶段
+        tracker.phase('paragraphs')
+        with timings.phase('rewrite'):
+            package_stats = rewrite_package(input_path, output_path,
+                                            {name: serialize_part(element) for name, element in replaced_parts.items()},
+                                            {package.main_part: write_main_part})
+    return run_counts, package_stats, info
+
+def _source_paragraphs(input_path):
+    """输入文档正文的直接子段落（与 doc.paragraphs 一一对应），只解析 document.xml"""
+    with StreamingPackage(input_path) as package:
+        document = package.read_part(package.main_part)
+    body = document.find(qn('w:body')) if document is not None else None
+    return [child for child in body if child.tag == W_P] if body is not None else []
+
+def _format_incremental(job, input_path, output_path, previous_output, state, changed):
+    """
+    增量格式化：在上一次的输出上只重新处理 changed 中的段落，以及自动编号随之变化的段落
+
+    需要重新处理的段落先替换为输入文档中的原始段落，再按完整格式化的方式处理，因此输出与完整格式化一致。
+    样式定义的处理（移除样式级编号、样式模式写入定义）是幂等的，在上一次的输出上再执行一次。
+
+    Returns:
+        (run 合并统计, 部件写出统计, 跳过的段落数)；段落数与状态不符时返回 None（job 已部分修改，不能再使用）
+    """
+    timings = job.timings
+    tracker = job.progress
+    tracker.phase('open')
+    with timings.phase('open'):
+        doc = Document(previous_output)
+        paragraphs = doc.paragraphs
+    if len(paragraphs) != state.paragraphs:
+        return None
+    changed_parts = [doc.part]
+
+    tracker.phase('styles')
+    with timings.phase('styles'):
+        styles = doc.styles
+        style_index = StyleIndex.for_styles(styles)
+        assign_style = _style_assigner(style_index)
+        if job.prepare_styles(styles, style_index):
+            changed_parts.append(doc.part.part_related_by(RT.STYLES))
+        if job.native_numbering:
+            numbering_part = doc.part.numbering_part
+            job.prepare_numbering(numbering_part.element)
+            changed_parts.append(numbering_part)
+
+    coalesce = job.options.get('coalesceRuns')
+    run_counts = {"before": 0, "after": 0} if coalesce else None
+    manager = job.numbering_manager
+    source = None
+    restyled = set()
+    tracker.phase('paragraphs', len(paragraphs))
+    with timings.phase('paragraphs'):
+        for idx, para in enumerate(paragraphs):
+            tracker.step()
+            key = str(idx)
+            if key not in changed:
+                # 样式键与文本未变：只有自动编号可能因前面的标题变化而改变
+                previous_number = state.numbering.get(key)
+                if previous_number is None:
                     continue
-                
-                # 获取样式的 XML 元素
-                style_element = style.element
-                
-                # 查找 pPr (段落属性)
-                pPr = None
-                for child in style_element:
-                    if child.tag == qn('w:pPr'):
-                        pPr = child
-                        break
-                
-                if pPr is None:
+                counters = manager.snapshot()
+                style_key = STYLE_KEY_ALIASES.get(job.body_style_key(idx), job.body_style_key(idx))
+                if manager.next_number(style_key) == previous_number:
+                    job.numbers[key] = previous_number
                     continue
-                
-                # 查找并移除所有 numPr 节点
-                numPr_nodes = [child for child in pPr if child.tag == qn('w:numPr')]
-                if numPr_nodes:
-                    for numPr in numPr_nodes:
-                        pPr.remove(numPr)
-                    removed_count += 1
-                    print(f"✓ 样式 [{style.name}] 已移除编号定义", file=sys.stderr)
-                    
-            except Exception as e:
-                print(f"✗ 处理样式失败: {str(e)}", file=sys.stderr)
-        
-    except Exception as e:
-        print(f"✗ 移除样式级编号失败: {str(e)}", file=sys.stderr)
-    
-    return removed_count
+                manager.restore(counters)
+            if source is None:
+                source = _source_paragraphs(input_path)
+                if len(source) != len(paragraphs):
+                    return None
+            p = copy.deepcopy(source[idx])
+            para._p.getparent().replace(para._p, p)
+            if coalesce:
+                runs_before, runs_after = coalesce_runs(p)
+                run_counts["before"] += runs_before
+                run_counts["after"] += runs_after
+            job.format_paragraph(idx, Paragraph(p, para._parent), build_picture_index(p).get(p, 0), assign_style)
+            restyled.add(key)
+
+    # 跳过的段落沿用上一次的图片统计与 story 段落数
+    images = {key: count for key, count in state.images.items() if key not in restyled}
+    images.update(job.image_paragraphs)
+    job.image_paragraphs = images
+    job.body_paragraphs = len(paragraphs)
+    job.story_paragraphs = state.story_paragraphs
 
-def remove_paragraph_numbering(paragraph):
+    tracker.phase('save')
+    with timings.phase('save'):
+        package_stats = save_document(doc, previous_output, output_path, changed_parts)
+    return run_counts, package_stats, len(paragraphs) - len(restyled)
+
+def _try_incremental(job, input_path, output_path, previous_output, input_hash, fingerprint):
     """
-    移除单个段落的自动编号属性 (w:numPr)
-    
-    这不会影响用户手打的 "1." 文本,只移除 Word 的自动列表格式
-    
-    Args:
-        paragraph: python-docx Paragraph 对象
-        
+    尝试增量格式化（见 incremental.py）
+
     Returns:
-        dict: {"removed": bool, "level": int or None}
+        ((run 合并统计, 部件写出统计) 或 None, 结果中的 incremental 字段)；返回 None 时需用新的 job 完整格式化
     """
-    result = {"removed": False, "level": None}
-    
-    try:
-        # 获取底层 XML 元素
-        p_element = paragraph._element
-        
-        # 查找段落属性 (pPr)
-        pPr = None
-        for child in p_element:
-            if child.tag == qn('w:pPr'):
-                pPr = child
-                break
-        
-        if pPr is None:
-            return result
-        
-        # 查找所有 numPr 节点（自动编号属性）
-        numPr_nodes = []
-        for child in pPr:
-            if child.tag == qn('w:numPr'):
-                numPr_nodes.append(child)
-        
-        # 尝试获取编号层级信息（用于调试和潜在的样式推断）
-        if numPr_nodes:
-            try:
-                numPr = numPr_nodes[0]
-                for ilvl_node in numPr:
-                    if ilvl_node.tag == qn('w:ilvl'):
-                        level_val = ilvl_node.get(qn('w:val'))
-                        if level_val:
-                            result["level"] = int(level_val)
-                        break
-            except Exception:
-                pass
-        
-        # 移除找到的所有编号节点
-        if numPr_nodes:
-            for numPr in numPr_nodes:
-                pPr.remove(numPr)
-            result["removed"] = True
-            
-    except Exception as e:
-        print(f"✗ 移除段落编号失败: {str(e)}", file=sys.stderr)
-    
-    return result
+    state = load_state(previous_output) if previous_output else None
+    if not previous_output:
+        reason = 'noPreviousOutput'
+    elif state is None:
+        reason = 'noState'
+    elif state.input_hash != input_hash:
+        reason = 'inputChanged'
+    elif state.fingerprint != fingerprint:
+        reason = 'profileChanged'
+    else:
+        changed = state.changed_paragraphs(job.mappings, job.text_replacements)
+        if any(':' in key for key in changed):
+            reason = 'storiesChanged'
+        else:
+            outcome = _format_incremental(job, input_path, output_path, previous_output, state, changed)
+            if outcome is not None:
+                run_counts, package_stats, skipped = outcome
+                info = {"mode": "incremental", "paragraphs": state.paragraphs,
+                        "restyled": state.paragraphs - skipped, "skipped": skipped}
+                return (run_counts, package_stats), info
+            reason = 'structureChanged'
+    logger.info(f"增量格式化退回完整格式化: {reason}")
+    return None, {"mode": "full", "reason": reason}
 
-def format_document(input_path, profile, output_path, mappings=None, text_replacements=None, enable_auto_numbering=True):
+def format_document(input_path, profile, output_path, mappings=None, text_replacements=None, enable_auto_numbering=True, options=None):
     """
     根据配置规范和用户修正后的映射关系格式化Word文档
     
     Args:
         input_path: 输入Word文档路径
         profile: 配置规范字典，包含documentTitle, heading1-4, body的格式定义
+                 可选 locationStyles: {位置: 样式键}，位置为 table/textbox/header/footer/footnote/endnote/body，
+                 为表格、文本框、页眉页脚、脚注/尾注中的段落指定样式键（见 stories.py）
         output_path: 输出Word文档路径
-        mappings: 用户修正后的映射关系 {段落索引: 样式键}
+        mappings: 用户修正后的映射关系 {段落索引: 样式键}；story 段落用扫描结果中的段落键（"部件名:序号"）。
+                  也可以是区间形式 [[起始, 结束, 样式键], ...] 或 {"ranges": [...], 段落键: 样式键}，见 payload.py
         text_replacements: 用户修正后的文本内容 {段落索引: 新文本}
+        enable_auto_numbering: 是否应用样式中配置的自动编号
+        options: 格式化选项
+            styleEngine: "compiled"（默认，按样式键编译 pPr/rPr 模板后直接合并 XML）
+                         | "reference"（逐属性调用 python-docx setter，作为对照实现）
+            coalesceRuns: 应用样式前合并相邻且格式相同的 run（默认关闭）
+            engine: "auto"（默认）| "dom" | "stream"，见 select_engine
+            streamThresholdMb: auto 引擎切换到流式处理的 document.xml 大小阈值
+            formatMode: "direct"（默认，格式直接写在每个段落和 run 上）
+                        | "styles"（格式写入 Title/Heading 1-4/Normal 的样式定义，并去掉被覆盖的直接格式）
+            incremental: 记录本次的格式化状态，供下一次增量格式化使用（见 incremental.py）
+            outputCache: false 时不使用输出缓存（见 output_cache.py）；incremental 时也不使用
+            previousOutput: 与 incremental 同时使用，上一次增量模式格式化的输出路径；
+                            只重新处理样式键、文本替换或自动编号有变化的段落，无法增量时完整格式化
+            numberingMode: "text"（默认，在标题前插入编号文本）
+                           | "native"（在 numbering.xml 中生成多级列表，标题引用列表，见 native_numbering.py）
+            lowMemory: 低内存模式，逐个产生轻量段落代理；engine 为 auto 时使用流式引擎。
+                       未指定时由内存预算决定，见 select_memory_mode
+            memoryBudgetMb: 内存预算（MB），估算的 DOM 引擎峰值内存超出时自动开启低内存模式
+            parallelWorkers: 大于 1 或 "auto"（CPU 核数）时把正文分块，在多个子进程中并行格式化，
+                             输出与逐段处理相同（见 _format_with_parallel）；engine 为 auto 时使用流式引擎
         
     Returns:
         {
             "success": True/False,
             "outputPath": "输出路径",
-            "error": "错误信息"
+            "engine": "dom" | "stream",
+            "images": {"total": 3, "paragraphs": {"12": 1, "30": 2}},
+            "package": {"copiedParts": 16, "copiedBytes": 40960, "encodedParts": 2, "encodedBytes": 361605},
+            "runs": {"before": 5200, "after": 1800},  # 仅当 coalesceRuns 开启时存在
+            "styleDefinitions": {"body": "Normal", "heading1": "Heading1"},  # 仅样式模式，已写入定义的样式
+            "rules": {"removeManualNumberPrefixes": {"styles": 7, "paragraphs": 12},
+                      "autoTimesNewRoman": {"runs": 830, "splits": 95}},
+            # 规则内部步骤的耗时，仅当有记录时存在；autoTimesNewRoman 的 classify 为书写系统分类与拆分 run 的耗时
+            "ruleTimings": {"autoTimesNewRoman": {"classifyMs": 12.4}},
+            "stories": {"paragraphs": 42},  # 仅当处理 story 段落时存在，处理的段落数
+            "numbering": {"mode": "native", "numId": 12, "paragraphs": 40},  # 仅原生编号，引用列表的标题段落数
+            # 原生编号无法表示时退回文本模式：{"mode": "text", "reason": 原因}
+            # 仅 incremental 时存在；完整格式化时为 {"mode": "full", "reason": 原因, "paragraphs", "restyled", "skipped": 0}
+            "incremental": {"mode": "incremental", "paragraphs": 5000, "restyled": 3, "skipped": 4997},
+            "cacheHit": True/False,  # 仅当使用输出缓存时存在，命中时其余字段为产生该输出时的结果
+            # 仅当指定 lowMemory 或设置了内存预算时存在；peakRssMb 为进程的峰值常驻内存（常驻模式下为启动以来的峰值）
+            "memory": {"lowMemory": True, "budgetMb": 512, "estimatedMb": 1600.0, "peakRssMb": 45.2},
+            "parallel": {"workers": 4, "chunks": 16},  # 仅当使用并行引擎时存在
+            "error": "错误信息",
+            # 仅当被取消时存在（见 progress.py）：取消时所处的阶段与该阶段已完成的段落数，不会写出输出文件
+            "cancelled": True,
+            "completed": {"phase": "paragraphs", "done": 5120, "total": 10000, "elapsedMs": 2310.5}
         }
     """
     try:
-        doc = Document(input_path)
+        options = options or {}
+        # 区间形式的 mappings 按需查找，不展开
+        mappings = parse_mappings(mappings)
+        # 输出缓存：同样的请求直接取用之前的输出文件（见 output_cache.py）；增量模式有自己的状态，不使用输出缓存
+        output_cache = None if options.get('incremental') else get_output_cache(options)
+        if output_cache is not None:
+            with profiling.active().phase('outputCache'):
+                cache_key = request_key(input_path, profile, mappings, text_replacements, enable_auto_numbering,
+                                        options)
+                cached = output_cache.lookup(cache_key, output_path)
+            if cached is not None:
+                result = {"success": True, "outputPath": output_path}
+                result.update(cached)
+                result["cacheHit"] = True
+                return result
 
-        # 兼容前端 profile 结构：可能为 { styles: {...}, specialRules: {...} }
-        styles_dict = profile.get('styles') if isinstance(profile, dict) and 'styles' in profile else profile
-        special_rules = profile.get('specialRules', {}) if isinstance(profile, dict) else {}
-        
-        # 特殊规则：移除自动编号
-        # 第一步：移除样式定义中的编号配置（防止应用样式时引入编号）
-        if special_rules.get('removeManualNumberPrefixes'):
-            print("[DEBUG] 开始移除样式级编号定义...", file=sys.stderr)
-            style_removed = remove_style_level_numbering(doc)
-            print(f"[DEBUG] 已清理 {style_removed} 个样式的编号定义", file=sys.stderr)
-        
-        # 初始化编号管理器
-        numbering_manager = NumberingManager(profile)
-
-        # 遍历段落应用格式
-        for idx, para in enumerate(doc.paragraphs):
-            # 0. 优先应用文本替换 (用户纠偏)
-            if text_replacements and str(idx) in text_replacements:
-                new_text = text_replacements[str(idx)]
-                # 如果新文本为空，是否应该删除段落？
-                # 目前逻辑：如果为空字符串，则清空段落内容
-                # 注意：直接赋值 para.text 会清除所有原有格式(runs)，但对于标题纠偏通常是可以接受的
-                para.text = new_text
-            
-            text = para.text.strip()
-            
-            # 检测图片段落（特殊规则优先处理）
-            has_picture = False
-            try:
-                for run in para.runs:
-                    if run._element.xml and ('drawing' in run._element.xml or 'pict' in run._element.xml):
-                        has_picture = True
-                        break
-            except Exception:
-                pass
-            
-            # 特殊规则：图片单倍行距
-            if has_picture and special_rules.get('pictureLineSpacing'):
-                try:
-                    para.paragraph_format.line_spacing = 1.0
-                except Exception:
-                    pass
-            
-            # 特殊规则：图片居中
-            if has_picture and special_rules.get('pictureCenterAlign'):
-                try:
-                    para.paragraph_format.alignment = WD_ALIGN_PARAGRAPH.CENTER
-                except Exception:
-                    pass
-            
-            # 如果是纯图片段落且无文本，跳过后续文字格式处理
-            if has_picture and not text:
-                continue
-            
-            # 获取该段落的样式键
-            style_key = mappings.get(str(idx), "body") if mappings else "body"
-            # 兼容前端别名：title/normal -> documentTitle/body
-            alias_map = { 'title': 'documentTitle', 'normal': 'body' }
-            style_key = alias_map.get(style_key, style_key)
-
-            # --- 关键：先应用 Word 内置样式，防止覆盖后续的直接格式 ---
-            style_name_map = {
-                'documentTitle': 'Title',
-                'heading1': 'Heading 1',
-                'heading2': 'Heading 2',
-                'heading3': 'Heading 3',
-                'heading4': 'Heading 4',
-                'body': 'Normal'
-            }
-            if style_key in style_name_map:
-                try:
-                    para.style = style_name_map[style_key]
-                except Exception:
-                    pass
-            
-            # 应用自动编号（受开关控制，且样式中需启用numbering）
-            # 注意：这会修改段落文本，必须在后续格式应用之前执行
-            if enable_auto_numbering:
-                numbering_manager.process_paragraph(para, style_key)
-            
-            # 特殊规则：第二步 - 移除段落级自动编号属性
-            # 这只会移除 Word 的自动列表格式，不会影响用户手打的 "1." 文本
-            if special_rules.get('removeManualNumberPrefixes'):
-                removal_result = remove_paragraph_numbering(para)
-                if removal_result["removed"]:
-                    level_info = f" (层级:{removal_result['level']})" if removal_result["level"] is not None else ""
-                    print(f"[DEBUG] 段落 {idx} 已移除编号{level_info}: {text[:30]}...", file=sys.stderr)
-            
-            # 获取对应的样式配置
-            if not styles_dict or style_key not in styles_dict:
-                continue
-            style_config = styles_dict[style_key]
-            
-            # 应用段落格式
-            para_format = para.paragraph_format
-            
-            # 对齐方式
-            alignment_map = {
-                "left": WD_ALIGN_PARAGRAPH.LEFT,
-                "center": WD_ALIGN_PARAGRAPH.CENTER,
-                "right": WD_ALIGN_PARAGRAPH.RIGHT,
-                "justify": WD_ALIGN_PARAGRAPH.JUSTIFY,
-                "distribute": WD_ALIGN_PARAGRAPH.DISTRIBUTE
-            }
-            if "alignment" in style_config:
-                para_format.alignment = alignment_map.get(style_config["alignment"], WD_ALIGN_PARAGRAPH.LEFT)
-            
-            # 缩进（使用字符单位解决误差）
-            if "firstLineIndent" in style_config:
-                indent_chars = style_config["firstLineIndent"]
-                # 直接通过 XML 设置字符单位缩进 (100 = 1 字符)
-                pPr = para._element.get_or_add_pPr()
-                ind = pPr.get_or_add_ind()
-                ind.set(qn('w:firstLineChars'), str(int(indent_chars * 100)))
-                # 必须清除绝对单位的缩进设置，否则 Word 会优先使用它
-                para_format.first_line_indent = None
-            
-            # 行距：数值<=3 视为倍数，否则按磅数
-            if "lineSpacing" in style_config and style_config["lineSpacing"] is not None:
-                ls = style_config["lineSpacing"]
-                try:
-                    pPr = para._element.get_or_add_pPr()
-                    # 禁用网格对齐，确保磅数设置绝对精确 (1px 误差通常由于对齐网格引起)
-                    snap = pPr.get_or_add_snapToGrid()
-                    snap.set(qn('w:val'), '0')
-                    
-                    if isinstance(ls, (int, float)) and ls <= 3:
-                        para_format.line_spacing = float(ls)
-                    else:
-                        para_format.line_spacing = Pt(float(ls))
-                except Exception:
-                    pass
-            
-            # 段前段后间距（磅）
-            if "spaceBefore" in style_config and style_config["spaceBefore"] is not None:
-                try:
-                    para_format.space_before = Pt(float(style_config["spaceBefore"]))
-                    # 清理 Word 可能残留的“行”单位间距属性，防止干扰
-                    pPr = para._element.get_or_add_pPr()
-                    spacing = pPr.get_or_add_spacing()
-                    if spacing.get(qn('w:beforeLines')):
-                        spacing.attrib.pop(qn('w:beforeLines'))
-                except Exception:
-                    pass
-            if "spaceAfter" in style_config and style_config["spaceAfter"] is not None:
-                try:
-                    para_format.space_after = Pt(float(style_config["spaceAfter"]))
-                    # 同上，清理“行”单位间距属性
-                    pPr = para._element.get_or_add_pPr()
-                    spacing = pPr.get_or_add_spacing()
-                    if spacing.get(qn('w:afterLines')):
-                        spacing.attrib.pop(qn('w:afterLines'))
-                except Exception:
-                    pass
-
-            # 特殊规则：重置左右缩进与段前段后间距
-            if special_rules.get('resetIndentsAndSpacing'):
-                try:
-                    para_format.left_indent = Pt(0)
-                    para_format.right_indent = Pt(0)
-                    para_format.space_before = Pt(0)
-                    para_format.space_after = Pt(0)
-                except Exception:
-                    pass
-            
-            # 应用字体格式到所有run
-            for run in para.runs:
-                # 字体
-                if "fontFamily" in style_config:
-                    font_name = style_config["fontFamily"]
-                    run.font.name = font_name
-                    # 设置中文/西文字体
-                    try:
-                        r_pr = run._element.get_or_add_rPr()
-                        r_fonts = r_pr.get_or_add_rFonts()
-                        r_fonts.set(qn('w:ascii'), font_name)
-                        r_fonts.set(qn('w:eastAsia'), font_name)
-                        r_fonts.set(qn('w:hAnsi'), font_name)
-                        r_fonts.set(qn('w:cs'), font_name)
-                    except Exception:
-                        pass
-                
-                # 字号（磅）
-                if "fontSize" in style_config:
-                    run.font.size = Pt(style_config["fontSize"])
-                
-                # 加粗
-                if "bold" in style_config:
-                    run.font.bold = style_config["bold"]
-                
-                # 颜色（十六进制）
-                if "color" in style_config:
-                    color_hex = style_config["color"].lstrip('#')
-                    r = int(color_hex[0:2], 16)
-                    g = int(color_hex[2:4], 16)
-                    b = int(color_hex[4:6], 16)
-                    run.font.color.rgb = RGBColor(r, g, b)
-
-                # 特殊规则：英文与数字自动 Times New Roman
-                if special_rules.get('autoTimesNewRoman'):
-                    try:
-                        text = run.text or ""
-                        has_ascii = any(('A' <= ch <= 'Z') or ('a' <= ch <= 'z') or ('0' <= ch <= '9') for ch in text)
-                        if has_ascii:
-                            r_pr = run._element.get_or_add_rPr()
-                            r_fonts = r_pr.get_or_add_rFonts()
-                            r_fonts.set(qn('w:ascii'), 'Times New Roman')
-                            r_fonts.set(qn('w:hAnsi'), 'Times New Roman')
-                    except Exception:
-                        pass
-            
-            # (已移动到循环起始处)
-
-            # 再次移除自动编号，避免样式切换引入的编号定义残留
-            try:
-                p = para._p
-                pPr = p.pPr
-                if pPr is not None and pPr.numPr is not None:
-                    pPr.remove(pPr.numPr)
-            except Exception:
-                pass
-        
-        # 特殊规则：第三步 - 保存前最后一次全局清理（确保彻底移除残留编号）
-        if special_rules.get('removeManualNumberPrefixes'):
-            print("[DEBUG] 执行保存前全局编号清理...", file=sys.stderr)
-            removed_count = 0
-            checked_count = 0
-            detected_count = 0
-            
-            for para in doc.paragraphs:
-                checked_count += 1
-                # 检查段落XML结构（调试用）
-                p_element = para._element
-                has_pPr = any(child.tag == qn('w:pPr') for child in p_element)
-                if has_pPr:
-                    pPr = next((child for child in p_element if child.tag == qn('w:pPr')), None)
-                    if pPr:
-                        has_numPr = any(child.tag == qn('w:numPr') for child in pPr)
-                        if has_numPr:
-                            detected_count += 1
-                            print(f"[DEBUG] 发现残留编号: {para.text[:50] if para.text else '(空)'}", file=sys.stderr)
-                
-                removal_result = remove_paragraph_numbering(para)
-                if removal_result["removed"]:
-                    removed_count += 1
-            
-            print(f"[DEBUG] 全局清理完成: 检查 {checked_count} 段落, 检测到 {detected_count} 个编号, 移除 {removed_count} 个", file=sys.stderr)
-        
-        # 保存文档
-        doc.save(output_path)
+        job = _FormatJob(profile, mappings, text_replacements, enable_auto_numbering, options)
+        outcome = None
+        incremental = bool(options.get('incremental'))
+        if incremental:
+            with job.timings.phase('state'):
+                input_hash = hash_file(input_path)
+                fingerprint = profile_fingerprint(profile, options, enable_auto_numbering)
+            outcome, incremental_info = _try_incremental(job, input_path, output_path, options.get('previousOutput'),
+                                                         input_hash, fingerprint)
+            if outcome is None and incremental_info["reason"] == 'structureChanged':
+                job = _FormatJob(profile, mappings, text_replacements, enable_auto_numbering, options)
+        parallel_info = None
+        if outcome is not None:
+            engine = 'dom'
+            run_counts, package_stats = outcome
+            memory_info = None
+        else:
+            job.low_memory, memory_info = select_memory_mode(input_path, options)
+            workers = select_parallel_workers(options)
+            engine = options.get('engine', 'auto')
+            if (job.low_memory or workers > 1) and engine in (None, 'auto'):
+                engine = 'stream'
+            engine = select_engine(input_path, engine, options.get('streamThresholdMb'))
+            if engine == 'stream' and job.native_numbering and not _has_numbering_part(input_path):
+                # 流式引擎不能新增部件，文档没有 numbering.xml 时使用 DOM 引擎
+                engine = 'dom'
+            if engine == 'stream' and workers > 1 and not job.stories:
+                # story 段落的键依赖整个正文的遍历顺序，启用 stories 时逐段处理
+                run_counts, package_stats, parallel_info = _format_with_parallel(
+                    job, input_path, output_path, workers,
+                    (profile, mappings, text_replacements, enable_auto_numbering, options))
+            elif engine == 'stream':
+                run_counts, package_stats = _format_with_stream(job, input_path, output_path)
+            else:
+                run_counts, package_stats = _format_with_dom(job, input_path, output_path)
         
-        return {
+        result = {
             "success": True,
-            "outputPath": output_path
+            "outputPath": output_path,
+            "engine": engine,
+            # 图片统计：{"total": 图片总数, "paragraphs": {段落索引: 图片数量}}
+            "images": {
+                "total": sum(job.image_paragraphs.values()),
+                "paragraphs": job.image_paragraphs
+            },
+            # 部件写出统计：原样复制的条目与字节数 / 重新压缩的条目与字节数
+            "package": package_stats
         }
+        if run_counts is not None:
+            result["runs"] = run_counts
+        if parallel_info is not None:
+            result["parallel"] = parallel_info
+        if job.format_mode == 'styles':
+            result["styleDefinitions"] = job.style_definitions
+        # 各特殊规则的计数 {规则名: {计数项: 数量}}
+        result["rules"] = job.passes.counters()
+        rule_durations = job.passes.durations()
+        if rule_durations:
+            result["ruleTimings"] = {name: {f"{step}Ms": round(seconds * 1000, 1) for step, seconds in steps.items()}
+                                     for name, steps in rule_durations.items()}
+        if job.stories:
+            result["stories"] = {"paragraphs": job.story_paragraphs}
+        if job.list_num_id is not None:
+            # 引用列表的标题段落（增量格式化时包括跳过的段落）
+            listed = sum(1 for key in job.numbers if job.body_style_key(int(key)) in job.list_levels)
+            result["numbering"] = {"mode": "native", "numId": job.list_num_id, "paragraphs": listed}
+        elif job.numbering_fallback is not None:
+            result["numbering"] = {"mode": "text", "reason": job.numbering_fallback}
+        job.timings.count('images', result["images"]["total"])
+        if memory_info is not None:
+            memory_info["peakRssMb"] = round(peak_rss_mb() or 0, 1)
+            result["memory"] = memory_info
+        if incremental:
+            if outcome is None:
+                incremental_info.update(paragraphs=job.body_paragraphs, restyled=job.body_paragraphs, skipped=0)
+            result["incremental"] = incremental_info
+            with job.timings.phase('state'):
+                save_state(output_path, FormatState(input_hash, fingerprint, job.body_paragraphs, mappings,
+                                                    text_replacements, job.numbers, job.image_paragraphs,
+                                                    job.story_paragraphs))
+        if output_cache is not None:
+            with job.timings.phase('outputCache'):
+                output_cache.store(cache_key, output_path, result)
+            result["cacheHit"] = False
+        return result
     
+    except Cancelled as e:
+        return cancelled_result(e)
     except Exception as e:
         return {
             "success": False,
             "error": str(e)
         }
 
+def _load_manifest(manifest_path):
+    """读取批量任务清单，'-' 表示从标准输入读取"""
+    if manifest_path == '-':
+        return json.loads(sys.stdin.buffer.read().decode('utf-8'))
+    with open(manifest_path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def format_batch(manifest, emit, workers=None, timeout=None):
+    """
+    按清单并行格式化多个文档，每个文档完成后立即通过 emit 输出一条结果
+    
+    Args:
+        manifest: 任务清单，可以是任务列表，也可以是:
+            {
+                "profile": {...},             # 共享规范（条目未指定 profile 时使用）
+                "mappings": {...},            # 共享映射（可选）
+                "text_replacements": {...},   # 共享文本替换（可选）
+                "enable_auto_numbering": true,
+                "options": {...},             # 共享格式化选项（见 format_document）
+                "workers": 4,                 # 并行进程数（可选，默认 CPU 核数）
+                "timeout": 120,               # 单个文档超时秒数（可选）
+                "entries": [
+                    {"input_path": "...", "output_path": "...", "profile": {...}, "mappings": {...}, ...},
+                    ...
+                ]
+            }
+        emit: 输出回调，接收一个结果字典
+        workers: 并行进程数，优先于清单中的 workers
+        timeout: 单个文档超时秒数，优先于清单中的 timeout
+        
+    Returns:
+        汇总信息: {"type": "summary", "total", "succeeded", "failed", "timedOut", "workers", "elapsedMs"}
+    """
+    if isinstance(manifest, list):
+        manifest = {"entries": manifest}
+    shared = {
+        "profile": manifest.get("profile"),
+        "mappings": manifest.get("mappings", {}),
+        "text_replacements": manifest.get("text_replacements", {}),
+        "enable_auto_numbering": manifest.get("enable_auto_numbering", True),
+        "options": manifest.get("options"),
+    }
+    workers = workers or manifest.get("workers")
+    timeout = timeout or manifest.get("timeout")
+    
+    started = time.perf_counter()
+    jobs = []
+    job_entries = []
+    invalid = 0
+    for entry_index, entry in enumerate(manifest.get("entries", [])):
+        job = {
+            "input_path": entry.get("input_path"),
+            "output_path": entry.get("output_path"),
+            "profile": entry.get("profile", shared["profile"]),
+            "mappings": entry.get("mappings", shared["mappings"]),
+            "text_replacements": entry.get("text_replacements", shared["text_replacements"]),
+            "enable_auto_numbering": entry.get("enable_auto_numbering", shared["enable_auto_numbering"]),
+            "options": entry.get("options", shared["options"]),
+        }
+        if not all([job["input_path"], job["output_path"], job["profile"]]):
+            # 条目不完整时直接报告失败，不影响其他条目
+            invalid += 1
+            emit({"type": "result", "index": entry_index, "inputPath": job["input_path"],
+                  "success": False, "error": "缺少必要参数"})
+            continue
+        jobs.append(job)
+        job_entries.append(entry_index)
+    
+    def on_result(job_index, result):
+        job = jobs[job_index]
+        line = {"type": "result", "index": job_entries[job_index], "inputPath": job["input_path"]}
+        line.update(result)
+        emit(line)
+    
+    stats = run_batch(jobs, format_document, on_result, workers=workers, timeout=timeout)
+    summary = {"type": "summary"}
+    summary.update(stats)
+    summary["total"] += invalid
+    summary["failed"] += invalid
+    summary["elapsedMs"] = round((time.perf_counter() - started) * 1000, 1)
+    return summary
+
+def parse_cli_args(argv):
+    """
+    拆分命令行参数为位置参数与选项
+
+    选项格式为 --name=value 或 --name（布尔开关），名称中的 '-' 转换为 '_'。
+
+    Returns:
+        (positionals, options)
+    """
+    positionals = []
+    options = {}
+    for arg in argv:
+        if arg.startswith('--') and len(arg) > 2:
+            name, sep, value = arg[2:].partition('=')
+            options[name.replace('-', '_')] = value if sep else True
+        else:
+            positionals.append(arg)
+    return positionals, options
+
+def _rpc_scan_headings(params, notify):
+    """
+    serve 模式: scan_headings 请求
+
+    params 中 stream 为 true 时按 scan_headings_stream 流式扫描：每条记录作为 record 事件发出，响应结果为汇总信息
+    """
+    require_params(params, 'input_path')
+    limit = params.get('limit')
+    kwargs = dict(use_cache=params.get('use_cache', True), stories=params.get('stories', False),
+                  offset=int(params.get('offset', 0)), limit=int(limit) if limit is not None else None)
+    with _rpc_progress_session(params, notify):
+        if params.get('stream'):
+            return scan_headings_stream(params['input_path'], notify, int(params.get('base_font_size', 12)),
+                                        engine=params.get('engine', 'stream'), **kwargs)
+        return scan_headings(params['input_path'], int(params.get('base_font_size', 12)),
+                             engine=params.get('engine', 'auto'), compact=bool(params.get('compact')), **kwargs)
+
+# 接收 notify 回调、可以在处理过程中发出事件的方法（见 worker.py）
+_rpc_scan_headings.streaming = True
+
+def _rpc_format(params, notify):
+    """serve 模式: format 请求，参数与命令行 payload 字段一致"""
+    require_params(params, 'input_path', 'output_path', 'profile')
+    with _rpc_progress_session(params, notify):
+        return format_document(
+            params['input_path'],
+            params['profile'],
+            params['output_path'],
+            params.get('mappings', {}),
+            params.get('text_replacements', {}),
+            params.get('enable_auto_numbering', True),
+            params.get('options')
+        )
+
+_rpc_format.streaming = True
+
+def _rpc_progress_session(params, notify):
+    """
+    serve 模式的进度会话：params.progress 为 true 时进度事件作为 record 事件发出（data.type 为 "progress"），
+    params.cancel_file 为取消哨兵文件（worker 处理请求时不读取 stdin，只能通过文件取消）
+    """
+    interval = float(params.get('progress_interval', progress.DEFAULT_INTERVAL * 1000)) / 1000
+    return progress.session(notify if params.get('progress') else None, interval, params.get('cancel_file'))
+
+RPC_HANDLERS = {
+    'scan_headings': _rpc_scan_headings,
+    'format': _rpc_format,
+}
+
+def serve(max_jobs=DEFAULT_MAX_JOBS, max_rss_mb=DEFAULT_MAX_RSS_MB):
+    """常驻模式：从 stdin 读取 NDJSON 请求，向 stdout 写入响应（协议见 worker.py）"""
+    if sys.stdin is not None:
+        try:
+            sys.stdin.reconfigure(encoding='utf-8')
+        except Exception:
+            pass
+    worker = FormatterWorker(RPC_HANDLERS, max_jobs=max_jobs, max_rss_mb=max_rss_mb)
+    return worker.serve()
+
+def configure_logging(level=None):
+    """
+    日志输出到 stderr（stdout 只输出 JSON 结果）
+
+    级别取 level、环境变量 FORMATTER_LOG_LEVEL，默认 WARNING；设为 DEBUG 可查看逐段落的规则处理记录
+    """
+    level = (level or os.environ.get('FORMATTER_LOG_LEVEL') or 'WARNING').upper()
+    logging.basicConfig(stream=sys.stderr, level=getattr(logging, level, logging.WARNING),
+                        format='[%(levelname)s] %(message)s')
+
+def _profile_session(options, artifact_base):
+    """
+    按 --profile[=timings|pstats|memory|all] 或环境变量 FORMATTER_PROFILE 开启剖析会话（见 profiling.py）
+
+    --profile-top=N: tracemalloc 报告的代码行数。
+    """
+    try:
+        modes = profiling.parse_modes(options.get('profile', os.environ.get('FORMATTER_PROFILE')))
+    except ValueError as e:
+        # 剖析只用于诊断，设置有误时照常执行命令
+        logger.warning(str(e))
+        modes = frozenset()
+    return profiling.session(modes, artifact_base, int(options.get('profile_top', profiling.DEFAULT_TOP)))
+
+def _progress_session(options, handle_signals=False):
+    """
+    按命令行选项开启进度会话（见 progress.py）
+
+    handle_signals 为 True 时 SIGINT / SIGTERM 改为取消当前任务；只有命令行入口（main）这样做，
+    作为库或在常驻模式中调用时不替换调用方的信号处理。
+
+    --progress[=stderr|fd:N]: 输出进度事件（默认写入 stderr）
+    --progress-interval=毫秒: 两次进度事件之间的最短间隔
+    --cancel-file=路径: 该文件出现时取消
+    """
+    interval = float(options.get('progress_interval', progress.DEFAULT_INTERVAL * 1000)) / 1000
+    return progress.session(progress.stream_writer(options.get('progress')), interval,
+                            options.get('cancel_file'), handle_signals=handle_signals)
+
+def _exit_if_cancelled(result):
+    """
+    任务被取消时输出结果后立即退出：跳过解释器清理（回收大文档的对象图需要上百毫秒），
+    调用方在收到结果后很快就能看到进程结束
+    """
+    if result.get("cancelled"):
+        sys.stdout.flush()
+        sys.stderr.flush()
+        os._exit(0)
+
+def _attach_timings(result, timings):
+    """开启剖析时把计时结果写入 result['timings']（在会话结束后调用，才包含 pstats/tracemalloc 报告路径）"""
+    if timings.enabled:
+        result["timings"] = timings.as_dict()
+    return result
+
 def main():
     """命令行入口"""
-    if len(sys.argv) < 2:
+    args, options = parse_cli_args(sys.argv[1:])
+    # --log-level=DEBUG|INFO|WARNING: 日志级别
+    configure_logging(options.get('log_level') if isinstance(options.get('log_level'), str) else None)
+    if len(args) < 1:
         print(json.dumps({"success": False, "error": "缺少命令参数"}, ensure_ascii=False))
         sys.exit(1)
     
-    command = sys.argv[1]
+    command = args[0]
     
     if command == "scan_headings":
-        if len(sys.argv) < 3:
+        if len(args) < 2:
             print(json.dumps({"success": False, "error": "缺少输入文件路径"}, ensure_ascii=False))
             sys.exit(1)
         
-        input_path = sys.argv[2]
-        base_font_size = int(sys.argv[3]) if len(sys.argv) > 3 else 12
+        input_path = args[1]
+        base_font_size = int(args[2]) if len(args) > 2 else 12
         
-        result = scan_headings(input_path, base_font_size)
-        print(json.dumps(result, ensure_ascii=False))
+        # --no-cache: 跳过扫描缓存，强制重新解析文档
+        # --engine=dom|stream|auto: 文档处理引擎，默认按 document.xml 大小自动选择
+        # --stories: 同时扫描表格、文本框、页眉页脚、脚注/尾注中的段落
+        # --offset=N --limit=N: 分页
+        # --ndjson: 流式输出，每识别一个段落输出一行 JSON，最后输出一行汇总（见 scan_headings_stream）
+        # --compact: 以标题为主的紧凑结果，连续的正文段落合并为区间（见 compact_scan.py，--ndjson 时不生效）
+        # --profile[=timings|pstats|memory|all]: 结果中追加 timings，剖析报告写在输入文件旁（<文件名>.scan.*）
+        # --progress[=stderr|fd:N] --cancel-file=路径: 进度事件与取消，见 _progress_session
+        offset = int(options.get('offset', 0))
+        limit = int(options['limit']) if 'limit' in options else None
+        with _progress_session(options, handle_signals=True), \
+                _profile_session(options, profiling.artifact_base_for(input_path, '.scan')) as timings:
+            timings.add('import', *_IMPORT_TIMES)
+            if options.get('ndjson'):
+                def emit(line):
+                    print(json.dumps(line, ensure_ascii=False), flush=True)
+                with timings.phase('total'):
+                    result = scan_headings_stream(input_path, emit, base_font_size,
+                                                  use_cache=not options.get('no_cache'),
+                                                  engine=options.get('engine', 'stream'),
+                                                  stories=bool(options.get('stories')), offset=offset, limit=limit)
+            else:
+                emit = None
+                with timings.phase('total'):
+                    result = scan_headings(input_path, base_font_size, use_cache=not options.get('no_cache'),
+                                           engine=options.get('engine', 'auto'), stories=bool(options.get('stories')),
+                                           offset=offset, limit=limit, compact=bool(options.get('compact')))
+        _attach_timings(result, timings)
+        if emit is not None:
+            emit(result)
+        else:
+            print(json.dumps(result, ensure_ascii=False))
+        _exit_if_cancelled(result)
     
     elif command == "format":
-        if len(sys.argv) < 5:
+        if len(args) < 4:
             print(json.dumps({"success": False, "error": "缺少必要参数"}, ensure_ascii=False))
             sys.exit(1)
         
-        # Electron传递的参数格式: ['format', inputPath, outputPath, JSON.stringify({profile, mappings})]
-        input_path = sys.argv[2]
-        output_path = sys.argv[3]
-        payload_str = sys.argv[4]
-        payload = json.loads(payload_str)
+        # Electron传递的参数格式: ['format', inputPath, outputPath, payload]
+        # payload 为 JSON.stringify({profile, mappings, ...})、"-"（从标准输入读取）或 payload 文件路径，见 payload.py
+        input_path = args[1]
+        output_path = args[2]
+        try:
+            payload = load_payload(args[3])
+        except (OSError, ValueError) as e:
+            print(json.dumps({"success": False, "error": f"payload 读取失败: {e}"}, ensure_ascii=False))
+            sys.exit(1)
         
         profile = payload.get("profile")
         mappings = payload.get("mappings", {})
         text_replacements = payload.get("text_replacements", {})
         enable_auto_numbering = payload.get("enable_auto_numbering", True)
+        format_options = payload.get("options", {})
+        # --no-cache: 不使用输出缓存
+        if options.get('no_cache'):
+            format_options = dict(format_options, outputCache=False)
+        # --parallel-workers=N|auto: 分块并行格式化（options.parallelWorkers）
+        if 'parallel_workers' in options:
+            format_options = dict(format_options, parallelWorkers=options['parallel_workers'])
         
         if not all([input_path, profile, output_path]):
             print(json.dumps({"success": False, "error": "缺少必要参数"}, ensure_ascii=False))
             sys.exit(1)
         
-        result = format_document(input_path, profile, output_path, mappings, text_replacements, enable_auto_numbering)
-        print(json.dumps(result, ensure_ascii=False))
+        # --profile[=timings|pstats|memory|all]: 结果中追加 timings，剖析报告写在输出文件旁
+        # --progress[=stderr|fd:N] --cancel-file=路径: 进度事件与取消，见 _progress_session
+        with _progress_session(options, handle_signals=True), \
+                _profile_session(options, profiling.artifact_base_for(output_path)) as timings:
+            timings.add('import', *_IMPORT_TIMES)
+            with timings.phase('total'):
+                result = format_document(input_path, profile, output_path, mappings, text_replacements,
+                                         enable_auto_numbering, format_options)
+        print(json.dumps(_attach_timings(result, timings), ensure_ascii=False))
+        _exit_if_cancelled(result)
+    
+    elif command == "format_batch":
+        # formatter format_batch <manifest.json | -> [--workers=N] [--timeout=秒]
+        # 每个文档完成后输出一行 JSON 结果，最后输出一行汇总
+        if len(args) < 2:
+            print(json.dumps({"success": False, "error": "缺少任务清单路径"}, ensure_ascii=False))
+            sys.exit(1)
+        
+        def emit(line):
+            print(json.dumps(line, ensure_ascii=False), flush=True)
+        
+        manifest = _load_manifest(args[1])
+        workers = int(options['workers']) if 'workers' in options else None
+        timeout = float(options['timeout']) if 'timeout' in options else None
+        summary = format_batch(manifest, emit, workers, timeout)
+        emit(summary)
+    
+    elif command == "serve":
+        # 常驻模式: formatter serve [--max-jobs=200] [--max-rss-mb=1024]
+        max_jobs = int(options.get('max_jobs', DEFAULT_MAX_JOBS))
+        max_rss_mb = float(options.get('max_rss_mb', DEFAULT_MAX_RSS_MB))
+        serve(max_jobs, max_rss_mb)
     
     else:
         print(json.dumps({"success": False, "error": f"未知命令: {command}"}, ensure_ascii=False))
         sys.exit(1)
 
 if __name__ == "__main__":
+    # PyInstaller 打包后 format_batch 的子进程需要 freeze_support
+    multiprocessing.freeze_support()
     main()
@@ -0,0 +1,125 @@
+"""
+增量格式化的状态记录
+每次以 options.incremental 格式化后，把本次的 mappings、文本替换、各标题段落的自动编号等状态
+按输出文件内容的 SHA-256 存入本地磁盘缓存。下一次格式化通过 options.previousOutput 引用上一次的输出，
+在其基础上只重新处理样式键、文本替换或自动编号发生变化的段落。
+
+以下情况无法增量处理，退回完整格式化（结果中给出原因）:
+    noPreviousOutput 没有指定 previousOutput（首次格式化）
+    noState          找不到上一次输出对应的状态（不是增量模式的输出，或输出文件之后被修改过）
+    inputChanged     输入文档与上一次不同
+    profileChanged   规范、格式化选项或自动编号开关与上一次不同
+    storiesChanged   表格、页眉页脚等位置段落（段落键 "部件名:序号"）的 mappings 或文本替换有变化
+    structureChanged 上一次输出的段落数与状态不符
+"""
+import hashlib
+import json
+import os
+import zlib
+from typing import Dict, Optional, Set
+
+from disk_cache import DiskCache, default_cache_dir, hash_file, make_key, DEFAULT_MAX_MB
+from payload import encode_mappings, parse_mappings
+
+# 状态格式版本：修改状态内容或逐段落格式化的逻辑时必须递增，使旧的状态失效
+FORMAT_STATE_VERSION = 3
+
+# 不影响输出内容、不参与规范指纹的选项
+_NEUTRAL_OPTIONS = frozenset(('engine', 'streamThresholdMb', 'incremental', 'previousOutput', 'outputCache',
+                              'lowMemory', 'memoryBudgetMb', 'parallelWorkers'))
+
+
+def profile_fingerprint(profile, options, enable_auto_numbering) -> str:
+    """规范、影响输出的格式化选项与自动编号开关的指纹"""
+    relevant = {key: value for key, value in (options or {}).items() if key not in _NEUTRAL_OPTIONS}
+    data = json.dumps([profile, relevant, bool(enable_auto_numbering)], sort_keys=True, ensure_ascii=False,
+                      separators=(',', ':'), default=str)
+    return hashlib.sha256(data.encode('utf-8')).hexdigest()
+
+
+def _state_cache() -> DiskCache:
+    """状态缓存实例；与扫描缓存一样可以用 FORMATTER_CACHE_DIR、FORMATTER_CACHE_MAX_MB 配置"""
+    max_mb = float(os.environ.get('FORMATTER_CACHE_MAX_MB', DEFAULT_MAX_MB))
+    return DiskCache(default_cache_dir('format-state'), max_bytes=int(max_mb * 1024 * 1024), suffix='.json.z')
+
+
+class FormatState:
+    """
+    一次格式化的状态
+
+    Attributes:
+        input_hash: 输入文档内容的 SHA-256
+        fingerprint: profile_fingerprint 的结果
+        paragraphs: 正文段落数（doc.paragraphs）
+        mappings / text_replacements: 本次使用的映射与文本替换
+        numbering: {段落索引: 编号文本} 推进了自动编号计数的段落（未启用编号的样式键为空字符串）
+        images: 格式化结果中的 images.paragraphs
+        story_paragraphs: 处理的 story 段落数
+    """
+
+    def __init__(self, input_hash, fingerprint, paragraphs, mappings, text_replacements, numbering, images,
+                 story_paragraphs=0):
+        self.input_hash = input_hash
+        self.fingerprint = fingerprint
+        self.paragraphs = paragraphs
+        self.mappings = mappings or {}
+        self.text_replacements = text_replacements or {}
+        self.numbering = numbering
+        self.images = images
+        self.story_paragraphs = story_paragraphs
+
+    def to_json(self) -> Dict:
+        return {
+            "version": FORMAT_STATE_VERSION,
+            "input": self.input_hash,
+            "fingerprint": self.fingerprint,
+            "paragraphs": self.paragraphs,
+            "mappings": encode_mappings(self.mappings),
+            "textReplacements": self.text_replacements,
+            "numbering": self.numbering,
+            "images": self.images,
+            "storyParagraphs": self.story_paragraphs,
+        }
+
+    @classmethod
+    def from_json(cls, data: Dict) -> Optional['FormatState']:
+        if not isinstance(data, dict) or data.get("version") != FORMAT_STATE_VERSION:
+            return None
+        return cls(data["input"], data["fingerprint"], data["paragraphs"], parse_mappings(data["mappings"]),
+                   data["textReplacements"], data["numbering"], data["images"], data.get("storyParagraphs", 0))
+
+    def changed_paragraphs(self, mappings, text_replacements) -> Set[str]:
+        """样式键或文本替换与本状态不同的段落键（含 story 段落键）"""
+        mappings = mappings or {}
+        text_replacements = text_replacements or {}
+        changed = set()
+        for old, new in ((self.mappings, mappings), (self.text_replacements, text_replacements)):
+            for key in old.keys() | new.keys():
+                if old.get(key) != new.get(key):
+                    changed.add(key)
+        return changed
+
+
+def save_state(output_path: str, state: FormatState) -> bool:
+    """按输出文件内容记录状态，失败时返回 False（不影响格式化结果）"""
+    try:
+        key = make_key(hash_file(output_path), FORMAT_STATE_VERSION)
+    except OSError:
+        return False
+    data = json.dumps(state.to_json(), ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    return _state_cache().put(key, zlib.compress(data))
+
+
+def load_state(previous_output: str) -> Optional[FormatState]:
+    """读取上一次输出对应的状态；文件不存在、被修改过或状态损坏时返回 None"""
+    try:
+        key = make_key(hash_file(previous_output), FORMAT_STATE_VERSION)
+    except OSError:
+        return None
+    cached = _state_cache().get(key)
+    if cached is None:
+        return None
+    try:
+        return FormatState.from_json(json.loads(zlib.decompress(cached).decode('utf-8')))
+    except Exception:
+        return None
@@ -0,0 +1,198 @@
+"""
+Word 原生多级列表
+options.numberingMode 为 "native" 时，按 profile 中 heading1-4 的 numbering 配置在 numbering.xml 中生成一个
+w:abstractNum 及引用它的 w:num，标题段落改为引用该列表（w:numPr），不再在段落前插入编号文本。
+编号由 Word 计算，在 Word 中增删标题后自动重新编号。
+
+与文本模式（NumberingManager）的对应关系:
+    counterType        → w:numFmt（1/一/壹/①/I/i/A/a）
+    prefix / suffix    → w:lvlText 中编号前后的文字
+    cascade/separator  → w:lvlText 中上级编号的占位符（%1.%2）
+    第一章 → 1         → 一级标题为中文计数时，下级引用它的编号显示为阿拉伯数字（w:isLgl，
+                         Word 会把该级 lvlText 中的所有编号都显示为阿拉伯数字）。该级 lvlText 中的其他编号
+                         不是阿拉伯数字时（如二级为 一/I）无法在列表中表示，由 native_unsupported 给出原因，
+                         格式化退回文本模式
+编号后接一个空格（w:suff="space"），与文本模式一致。启用了编号的级别的上级即使未启用编号也加入列表
+（编号文本为空），保证各级计数与文本模式相同。
+
+生成的定义以 w:name 标记，再次格式化（包括增量格式化）时复用原有的 abstractNumId / numId。
+"""
+import re
+from typing import Dict, Optional, Tuple
+
+from docx.oxml.ns import qn
+from docx.oxml.parser import parse_xml
+
+HEADING_LEVELS = ('heading1', 'heading2', 'heading3', 'heading4')
+
+# 列表定义的名称，用于识别之前生成的定义
+LIST_NAME = 'DocumentFormatterHeadings'
+
+NUM_FORMATS = {
+    '1': 'decimal',
+    '一': 'chineseCountingThousand',
+    '壹': 'chineseLegalSimplified',
+    '①': 'decimalEnclosedCircleChinese',
+    'I': 'upperRoman',
+    'i': 'lowerRoman',
+    'A': 'upperLetter',
+    'a': 'lowerLetter',
+}
+
+W_ABSTRACT_NUM = qn('w:abstractNum')
+W_ABSTRACT_NUM_ID = qn('w:abstractNumId')
+W_NUM = qn('w:num')
+W_NUM_ID = qn('w:numId')
+W_NAME = qn('w:name')
+W_VAL = qn('w:val')
+
+_W_NS = 'xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main"'
+
+
+def _numbering_configs(styles) -> Dict[str, Optional[Dict]]:
+    return {key: (styles.get(key) or {}).get('numbering') for key in HEADING_LEVELS}
+
+
+def list_levels(styles) -> Tuple[str, ...]:
+    """
+    需要加入列表的标题级别：最深的启用了编号的级别及其上级（上级标题决定下级何时重新编号）；
+    没有启用编号的级别时为空
+    """
+    configs = _numbering_configs(styles or {})
+    deepest = max((level for level, key in enumerate(HEADING_LEVELS)
+                   if configs[key] and configs[key].get('enabled')), default=-1)
+    return HEADING_LEVELS[:deepest + 1]
+
+
+def _cascade_text(configs, level) -> Tuple[str, bool]:
+    """第 level 级（0 起）提供给下级的编号文本，对应 NumberingManager.get_cascade_string；返回 (文本, 是否需要 isLgl)"""
+    key = HEADING_LEVELS[level]
+    config = configs[key]
+    placeholder = f'%{level + 1}'
+    if not config:
+        return placeholder, False
+    type_str = config.get('counterType', '1')
+    if key == 'heading1' and type_str in ('一', '壹'):
+        return placeholder, True
+    text = f"{config.get('prefix', '')}{placeholder}{config.get('suffix', '')}"
+    if config.get('cascade') and level > 0:
+        parent, legal = _cascade_text(configs, level - 1)
+        return f"{parent}{config.get('separator', '.')}{text}", legal
+    return text, False
+
+
+def level_text(configs, level) -> Tuple[str, bool]:
+    """第 level 级的 lvlText，对应 NumberingManager.get_number_string；未启用编号时为空字符串"""
+    config = configs[HEADING_LEVELS[level]]
+    if not config or not config.get('enabled'):
+        return '', False
+    text = f"{config.get('prefix', '')}%{level + 1}{config.get('suffix', '')}"
+    if config.get('cascade') and level > 0:
+        parent, legal = _cascade_text(configs, level - 1)
+        return f"{parent}{config.get('separator', '.')}{text}", legal
+    return text, False
+
+
+def native_unsupported(styles) -> Optional[str]:
+    """
+    原生列表无法与文本模式显示相同编号时返回原因，否则返回 None
+
+    需要 w:isLgl 的级别中，除一级外的编号占位符都必须是阿拉伯数字，否则 isLgl 会把它们也显示为阿拉伯数字。
+    """
+    configs = _numbering_configs(styles or {})
+    for level in range(len(list_levels(styles))):
+        text, legal = level_text(configs, level)
+        if not legal:
+            continue
+        for placeholder in re.findall(r'%(\d)', text):
+            key = HEADING_LEVELS[int(placeholder) - 1]
+            counter_type = (configs[key] or {}).get('counterType', '1')
+            if placeholder != '1' and NUM_FORMATS.get(counter_type, 'decimal') != 'decimal':
+                return f"{key} 的计数方式 {counter_type} 与中文计数的一级标题（显示为阿拉伯数字）无法在同一级列表中表示"
+    return None
+
+
+def _escape(text: str) -> str:
+    return text.replace('&', '&amp;').replace('<', '&lt;').replace('>', '&gt;').replace('"', '&quot;')
+
+
+def _level_xml(configs, level) -> str:
+    config = configs[HEADING_LEVELS[level]] or {}
+    text, legal = level_text(configs, level)
+    num_format = NUM_FORMATS.get(config.get('counterType', '1'), 'decimal')
+    return (f'<w:lvl w:ilvl="{level}"><w:start w:val="1"/><w:numFmt w:val="{num_format}"/>'
+            f'{"<w:isLgl/>" if legal else ""}'
+            f'<w:suff w:val="{"space" if text else "nothing"}"/>'
+            f'<w:lvlText w:val="{_escape(text)}"/><w:lvlJc w:val="left"/></w:lvl>')
+
+
+def build_abstract_num(styles, abstract_num_id: int):
+    """按各级标题的 numbering 配置生成 w:abstractNum 元素"""
+    configs = _numbering_configs(styles or {})
+    levels = ''.join(_level_xml(configs, level) for level in range(len(HEADING_LEVELS)))
+    return parse_xml(f'<w:abstractNum {_W_NS} w:abstractNumId="{abstract_num_id}">'
+                     f'<w:multiLevelType w:val="multilevel"/><w:name w:val="{LIST_NAME}"/>{levels}</w:abstractNum>')
+
+
+def _ids(numbering, tag, attr):
+    ids = []
+    for element in numbering.iterchildren(tag):
+        try:
+            ids.append(int(element.get(attr)))
+        except (TypeError, ValueError):
+            pass
+    return ids
+
+
+def ensure_list_definition(numbering, styles) -> int:
+    """
+    在 numbering.xml 的根元素（w:numbering）中写入标题多级列表定义，返回 numId
+
+    已有本模块生成的定义时替换其级别定义并沿用原有的 numId。
+    """
+    existing = None
+    for abstract_num in numbering.iterchildren(W_ABSTRACT_NUM):
+        name = abstract_num.find(W_NAME)
+        if name is not None and name.get(W_VAL) == LIST_NAME:
+            existing = abstract_num
+            break
+
+    if existing is not None:
+        abstract_num_id = int(existing.get(W_ABSTRACT_NUM_ID))
+        numbering.replace(existing, build_abstract_num(styles, abstract_num_id))
+        for num in numbering.iterchildren(W_NUM):
+            ref = num.find(W_ABSTRACT_NUM_ID)
+            if ref is not None and ref.get(W_VAL) == str(abstract_num_id):
+                return int(num.get(W_NUM_ID))
+    else:
+        abstract_num_id = max(_ids(numbering, W_ABSTRACT_NUM, W_ABSTRACT_NUM_ID), default=-1) + 1
+        abstract_num = build_abstract_num(styles, abstract_num_id)
+        # 架构顺序：所有 w:abstractNum 在 w:num 之前
+        first_num = numbering.find(W_NUM)
+        if first_num is not None:
+            first_num.addprevious(abstract_num)
+        else:
+            previous = list(numbering.iterchildren(W_ABSTRACT_NUM))
+            if previous:
+                previous[-1].addnext(abstract_num)
+            else:
+                numbering.insert(0, abstract_num)
+
+    num_id = max(_ids(numbering, W_NUM, W_NUM_ID), default=0) + 1
+    num = parse_xml(f'<w:num {_W_NS} w:numId="{num_id}"><w:abstractNumId w:val="{abstract_num_id}"/></w:num>')
+    nums = list(numbering.iterchildren(W_NUM))
+    if nums:
+        nums[-1].addnext(num)
+    else:
+        abstract_nums = list(numbering.iterchildren(W_ABSTRACT_NUM))
+        abstract_nums[-1].addnext(num)
+    return num_id
+
+
+def apply_list_level(p, num_id: int, style_key: str) -> None:
+    """让段落 w:p 引用标题列表的对应级别（替换段落上原有的 w:numPr）"""
+    pPr = p.get_or_add_pPr()
+    pPr._remove_numPr()
+    numPr = pPr.get_or_add_numPr()
+    numPr.get_or_add_ilvl().val = HEADING_LEVELS.index(style_key)
+    numPr.get_or_add_numId().val = num_id
@@ -0,0 +1,108 @@
+"""
+格式化输出缓存
+输入文档内容、规范、mappings、文本替换、自动编号开关与影响输出的选项都相同时，格式化的输出文件逐字节相同。
+format_document 以这些内容的哈希为键缓存输出文件，命中时直接把缓存的文件复制（或硬链接）到输出路径，
+不再解析、格式化和写出文档（例如用户取消保存对话框后重试）。
+
+- 缓存目录：default_cache_dir('output')，即 FORMATTER_CACHE_DIR 下的 output 目录
+- 大小上限：FORMATTER_OUTPUT_CACHE_MAX_MB（默认 256MB），按最近使用时间淘汰
+- 闲置时间：FORMATTER_OUTPUT_CACHE_MAX_AGE_DAYS（默认 7 天），超过后淘汰
+- 硬链接：FORMATTER_OUTPUT_CACHE_LINK=1 时存取都优先使用硬链接（不复制数据）
+- 关闭：FORMATTER_OUTPUT_CACHE=0，或 options.outputCache 为 false；增量模式（options.incremental）不使用输出缓存
+"""
+import hashlib
+import json
+import logging
+import os
+from typing import Dict, Optional
+
+from disk_cache import DiskCache, default_cache_dir, hash_file, make_key
+from incremental import profile_fingerprint
+from payload import encode_mappings
+
+logger = logging.getLogger('formatter')
+
+# 输出缓存版本：修改格式化逻辑导致输出变化时必须递增，使旧的缓存失效
+OUTPUT_CACHE_VERSION = 3
+
+DEFAULT_OUTPUT_CACHE_MAX_MB = 256
+DEFAULT_OUTPUT_CACHE_MAX_AGE_DAYS = 7
+
+# 结果中与本次请求相关、不随缓存保存的字段
+_REQUEST_FIELDS = ('outputPath', 'cacheHit', 'timings', 'incremental', 'memory', 'parallel', 'ruleTimings')
+
+
+def request_key(input_path, profile, mappings, text_replacements, enable_auto_numbering, options) -> str:
+    """格式化请求的缓存键：输入文档内容 + 规范指纹（见 incremental.profile_fingerprint）+ mappings + 文本替换"""
+    edits = json.dumps([encode_mappings(mappings), text_replacements or {}], sort_keys=True, ensure_ascii=False,
+                       separators=(',', ':'), default=str)
+    return make_key(hash_file(input_path), profile_fingerprint(profile, options, enable_auto_numbering),
+                    hashlib.sha256(edits.encode('utf-8')).hexdigest(), OUTPUT_CACHE_VERSION)
+
+
+class OutputCache(DiskCache):
+    """
+    输出文件缓存：条目为 <键>.docx，格式化结果（去掉 outputPath 等字段）保存在同名的 .meta.json 中，两者一起淘汰
+
+    命中时先校验缓存文件的 SHA-256（硬链接的输出文件可能在缓存之外被修改），不一致时删除该条目。
+    """
+    META_SUFFIX = '.meta.json'
+
+    def __init__(self, cache_dir: str, max_bytes: int, max_age: Optional[float] = None, link: bool = False):
+        super().__init__(cache_dir, max_bytes=max_bytes, suffix='.docx', max_age=max_age)
+        self.link = link
+
+    def _meta_path(self, path: str) -> str:
+        return path[:-len(self.suffix)] + self.META_SUFFIX
+
+    def _remove(self, path: str) -> bool:
+        removed = super()._remove(path)
+        try:
+            os.remove(self._meta_path(path))
+        except OSError:
+            pass
+        return removed
+
+    def lookup(self, key: str, output_path: str) -> Optional[Dict]:
+        """命中时把缓存的输出放到 output_path，返回保存的格式化结果；未命中返回 None"""
+        path = self.path_for(key)
+        try:
+            with open(self._meta_path(path), 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+            if hash_file(path) != meta.get("outputHash"):
+                self._remove(path)
+                return None
+        except (OSError, ValueError):
+            return None
+        if not self.get_file(key, output_path, self.link):
+            return None
+        return meta.get("result")
+
+    def store(self, key: str, output_path: str, result: Dict) -> bool:
+        """缓存 output_path 与格式化结果，失败时记录警告并返回 False（与查找失败一样，不影响格式化结果）"""
+        try:
+            meta = {
+                "outputHash": hash_file(output_path),
+                "result": {name: value for name, value in result.items() if name not in _REQUEST_FIELDS},
+            }
+            os.makedirs(self.cache_dir, exist_ok=True)
+            with open(self._meta_path(self.path_for(key)), 'w', encoding='utf-8') as f:
+                json.dump(meta, f, ensure_ascii=False, separators=(',', ':'))
+            if self.put_file(key, output_path, self.link):
+                return True
+        except Exception as e:
+            logger.warning(f"写入输出缓存失败: {str(e)}")
+            return False
+        logger.warning("写入输出缓存失败: 无法保存输出文件")
+        return False
+
+
+def get_output_cache(options=None) -> Optional[OutputCache]:
+    """输出缓存实例；被环境变量或 options.outputCache 关闭时返回 None"""
+    if os.environ.get('FORMATTER_OUTPUT_CACHE', '1') == '0' or (options or {}).get('outputCache') is False:
+        return None
+    max_mb = float(os.environ.get('FORMATTER_OUTPUT_CACHE_MAX_MB', DEFAULT_OUTPUT_CACHE_MAX_MB))
+    max_age_days = float(os.environ.get('FORMATTER_OUTPUT_CACHE_MAX_AGE_DAYS', DEFAULT_OUTPUT_CACHE_MAX_AGE_DAYS))
+    return OutputCache(default_cache_dir('output'), max_bytes=int(max_mb * 1024 * 1024),
+                       max_age=max_age_days * 24 * 3600,
+                       link=os.environ.get('FORMATTER_OUTPUT_CACHE_LINK') == '1')
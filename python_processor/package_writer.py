@@ -0,0 +1,253 @@
+"""
+部件级的 docx 包写出
+格式化只会修改 document.xml、styles.xml 等少数部件，而 doc.save() 会把包中所有部件
+（包括体积很大的 word/media/* 图片）重新序列化、重新压缩。
+
+这里只对修改过的部件重新压缩，其余 zip 条目直接复制原始的压缩数据（不解压、不重新压缩），
+写出时间因此只与文本量有关，而与图片大小无关。
+"""
+import os
+import struct
+import tempfile
+import zipfile
+import zlib
+from contextlib import contextmanager
+from typing import Callable, Dict, Optional, Tuple
+
+# zip 格式常量（见 PKWARE APPNOTE）
+_LOCAL_HEADER = struct.Struct('<4s2B4HL2L2H')
+_CENTRAL_HEADER = struct.Struct('<4s4B4HL2L5H2L')
+_END_RECORD = struct.Struct('<4s4H2LH')
+_LOCAL_SIGNATURE = b'PK\x03\x04'
+_CENTRAL_SIGNATURE = b'PK\x01\x02'
+_END_SIGNATURE = b'PK\x05\x06'
+_VERSION = 20
+_FLAG_UTF8 = 0x800
+_ZIP32_LIMIT = 0xFFFFFFFF
+_MAX_ENTRIES = 0xFFFF
+
+COPY_CHUNK_SIZE = 1024 * 1024
+
+
+class PackageTooLarge(ValueError):
+    """输出需要 ZIP64 扩展（条目或总大小超过 4GB），部件级写出不支持"""
+
+
+def _dos_datetime(date_time) -> Tuple[int, int]:
+    year, month, day, hour, minute, second = date_time
+    dos_date = (max(year, 1980) - 1980) << 9 | month << 5 | day
+    dos_time = hour << 11 | minute << 5 | (second // 2)
+    return dos_time, dos_date
+
+
+class _Entry:
+    """已写出的 zip 条目，用于生成中央目录"""
+
+    def __init__(self, source: zipfile.ZipInfo, offset: int):
+        self.name = source.filename.encode('utf-8')
+        self.flags = _FLAG_UTF8 if not source.filename.isascii() else 0
+        self.method = source.compress_type
+        self.dos_time, self.dos_date = _dos_datetime(source.date_time)
+        self.external_attr = source.external_attr
+        self.create_system = source.create_system
+        self.offset = offset
+        self.crc = 0
+        self.compress_size = 0
+        self.file_size = 0
+
+    def local_header(self) -> bytes:
+        return _LOCAL_HEADER.pack(
+            _LOCAL_SIGNATURE, _VERSION, 0, self.flags, self.method, self.dos_time, self.dos_date,
+            self.crc, self.compress_size, self.file_size, len(self.name), 0) + self.name
+
+    def central_header(self) -> bytes:
+        return _CENTRAL_HEADER.pack(
+            _CENTRAL_SIGNATURE, _VERSION, self.create_system, _VERSION, 0,
+            self.flags, self.method, self.dos_time, self.dos_date, self.crc, self.compress_size, self.file_size, len(self.name), 0, 0, 0, 0,
+            self.external_attr, self.offset) + self.name
+
+
+class _DeflateStream:
+    """以流方式写入一个部件：边写边压缩，结束后回填本地文件头中的 CRC 与大小"""
+
+    def __init__(self, writer: 'PackageWriter', entry: _Entry):
+        self._writer = writer
+        self._entry = entry
+        self._compressor = zlib.compressobj(zlib.Z_DEFAULT_COMPRESSION, zlib.DEFLATED, -15)
+
+    def write(self, data: bytes) -> int:
+        entry = self._entry
+        entry.crc = zlib.crc32(data, entry.crc)
+        entry.file_size += len(data)
+        compressed = self._compressor.compress(data)
+        entry.compress_size += len(compressed)
+        self._writer._fp.write(compressed)
+        return len(data)
+
+    def close(self) -> None:
+        entry = self._entry
+        tail = self._compressor.flush()
+        entry.compress_size += len(tail)
+        fp = self._writer._fp
+        fp.write(tail)
+        if entry.compress_size > _ZIP32_LIMIT or entry.file_size > _ZIP32_LIMIT:
+            raise PackageTooLarge(f"部件 {entry.name.decode('utf-8')} 超过 4GB")
+        end = fp.tell()
+        fp.seek(entry.offset)
+        fp.write(entry.local_header())
+        fp.seek(end)
+        self._writer.stats["encodedParts"] += 1
+        self._writer.stats["encodedBytes"] += entry.file_size
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, *exc_info):
+        if exc_type is None:
+            self.close()
+
+
+class PackageWriter:
+    """
+    按条目写出 zip 包
+
+    stats:
+        copiedParts / copiedBytes: 原样复制的条目数与压缩数据字节数
+        encodedParts / encodedBytes: 重新压缩的条目数与压缩前（序列化后）的字节数
+    """
+
+    def __init__(self, fp):
+        self._fp = fp
+        self._entries = []
+        self.stats = {"copiedParts": 0, "copiedBytes": 0, "encodedParts": 0, "encodedBytes": 0}
+
+    def _start_entry(self, source: zipfile.ZipInfo, method: int) -> _Entry:
+        if len(self._entries) >= _MAX_ENTRIES:
+            raise PackageTooLarge("zip 条目数超过 65535")
+        offset = self._fp.tell()
+        if offset > _ZIP32_LIMIT:
+            raise PackageTooLarge("文档包超过 4GB")
+        entry = _Entry(source, offset)
+        entry.method = method
+        self._entries.append(entry)
+        return entry
+
+    def copy_raw(self, source_fp, info: zipfile.ZipInfo) -> None:
+        """从源 zip 文件中复制一个条目的原始压缩数据"""
+        if info.flag_bits & 0x1:
+            raise ValueError(f"不支持加密的条目: {info.filename}")
+        # 本地文件头中的文件名与扩展字段长度可能与中央目录不同，需要读取本地头确定数据起点
+        source_fp.seek(info.header_offset)
+        header = _LOCAL_HEADER.unpack(source_fp.read(_LOCAL_HEADER.size))
+        source_fp.seek(header[-2] + header[-1], os.SEEK_CUR)
+
+        entry = self._start_entry(info, info.compress_type)
+        entry.crc = info.CRC
+        entry.compress_size = info.compress_size
+        entry.file_size = info.file_size
+        self._fp.write(entry.local_header())
+        remaining = info.compress_size
+        while remaining:
+            chunk = source_fp.read(min(remaining, COPY_CHUNK_SIZE))
+            if not chunk:
+                raise zipfile.BadZipFile(f"条目数据不完整: {info.filename}")
+            self._fp.write(chunk)
+            remaining -= len(chunk)
+        self.stats["copiedParts"] += 1
+        self.stats["copiedBytes"] += info.compress_size
+
+    def open_part(self, info: zipfile.ZipInfo) -> _DeflateStream:
+        """以流方式写入一个重新压缩的条目（沿用 info 的文件名、时间与属性）"""
+        entry = self._start_entry(info, zipfile.ZIP_DEFLATED)
+        self._fp.write(entry.local_header())
+        return _DeflateStream(self, entry)
+
+    def write_part(self, info: zipfile.ZipInfo, data: bytes) -> None:
+        with self.open_part(info) as stream:
+            stream.write(data)
+
+    def close(self) -> None:
+        """写出中央目录与结尾记录"""
+        start = self._fp.tell()
+        for entry in self._entries:
+            self._fp.write(entry.central_header())
+        size = self._fp.tell() - start
+        if start > _ZIP32_LIMIT or size > _ZIP32_LIMIT:
+            raise PackageTooLarge("文档包超过 4GB")
+        count = len(self._entries)
+        self._fp.write(_END_RECORD.pack(_END_SIGNATURE, 0, 0, count, count, size, start, 0))
+
+
+@contextmanager
+def _replace_when_done(output_path: str):
+    """
+    在输出文件所在目录的临时文件中写出，完成后原子地替换 output_path；
+    写出过程中出错或被取消时删除临时文件，不会留下写了一半的输出
+    """
+    directory = os.path.dirname(os.path.abspath(output_path))
+    fd, temp_path = tempfile.mkstemp(suffix='.docx.tmp', dir=directory)
+    try:
+        with os.fdopen(fd, 'w+b') as out:
+            yield out
+        os.replace(temp_path, output_path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+
+def rewrite_package(source_path: str, output_path: str, replaced_parts: Optional[Dict[str, bytes]] = None,
+                    streamed_parts: Optional[Dict[str, Callable[[object], None]]] = None) -> Dict[str, int]:
+    """
+    以源包为模板写出新包，只重新压缩指定的部件
+
+    Args:
+        replaced_parts: {zip 条目名: 新内容}
+        streamed_parts: {zip 条目名: write_fn}，write_fn(stream) 以流方式写出新内容
+        其余条目按原样复制压缩数据。
+
+    输出先写入同目录下的临时文件，全部完成后再替换 output_path，中途失败不会留下半成品。
+
+    Returns:
+        PackageWriter.stats
+    """
+    replaced_parts = replaced_parts or {}
+    streamed_parts = streamed_parts or {}
+    with _replace_when_done(output_path) as out, open(source_path, 'rb') as source_fp, \
+            zipfile.ZipFile(source_fp) as source:
+        writer = PackageWriter(out)
+        for info in source.infolist():
+            if info.filename in streamed_parts:
+                with writer.open_part(info) as stream:
+                    streamed_parts[info.filename](stream)
+            elif info.filename in replaced_parts:
+                writer.write_part(info, replaced_parts[info.filename])
+            else:
+                writer.copy_raw(source_fp, info)
+        writer.close()
+    return writer.stats
+
+
+def save_document(doc, source_path: str, output_path: str, changed_parts) -> Dict[str, int]:
+    """
+    保存 python-docx 文档：只重新序列化 changed_parts 中的部件，其余部件从源文件原样复制
+
+    python-docx 在处理过程中新增了部件（源包中不存在）时无法按部件复制，
+    退回 doc.save() 整体保存，此时所有部件都计为重新压缩。
+
+    Args:
+        changed_parts: 修改过的 python-docx Part 对象
+    """
+    with zipfile.ZipFile(source_path) as source:
+        source_names = set(source.namelist())
+    package_names = {part.partname[1:] for part in doc.part.package.iter_parts()}
+    if not package_names <= source_names:
+        with _replace_when_done(output_path) as out:
+            doc.save(out)
+            out.seek(0)
+            with zipfile.ZipFile(out) as output:
+                infos = output.infolist()
+        return {"copiedParts": 0, "copiedBytes": 0,
+                "encodedParts": len(infos), "encodedBytes": sum(info.file_size for info in infos)}
+    replaced_parts = {part.partname[1:]: part.blob for part in changed_parts}
+    return rewrite_package(source_path, output_path, replaced_parts)
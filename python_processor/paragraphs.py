@@ -0,0 +1,71 @@
+"""
+轻量段落代理
+大文档（低内存）模式下代替 doc.paragraphs：逐个产生段落，不建立整份 Paragraph 列表。
+代理只保存 w:p 元素与缓存的段落文本，python-docx Paragraph 的其余功能（paragraph_format、样式等）
+在首次使用时才创建，段落处理完后随代理一起释放。
+"""
+from docx.text.paragraph import Paragraph
+
+from doc_index import W_P
+
+
+class ParagraphProxy:
+    """
+    w:p 元素的轻量代理，接口与 python-docx 的 Paragraph 相同
+
+    text 在第一次读取时计算并缓存；通过 text、runs、add_run 或其他 Paragraph 接口可能修改段落内容时，
+    缓存失效，下次读取重新计算。
+    """
+    __slots__ = ('_p', '_text', '_paragraph')
+
+    def __init__(self, p):
+        self._p = p
+        self._text = None
+        self._paragraph = None
+
+    @property
+    def _element(self):
+        return self._p
+
+    def _full(self) -> Paragraph:
+        if self._paragraph is None:
+            self._paragraph = Paragraph(self._p, None)
+        return self._paragraph
+
+    @property
+    def text(self) -> str:
+        if self._text is None:
+            self._text = self._p.text
+        return self._text
+
+    @text.setter
+    def text(self, value):
+        self._full().text = value
+        self._text = None
+
+    @property
+    def runs(self):
+        # 调用方可能修改 run 的文本
+        self._text = None
+        return self._full().runs
+
+    def add_run(self, text=None, style=None):
+        self._text = None
+        return self._full().add_run(text, style)
+
+    @property
+    def paragraph_format(self):
+        return self._full().paragraph_format
+
+    def __getattr__(self, name):
+        if name in ParagraphProxy.__slots__:
+            raise AttributeError(name)
+        # 其余接口交给完整的 Paragraph；无法判断是否修改内容，文本缓存失效
+        self._text = None
+        return getattr(self._full(), name)
+
+
+def iter_paragraphs(body):
+    """逐个产生 body 的直接子段落的代理，顺序与 doc.paragraphs 相同"""
+    for p in body.iterchildren(W_P):
+        yield ParagraphProxy(p)
@@ -0,0 +1,323 @@
+"""
+特殊规则处理步骤（pass）
+每条特殊规则实现为一个 pass，格式化时在同一次正文遍历中依次调用各 pass 的钩子，
+启用更多规则不会增加遍历次数。每个 pass 维护自己的计数器，汇总到格式化结果的 rules 字段。
+
+钩子（均为可选，只有重写了的钩子才会被调用）:
+    prepare_styles(styles)          遍历正文之前处理样式定义，返回是否修改了 styles.xml
+    before_style(idx, para, images) 每个段落应用样式之前（含纯图片段落）
+    on_run(idx, r)                  应用样式后的每个 run（w:r 元素）
+    after_style(idx, para)          段落应用样式之后（只对有样式配置的段落）
+    finish(idx, para)               每个段落处理结束时（含被跳过的段落）
+"""
+import logging
+import time
+from typing import Dict, List, Tuple
+
+from docx.enum.style import WD_STYLE_TYPE
+from docx.enum.text import WD_ALIGN_PARAGRAPH
+from docx.oxml.ns import qn
+from docx.shared import Pt
+
+from profiling import NULL_TIMINGS
+from runs import split_run_by_script
+
+logger = logging.getLogger('formatter')
+
+W_PPR = qn('w:pPr')
+W_NUMPR = qn('w:numPr')
+W_ILVL = qn('w:ilvl')
+W_VAL = qn('w:val')
+
+
+def remove_style_numbering(styles) -> int:
+    """从 python-docx Styles 对象的各段落样式中移除 w:numPr，返回处理的样式数量"""
+    removed_count = 0
+    try:
+        if not styles:
+            return 0
+
+        # 遍历所有段落样式
+        for style in styles:
+            try:
+                # 只处理段落样式
+                if not hasattr(style, 'type') or style.type != WD_STYLE_TYPE.PARAGRAPH:
+                    continue
+
+                pPr = style.element.find(W_PPR)
+                if pPr is None:
+                    continue
+
+                # 查找并移除所有 numPr 节点
+                numPr_nodes = pPr.findall(W_NUMPR)
+                if numPr_nodes:
+                    for numPr in numPr_nodes:
+                        pPr.remove(numPr)
+                    removed_count += 1
+                    logger.debug(f"样式 [{style.name}] 已移除编号定义")
+
+            except Exception as e:
+                logger.warning(f"处理样式失败: {str(e)}")
+
+    except Exception as e:
+        logger.warning(f"移除样式级编号失败: {str(e)}")
+
+    return removed_count
+
+
+def remove_paragraph_numbering(paragraph):
+    """
+    移除单个段落的自动编号属性 (w:numPr)
+
+    这不会影响用户手打的 "1." 文本,只移除 Word 的自动列表格式
+
+    Args:
+        paragraph: python-docx Paragraph 对象
+
+    Returns:
+        dict: {"removed": bool, "level": int or None}
+    """
+    result = {"removed": False, "level": None}
+
+    try:
+        pPr = paragraph._element.find(W_PPR)
+        if pPr is None:
+            return result
+
+        # 查找所有 numPr 节点（自动编号属性）
+        numPr_nodes = pPr.findall(W_NUMPR)
+        if not numPr_nodes:
+            return result
+
+        # 尝试获取编号层级信息（用于调试和潜在的样式推断）
+        try:
+            ilvl = numPr_nodes[0].find(W_ILVL)
+            if ilvl is not None and ilvl.get(W_VAL):
+                result["level"] = int(ilvl.get(W_VAL))
+        except Exception:
+            pass
+
+        # 移除找到的所有编号节点
+        for numPr in numPr_nodes:
+            pPr.remove(numPr)
+        result["removed"] = True
+
+    except Exception as e:
+        logger.warning(f"移除段落编号失败: {str(e)}")
+
+    return result
+
+
+def set_times_new_roman(r) -> None:
+    """run 的西文字体设为 Times New Roman（r 为 w:r 元素）"""
+    r_pr = r.get_or_add_rPr()
+    r_fonts = r_pr.get_or_add_rFonts()
+    r_fonts.set(qn('w:ascii'), 'Times New Roman')
+    r_fonts.set(qn('w:hAnsi'), 'Times New Roman')
+
+
+def apply_times_new_roman(r) -> Tuple[int, int]:
+    """
+    run 中含英文或数字时，西文字体设为 Times New Roman（r 为 w:r 元素）
+
+    中西文混排的 run 先在书写系统变化处拆分（runs.split_run_by_script），只有西文段设置 Times New Roman，
+    中文段保留原有字体，其中的弯引号、破折号等仍使用原来的西文字体。
+
+    Returns:
+        (设置的 run 数, 拆分后增加的 run 数)
+    """
+    try:
+        segments = split_run_by_script(r)
+        applied = 0
+        for run, latin in segments:
+            if latin:
+                set_times_new_roman(run)
+                applied += 1
+        return applied, len(segments) - 1
+    except Exception:
+        return 0, 0
+
+
+class RulePass:
+    """特殊规则 pass 的基类；name 为 profile.specialRules 中的开关名"""
+    name = ''
+
+    def __init__(self):
+        self.counters: Dict[str, int] = {}
+        # 规则内部步骤的累计耗时（秒），与计数分开报告：计数可以缓存、比较，耗时每次不同
+        self.durations: Dict[str, float] = {}
+
+    def count(self, counter: str, n: int = 1) -> None:
+        self.counters[counter] = self.counters.get(counter, 0) + n
+
+    def spend(self, step: str, seconds: float) -> None:
+        self.durations[step] = self.durations.get(step, 0.0) + seconds
+
+    def prepare_styles(self, styles) -> bool:
+        return False
+
+    def before_style(self, idx, para, images) -> None:
+        pass
+
+    def on_run(self, idx, r) -> None:
+        pass
+
+    def after_style(self, idx, para) -> None:
+        pass
+
+    def finish(self, idx, para) -> None:
+        pass
+
+
+class RemoveNumberingPass(RulePass):
+    """
+    移除自动编号：样式定义中的编号在遍历前一次性清除，段落上的编号在段落处理结束时清除
+
+    段落编号只需在最后清除一次：应用样式、自动编号前缀都不会重新引入 w:numPr。
+    """
+    name = 'removeManualNumberPrefixes'
+
+    def prepare_styles(self, styles) -> bool:
+        removed = remove_style_numbering(styles)
+        self.count('styles', removed)
+        logger.debug(f"已清理 {removed} 个样式的编号定义")
+        return removed > 0
+
+    def finish(self, idx, para) -> None:
+        removal_result = remove_paragraph_numbering(para)
+        if removal_result["removed"]:
+            self.count('paragraphs')
+            if logger.isEnabledFor(logging.DEBUG):
+                level_info = f" (层级:{removal_result['level']})" if removal_result["level"] is not None else ""
+                logger.debug(f"段落 {idx} 已移除编号{level_info}: {para.text.strip()[:30]}...")
+
+
+class PictureLineSpacingPass(RulePass):
+    """图片段落单倍行距"""
+    name = 'pictureLineSpacing'
+
+    def before_style(self, idx, para, images) -> None:
+        if not images:
+            return
+        try:
+            para.paragraph_format.line_spacing = 1.0
+            self.count('paragraphs')
+        except Exception:
+            pass
+
+
+class PictureCenterAlignPass(RulePass):
+    """图片段落居中"""
+    name = 'pictureCenterAlign'
+
+    def before_style(self, idx, para, images) -> None:
+        if not images:
+            return
+        try:
+            para.paragraph_format.alignment = WD_ALIGN_PARAGRAPH.CENTER
+            self.count('paragraphs')
+        except Exception:
+            pass
+
+
+class ResetIndentsPass(RulePass):
+    """应用样式后重置左右缩进与段前段后间距"""
+    name = 'resetIndentsAndSpacing'
+
+    def after_style(self, idx, para) -> None:
+        try:
+            para_format = para.paragraph_format
+            para_format.left_indent = Pt(0)
+            para_format.right_indent = Pt(0)
+            para_format.space_before = Pt(0)
+            para_format.space_after = Pt(0)
+            self.count('paragraphs')
+        except Exception:
+            pass
+
+
+class TimesNewRomanPass(RulePass):
+    """英文与数字自动使用 Times New Roman；中西文混排的 run 按书写系统拆分，计数 splits 为拆分的 run 数"""
+    name = 'autoTimesNewRoman'
+
+    def on_run(self, idx, r) -> None:
+        start = time.perf_counter()
+        applied, added = apply_times_new_roman(r)
+        self.spend('classify', time.perf_counter() - start)
+        if applied:
+            self.count('runs', applied)
+        if added:
+            self.count('splits')
+
+
+# 按执行顺序排列的全部特殊规则
+RULE_PASSES = (
+    RemoveNumberingPass,
+    PictureLineSpacingPass,
+    PictureCenterAlignPass,
+    ResetIndentsPass,
+    TimesNewRomanPass,
+)
+
+
+def _overrides(rule: RulePass, hook: str) -> bool:
+    return getattr(type(rule), hook) is not getattr(RulePass, hook)
+
+
+class PassPipeline:
+    """
+    按 specialRules 启用的 pass 集合，预先按钩子分组，遍历时只调用实际实现了该钩子的 pass
+
+    开启剖析时（见 profiling.py）各钩子的耗时按规则计入 timings 的 "rule:规则名" 阶段。
+    """
+
+    def __init__(self, special_rules: Dict, timings=NULL_TIMINGS):
+        self.passes: List[RulePass] = [cls() for cls in RULE_PASSES if special_rules.get(cls.name)]
+        hooks = {hook: [timings.timed(f'rule:{rule.name}', getattr(rule, hook))
+                        for rule in self.passes if _overrides(rule, hook)]
+                 for hook in ('prepare_styles', 'before_style', 'on_run', 'after_style', 'finish')}
+        self._prepare_styles = hooks['prepare_styles']
+        self._before_style = hooks['before_style']
+        self._on_run = hooks['on_run']
+        self._after_style = hooks['after_style']
+        self._finish = hooks['finish']
+        self.needs_styles = bool(self._prepare_styles)
+        self.has_run_hooks = bool(self._on_run)
+
+    def prepare_styles(self, styles) -> bool:
+        modified = False
+        for hook in self._prepare_styles:
+            modified = hook(styles) or modified
+        return modified
+
+    def before_style(self, idx, para, images) -> None:
+        for hook in self._before_style:
+            hook(idx, para, images)
+
+    def on_run(self, idx, r) -> None:
+        for hook in self._on_run:
+            hook(idx, r)
+
+    def after_style(self, idx, para) -> None:
+        for hook in self._after_style:
+            hook(idx, para)
+
+    def finish(self, idx, para) -> None:
+        for hook in self._finish:
+            hook(idx, para)
+
+    def add_counters(self, counters: Dict[str, Dict[str, int]], durations: Dict[str, Dict[str, float]] = None) -> None:
+        """累加另一个 PassPipeline 的 counters() 与 durations()（并行引擎合并各块的计数）"""
+        for rule in self.passes:
+            for counter, n in counters.get(rule.name, {}).items():
+                rule.count(counter, n)
+            for step, seconds in (durations or {}).get(rule.name, {}).items():
+                rule.spend(step, seconds)
+
+    def counters(self) -> Dict[str, Dict[str, int]]:
+        """各规则的计数器 {规则名: {计数项: 数量}}"""
+        return {rule.name: dict(rule.counters) for rule in self.passes}
+
+    def durations(self) -> Dict[str, Dict[str, float]]:
+        """记录了耗时的规则 {规则名: {步骤: 秒}}"""
+        return {rule.name: dict(rule.durations) for rule in self.passes if rule.durations}
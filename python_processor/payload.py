@@ -0,0 +1,166 @@
+"""
+format 请求的 payload
+命令行 format 的第 3 个参数为 payload，可以是:
+    - JSON 字符串（原有方式）：'{"profile": {...}, "mappings": {...}}'
+    - "-"：从标准输入读取（不受 Windows 命令行 32K 字符的限制）
+    - 文件路径：从该文件读取（如 Electron 写入的临时文件）
+
+mappings 除 {段落索引: 样式键} 外也可以用区间形式，未覆盖的段落为 body:
+    [[0, 0, "documentTitle"], [1, 1, "heading1"], [5, 7, "heading2"]]
+    {"ranges": [[0, 0, "documentTitle"], ...], "word/header1.xml:0": "body"}
+区间为 [起始索引, 结束索引（含）, 样式键]，不能重叠；对象形式中 ranges 以外的键按原有方式逐个指定
+（story 段落键等），优先于区间。区间形式在 format_document 中转为 RangeMappings，按需查找，不展开成逐段的字典。
+"""
+import json
+import sys
+from bisect import bisect_right
+from collections.abc import Mapping
+from typing import Dict, Optional
+
+
+class RangeMappings(Mapping):
+    """
+    区间形式的 mappings，接口与 {段落键: 样式键} 字典相同
+
+    查找正文段落时对区间起点二分；遍历时才逐段产生键（先产生单独指定的键，再按区间顺序产生其余段落）。
+    """
+
+    def __init__(self, ranges, keys: Optional[Dict[str, str]] = None):
+        parsed = []
+        for item in ranges:
+            if not isinstance(item, (list, tuple)) or len(item) != 3:
+                raise ValueError(f"mappings 区间格式错误: {item!r}，应为 [起始索引, 结束索引, 样式键]")
+            start, end, style_key = item
+            if not isinstance(start, int) or not isinstance(end, int) or not 0 <= start <= end:
+                raise ValueError(f"mappings 区间索引错误: {item!r}")
+            if not isinstance(style_key, str):
+                raise ValueError(f"mappings 区间样式键错误: {item!r}")
+            parsed.append((start, end, style_key))
+        parsed.sort()
+        for previous, current in zip(parsed, parsed[1:]):
+            if current[0] <= previous[1]:
+                raise ValueError(f"mappings 区间重叠: {list(previous)} 与 {list(current)}")
+
+        self.ranges = parsed
+        self.explicit = {str(key): value for key, value in (keys or {}).items()}
+        self._starts = [start for start, _, _ in parsed]
+        covered = sum(1 for key in self.explicit if self._range_value(key) is not None)
+        self._length = sum(end - start + 1 for start, end, _ in parsed) + len(self.explicit) - covered
+
+    def _range_value(self, key: str) -> Optional[str]:
+        if not key.isdigit():
+            return None
+        idx = int(key)
+        position = bisect_right(self._starts, idx) - 1
+        if position >= 0:
+            start, end, style_key = self.ranges[position]
+            if idx <= end:
+                return style_key
+        return None
+
+    def __getitem__(self, key):
+        key = str(key)
+        value = self.explicit.get(key)
+        if value is None:
+            value = self._range_value(key)
+            if value is None:
+                raise KeyError(key)
+        return value
+
+    def __iter__(self):
+        yield from self.explicit
+        for start, end, _ in self.ranges:
+            for idx in range(start, end + 1):
+                key = str(idx)
+                if key not in self.explicit:
+                    yield key
+
+    def __len__(self):
+        return self._length
+
+    def has_story_keys(self) -> bool:
+        return any(':' in key for key in self.explicit)
+
+    def to_json(self) -> Dict:
+        """紧凑的 JSON 形式（与输入的对象形式相同）"""
+        data = dict(self.explicit)
+        data["ranges"] = [list(item) for item in self.ranges]
+        return data
+
+
+def parse_mappings(value):
+    """
+    把请求中的 mappings 转为映射对象：字典原样返回，区间形式返回 RangeMappings，None 返回空字典
+
+    Raises:
+        ValueError: 区间形式格式错误
+    """
+    if value is None:
+        return {}
+    if isinstance(value, RangeMappings):
+        return value
+    if isinstance(value, list):
+        return RangeMappings(value)
+    if isinstance(value, dict) and "ranges" in value:
+        keys = {key: style_key for key, style_key in value.items() if key != "ranges"}
+        return RangeMappings(value["ranges"], keys)
+    return value
+
+
+def encode_mappings(mappings):
+    """mappings 的 JSON 可序列化形式（区间形式保持紧凑，用于缓存键与增量状态）"""
+    if isinstance(mappings, RangeMappings):
+        return mappings.to_json()
+    return mappings or {}
+
+
+def has_story_keys(mappings) -> bool:
+    """mappings 中是否指定了 story 段落键（"部件名:序号"）"""
+    if isinstance(mappings, RangeMappings):
+        return mappings.has_story_keys()
+    return any(':' in str(key) for key in (mappings or {}))
+
+
+def encode_ranges(mappings: Dict[str, str]) -> Dict:
+    """
+    把 {段落索引: 样式键} 字典压缩为区间形式（body 段落省略，story 段落键等非索引键保留在对象中）
+
+    Returns:
+        {"ranges": [[起始, 结束, 样式键], ...], 其余键: 样式键}
+    """
+    keys = {}
+    indexed = []
+    for key, style_key in mappings.items():
+        key = str(key)
+        if key.isdigit():
+            if style_key != "body":
+                indexed.append((int(key), style_key))
+        else:
+            keys[key] = style_key
+    ranges = []
+    for idx, style_key in sorted(indexed):
+        if ranges and ranges[-1][1] == idx - 1 and ranges[-1][2] == style_key:
+            ranges[-1][1] = idx
+        else:
+            ranges.append([idx, idx, style_key])
+    keys["ranges"] = ranges
+    return keys
+
+
+def load_payload(source: str) -> Dict:
+    """
+    读取命令行 format 的 payload：JSON 字符串、"-"（标准输入）或文件路径
+
+    Raises:
+        ValueError: 内容不是 JSON 对象
+    """
+    if source == '-':
+        payload = json.loads(sys.stdin.buffer.read().decode('utf-8'))
+    elif source.lstrip().startswith('{'):
+        payload = json.loads(source)
+    else:
+        with open(source, 'rb') as f:
+            payload = json.loads(f.read().decode('utf-8'))
+    if not isinstance(payload, dict):
+        raise ValueError("payload 应为 JSON 对象")
+    return payload
@@ -0,0 +1,71 @@
+"""
+进程资源信息
+跨平台读取当前进程的常驻内存（RSS），不依赖 psutil，便于 PyInstaller 单文件打包
+"""
+import os
+import sys
+from typing import Optional
+
+
+def _windows_memory_counters():
+    """通过 psapi.GetProcessMemoryInfo 读取 Windows 进程内存计数器"""
+    import ctypes
+    from ctypes import wintypes
+
+    class PROCESS_MEMORY_COUNTERS(ctypes.Structure):
+        _fields_ = [
+            ('cb', wintypes.DWORD),
+            ('PageFaultCount', wintypes.DWORD),
+            ('PeakWorkingSetSize', ctypes.c_size_t),
+            ('WorkingSetSize', ctypes.c_size_t),
+            ('QuotaPeakPagedPoolUsage', ctypes.c_size_t),
+            ('QuotaPagedPoolUsage', ctypes.c_size_t),
+            ('QuotaPeakNonPagedPoolUsage', ctypes.c_size_t),
+            ('QuotaNonPagedPoolUsage', ctypes.c_size_t),
+            ('PagefileUsage', ctypes.c_size_t),
+            ('PeakPagefileUsage', ctypes.c_size_t),
+        ]
+
+    counters = PROCESS_MEMORY_COUNTERS()
+    counters.cb = ctypes.sizeof(PROCESS_MEMORY_COUNTERS)
+    handle = ctypes.windll.kernel32.GetCurrentProcess()
+    ok = ctypes.windll.psapi.GetProcessMemoryInfo(handle, ctypes.byref(counters), counters.cb)
+    if not ok:
+        return None
+    return counters
+
+
+def current_rss_mb() -> Optional[float]:
+    """
+    返回当前进程的常驻内存（MB）
+
+    Linux 读取 /proc/self/statm，Windows 读取工作集；其他平台退化为峰值 RSS。
+    无法获取时返回 None。
+    """
+    try:
+        if sys.platform.startswith('linux'):
+            with open('/proc/self/statm', 'r') as f:
+                resident_pages = int(f.read().split()[1])
+            return resident_pages * os.sysconf('SC_PAGE_SIZE') / (1024 * 1024)
+        if sys.platform == 'win32':
+            counters = _windows_memory_counters()
+            return counters.WorkingSetSize / (1024 * 1024) if counters else None
+    except Exception:
+        return None
+    return peak_rss_mb()
+
+
+def peak_rss_mb() -> Optional[float]:
+    """返回当前进程的峰值常驻内存（MB），无法获取时返回 None"""
+    try:
+        if sys.platform == 'win32':
+            counters = _windows_memory_counters()
+            return counters.PeakWorkingSetSize / (1024 * 1024) if counters else None
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # macOS 以字节为单位，Linux 以 KB 为单位
+        if sys.platform == 'darwin':
+            return peak / (1024 * 1024)
+        return peak / 1024
+    except Exception:
+        return None
@@ -0,0 +1,221 @@
+"""
+分阶段计时与性能剖析
+命令行 --profile（或环境变量 FORMATTER_PROFILE）开启后，scan_headings / format 的结果中追加 timings 字段：
+各阶段的墙钟时间与 CPU 时间、各特殊规则的耗时，以及段落、run、表格、图片数量。
+
+剖析模式（逗号分隔，可组合）:
+    timings  只记录分阶段计时（--profile 不带值时的默认值）
+    pstats   另用 cProfile 剖析，输出 <基准路径>.pstats（可用 python -m pstats 或 snakeviz 查看）
+    memory   另用 tracemalloc 记录内存分配，输出 <基准路径>.tracemalloc.txt（分配最多的前 N 个代码行）
+    all      以上全部
+
+未开启时 active() 返回空实现，各处计时调用不做任何事。
+"""
+import cProfile
+import os
+import time
+import tracemalloc
+from contextlib import contextmanager
+from typing import Dict, Optional
+
+from docx.oxml.ns import qn
+
+W_P = qn('w:p')
+W_R = qn('w:r')
+W_TBL = qn('w:tbl')
+
+PROFILE_MODES = ('timings', 'pstats', 'memory')
+DEFAULT_TOP = 20
+
+
+def parse_modes(value) -> frozenset:
+    """
+    解析剖析模式：True / "1" 为 timings，"all" 为全部，否则为逗号分隔的模式名；
+    None、False、""、"0" 表示不开启。开启任何模式都会记录分阶段计时。
+    """
+    if value is None or value is False or value in ('', '0'):
+        return frozenset()
+    if value is True or value == '1':
+        return frozenset(('timings',))
+    if value == 'all':
+        return frozenset(PROFILE_MODES)
+    modes = {mode.strip() for mode in str(value).split(',') if mode.strip()}
+    unknown = modes.difference(PROFILE_MODES)
+    if unknown:
+        raise ValueError(f"未知的剖析模式: {', '.join(sorted(unknown))}")
+    return frozenset(modes | {'timings'})
+
+
+class Timings:
+    """
+    分阶段计时器
+
+    同名阶段多次进入时累加。阶段可以嵌套（如特殊规则 rule:* 的耗时包含在 paragraphs 中），
+    各阶段分别统计，不会从外层阶段中扣除。
+    """
+    enabled = True
+
+    def __init__(self):
+        self._phases: Dict[str, list] = {}
+        self._counts: Dict[str, int] = {}
+        self.artifacts: Dict[str, object] = {}
+
+    def add(self, name: str, wall: float, cpu: float, calls: int = 1) -> None:
+        entry = self._phases.get(name)
+        if entry is None:
+            self._phases[name] = [wall, cpu, calls]
+        else:
+            entry[0] += wall
+            entry[1] += cpu
+            entry[2] += calls
+
+    @contextmanager
+    def phase(self, name: str):
+        wall, cpu = time.perf_counter(), time.process_time()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - wall, time.process_time() - cpu)
+
+    def timed(self, name: str, fn):
+        """返回计入阶段 name 的 fn 包装（用于逐段落调用的钩子）"""
+        def wrapper(*args):
+            wall, cpu = time.perf_counter(), time.process_time()
+            try:
+                return fn(*args)
+            finally:
+                self.add(name, time.perf_counter() - wall, time.process_time() - cpu)
+        return wrapper
+
+    def count(self, name: str, n: int = 1) -> None:
+        self._counts[name] = self._counts.get(name, 0) + n
+
+    def count_elements(self, element) -> None:
+        """统计 element 子树（含自身）中的段落、run 与表格数量"""
+        paragraphs = runs = tables = 0
+        for child in element.iter(W_P, W_R, W_TBL):
+            tag = child.tag
+            if tag == W_R:
+                runs += 1
+            elif tag == W_P:
+                paragraphs += 1
+            else:
+                tables += 1
+        self.count('paragraphs', paragraphs)
+        self.count('runs', runs)
+        self.count('tables', tables)
+
+    def as_dict(self) -> Dict:
+        """
+        Returns:
+            {"phases": {阶段: {"wallMs", "cpuMs", "calls"}}, "counts": {...}, "pstats": 路径, "memory": {...}}
+        """
+        result = {
+            "phases": {name: {"wallMs": round(wall * 1000, 2), "cpuMs": round(cpu * 1000, 2), "calls": calls}
+                       for name, (wall, cpu, calls) in self._phases.items()},
+            "counts": dict(self._counts),
+        }
+        result.update(self.artifacts)
+        return result
+
+
+class _NullTimings:
+    """未开启剖析时的空实现"""
+    enabled = False
+
+    def add(self, name, wall, cpu, calls=1):
+        pass
+
+    @contextmanager
+    def phase(self, name):
+        yield
+
+    def timed(self, name, fn):
+        return fn
+
+    def count(self, name, n=1):
+        pass
+
+    def count_elements(self, element):
+        pass
+
+
+NULL_TIMINGS = _NullTimings()
+_active = NULL_TIMINGS
+
+
+def active():
+    """当前剖析会话的计时器；未开启时为空实现"""
+    return _active
+
+
+@contextmanager
+def session(modes, artifact_base: Optional[str] = None, top: int = DEFAULT_TOP):
+    """
+    开启一次剖析会话，会话内各处通过 active() 记录计时
+
+    Args:
+        modes: parse_modes 的结果；为空时不开启，产出空实现
+        artifact_base: pstats / tracemalloc 报告的基准路径（通常为输出文件路径）
+        top: tracemalloc 报告的代码行数
+    """
+    global _active
+    if not modes:
+        yield NULL_TIMINGS
+        return
+    timings = Timings()
+    profiler = cProfile.Profile() if 'pstats' in modes and artifact_base else None
+    trace_memory = 'memory' in modes and not tracemalloc.is_tracing()
+    previous = _active
+    _active = timings
+    if trace_memory:
+        tracemalloc.start()
+    if profiler is not None:
+        profiler.enable()
+    try:
+        yield timings
+    finally:
+        if profiler is not None:
+            profiler.disable()
+        _active = previous
+        if profiler is not None:
+            path = artifact_base + '.pstats'
+            try:
+                profiler.dump_stats(path)
+                timings.artifacts["pstats"] = path
+            except OSError as e:
+                timings.artifacts["pstats"] = None
+                timings.artifacts["pstatsError"] = str(e)
+        if trace_memory:
+            timings.artifacts["memory"] = _memory_report(artifact_base, top)
+
+
+def _memory_report(artifact_base, top):
+    """停止 tracemalloc，返回 {"peakMb", "currentMb", "report"}，并把分配最多的前 top 个代码行写入报告文件"""
+    snapshot = tracemalloc.take_snapshot()
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    memory = {"peakMb": round(peak / (1024 * 1024), 2), "currentMb": round(current / (1024 * 1024), 2)}
+    if not artifact_base:
+        return memory
+    stats = snapshot.filter_traces((
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, cProfile.__file__),
+        tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+    )).statistics('lineno')
+    path = artifact_base + '.tracemalloc.txt'
+    try:
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(f"峰值 {memory['peakMb']} MB，结束时 {memory['currentMb']} MB，分配最多的前 {top} 个代码行:\n")
+            for stat in stats[:top]:
+                f.write(f"{stat}\n")
+        memory["report"] = path
+    except OSError as e:
+        memory["reportError"] = str(e)
+    return memory
+
+
+def artifact_base_for(path: str, suffix: str = '') -> str:
+    """剖析报告的基准路径：与 path 同目录，去掉扩展名并加上 suffix"""
+    root, _ = os.path.splitext(path)
+    return root + suffix
@@ -0,0 +1,190 @@
+"""
+进度事件与协作式取消
+长时间的 format / scan_headings 在处理过程中按节流间隔发出进度事件（NDJSON，每行一个 JSON）:
+    {"type": "progress", "phase": "paragraphs", "done": 1200, "total": 10000, "elapsedMs": 850.3}
+total 未知时（流式引擎边解析边处理）为 null。阶段切换时立即发出一条事件。
+
+取消:
+    - 信号：命令行模式下 SIGINT / SIGTERM（Windows 为 SIGINT / SIGBREAK）只设置取消标记
+    - 哨兵文件：指定 cancel_file 时，该文件出现即视为取消（每 CANCEL_CHECK_INTERVAL 秒最多检查一次）
+各引擎在段落（w:body 子元素）之间调用 step()，取消后在下一次 step() 时抛出 Cancelled。
+输出先写入临时文件再替换，被取消时不会留下写了一半的输出文件。
+
+未开启时 active() 返回空实现，各处调用不做任何事。
+"""
+import json
+import os
+import signal
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Optional
+
+DEFAULT_INTERVAL = 0.2
+# 哨兵文件的检查间隔（秒），保证取消后 100ms 内停止
+CANCEL_CHECK_INTERVAL = 0.02
+
+
+class Cancelled(Exception):
+    """任务被取消"""
+
+    def __init__(self, completed: Dict):
+        super().__init__("已取消")
+        self.completed = completed
+
+
+class Progress:
+    """
+    进度与取消状态
+
+    Args:
+        emit: 进度事件的输出回调，None 时只检查取消
+        interval: 两次进度事件之间的最短间隔（秒）
+        cancel_file: 取消哨兵文件路径
+    """
+    enabled = True
+
+    def __init__(self, emit: Optional[Callable[[Dict], None]] = None, interval: float = DEFAULT_INTERVAL,
+                 cancel_file: Optional[str] = None):
+        self.emit = emit
+        self.interval = interval
+        self.cancel_file = cancel_file
+        self.cancelled = False
+        self.started = time.perf_counter()
+        self.phase_name = None
+        self.done = 0
+        self.total = None
+        self._next_emit = 0.0
+        self._next_check = 0.0
+
+    def cancel(self) -> None:
+        """设置取消标记（可在信号处理函数或其他线程中调用）"""
+        self.cancelled = True
+
+    def phase(self, name: str, total: Optional[int] = None) -> None:
+        """进入新阶段，done 清零；先检查取消"""
+        self.check()
+        self.phase_name = name
+        self.done = 0
+        self.total = total
+        self._report(time.perf_counter())
+
+    def step(self, n: int = 1) -> None:
+        """当前阶段完成 n 项（段落之间调用）；被取消时抛出 Cancelled"""
+        self.done += n
+        now = time.perf_counter()
+        if now >= self._next_check:
+            self._next_check = now + CANCEL_CHECK_INTERVAL
+            self.check()
+        if self.emit is not None and now >= self._next_emit:
+            self._report(now)
+
+    def check(self) -> None:
+        """被取消时抛出 Cancelled"""
+        if not self.cancelled and self.cancel_file and os.path.exists(self.cancel_file):
+            self.cancelled = True
+        if self.cancelled:
+            raise Cancelled(self.snapshot())
+
+    def snapshot(self) -> Dict:
+        return {
+            "phase": self.phase_name,
+            "done": self.done,
+            "total": self.total,
+            "elapsedMs": round((time.perf_counter() - self.started) * 1000, 1),
+        }
+
+    def _report(self, now: float) -> None:
+        if self.emit is None:
+            return
+        self._next_emit = now + self.interval
+        event = {"type": "progress"}
+        event.update(self.snapshot())
+        self.emit(event)
+
+
+class _NullProgress:
+    """未开启进度与取消时的空实现"""
+    enabled = False
+
+    def phase(self, name, total=None):
+        pass
+
+    def step(self, n=1):
+        pass
+
+    def check(self):
+        pass
+
+
+NULL_PROGRESS = _NullProgress()
+_active = NULL_PROGRESS
+
+
+def active():
+    """当前会话的进度对象；未开启时为空实现"""
+    return _active
+
+
+def cancelled_result(error: Cancelled) -> Dict:
+    """被取消的任务的结果"""
+    return {"success": False, "cancelled": True, "error": str(error), "completed": error.completed}
+
+
+def stream_writer(target) -> Optional[Callable[[Dict], None]]:
+    """
+    按 --progress 的取值返回进度事件的输出回调
+
+    True / "stderr" 写入标准错误，"fd:N" 写入文件描述符 N（由调用方打开，如 Electron spawn 的额外 stdio），
+    None / False 不输出。
+    """
+    if target is None or target is False:
+        return None
+    if target is True or target == 'stderr':
+        stream = sys.stderr
+    elif isinstance(target, str) and target.startswith('fd:'):
+        stream = os.fdopen(int(target[3:]), 'w', encoding='utf-8', buffering=1, closefd=False)
+    else:
+        raise ValueError(f"未知的进度输出: {target}")
+
+    def write(event):
+        stream.write(json.dumps(event, ensure_ascii=False) + '\n')
+        stream.flush()
+    return write
+
+
+def _cancel_signals():
+    if sys.platform == 'win32':
+        return [signal.SIGINT, getattr(signal, 'SIGBREAK', signal.SIGINT)]
+    return [signal.SIGINT, signal.SIGTERM]
+
+
+@contextmanager
+def session(emit=None, interval: float = DEFAULT_INTERVAL, cancel_file: Optional[str] = None,
+            handle_signals: bool = False):
+    """
+    开启一次进度会话，会话内各处通过 active() 报告进度、检查取消
+
+    Args:
+        emit: 进度事件的输出回调
+        cancel_file: 取消哨兵文件路径
+        handle_signals: 是否把 SIGINT / SIGTERM 改为设置取消标记（只能在主线程中使用）
+    """
+    global _active
+    if emit is None and not cancel_file and not handle_signals:
+        yield NULL_PROGRESS
+        return
+    progress = Progress(emit, interval, cancel_file)
+    previous_handlers = {}
+    if handle_signals and threading.current_thread() is threading.main_thread():
+        for signum in set(_cancel_signals()):
+            previous_handlers[signum] = signal.signal(signum, lambda *_: progress.cancel())
+    previous = _active
+    _active = progress
+    try:
+        yield progress
+    finally:
+        _active = previous
+        for signum, handler in previous_handlers.items():
+            signal.signal(signum, handler)
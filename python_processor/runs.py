@@ -0,0 +1,204 @@
+"""
+run 级别的规范化
+从网页粘贴或经过修订的文档常把一句话拆成几十个 run，格式化时每个 run 都要单独处理。
+这里提供在应用样式之前合并相邻同格式 run 的规范化步骤，以及按书写系统拆分中西文混排 run 的步骤。
+"""
+import copy
+import re
+from typing import List, Optional, Tuple
+
+from docx.oxml.ns import qn
+
+W_P = qn('w:p')
+W_R = qn('w:r')
+W_RPR = qn('w:rPr')
+W_T = qn('w:t')
+XML_SPACE = '{http://www.w3.org/XML/1998/namespace}space'
+
+# 可以安全合并的 run 内容：纯文本及简单的字符级元素。
+# 包含域（w:fldChar/w:instrText）、图片（w:drawing/w:pict/w:object）、脚注引用等其他内容的 run 不参与合并。
+MERGEABLE_CONTENT_TAGS = frozenset(qn(tag) for tag in (
+    'w:t', 'w:tab', 'w:br', 'w:cr', 'w:noBreakHyphen', 'w:softHyphen', 'w:lastRenderedPageBreak',
+))
+
+
+def _element_key(element):
+    """元素的规范化形式：与子元素顺序、属性顺序无关"""
+    return (
+        element.tag,
+        tuple(sorted(element.attrib.items())),
+        tuple(sorted(_element_key(child) for child in element)),
+        element.text or '',
+    )
+
+
+def rpr_key(rPr):
+    """w:rPr 的规范化形式，None 与空 rPr 视为相同"""
+    if rPr is None:
+        return ()
+    return tuple(sorted(_element_key(child) for child in rPr))
+
+
+def _is_mergeable(r) -> bool:
+    for child in r:
+        tag = child.tag
+        if tag != W_RPR and tag not in MERGEABLE_CONTENT_TAGS:
+            return False
+    return True
+
+
+def _append_content(target, source) -> None:
+    """把 source 的内容移动到 target 末尾，相邻的 w:t 合并为一个"""
+    last = target[-1] if len(target) else None
+    for child in list(source):
+        if child.tag == W_RPR:
+            continue
+        if child.tag == W_T and last is not None and last.tag == W_T:
+            text = (last.text or '') + (child.text or '')
+            last.text = text
+            if text != text.strip():
+                last.set(XML_SPACE, 'preserve')
+            continue
+        target.append(child)
+        last = child
+
+
+def coalesce_paragraph_runs(p) -> Tuple[int, int]:
+    """
+    合并段落中相邻且 rPr 相同的 run（只处理 w:p 的直接子 run）
+
+    中间隔有书签、域、批注等任何非 run 元素时不合并。
+
+    Returns:
+        (合并前 run 数, 合并后 run 数)
+    """
+    before = 0
+    merged = 0
+    previous = None
+    previous_key = None
+    for child in list(p):
+        if child.tag != W_R:
+            previous = None
+            continue
+        before += 1
+        if not _is_mergeable(child):
+            previous = None
+            continue
+        key = rpr_key(child.find(W_RPR))
+        if previous is not None and key == previous_key:
+            _append_content(previous, child)
+            p.remove(child)
+            merged += 1
+            continue
+        previous = child
+        previous_key = key
+    return before, before - merged
+
+
+def coalesce_runs(root) -> Tuple[int, int]:
+    """
+    对 root 下的所有段落（含表格、文本框中的段落）合并相邻同格式 run
+
+    Returns:
+        (合并前 run 数, 合并后 run 数)
+    """
+    total_before = 0
+    total_after = 0
+    # 先收集段落列表，避免边遍历边修改树
+    for p in list(root.iter(W_P)):
+        before, after = coalesce_paragraph_runs(p)
+        total_before += before
+        total_after += after
+    return total_before, total_after
+
+
+# 书写系统分类：西文（ASCII 字母与数字）、中日韩（汉字、假名、谚文、中日韩标点与全角字符）、
+# 中性（空格、ASCII 标点、弯引号等其他字符，不引起拆分，归入相邻的段）。
+# 分类用预编译的正则在 C 层完成，不逐字符执行 Python 代码。
+_CJK_RANGES = ('\u2e80-\u2fdf\u3000-\u303f\u3040-\u30ff\u3100-\u318f\u31a0-\u31ef\u3400-\u4dbf'
+               '\u4e00-\u9fff\uac00-\ud7af\uf900-\ufaff\ufe30-\ufe4f\uff00-\uffef\U00020000-\U0003134f')
+LATIN_RE = re.compile('[A-Za-z0-9]')
+CJK_RE = re.compile(f'[{_CJK_RANGES}]')
+# 西文段：从一个西文字符到其后最后一个西文字符，中间不含中日韩字符
+_LATIN_SPAN_RE = re.compile(f'[A-Za-z0-9](?:[^{_CJK_RANGES}]*[A-Za-z0-9])?')
+
+
+def script_segments(text: str) -> List[Tuple[str, Optional[bool]]]:
+    """
+    把文本按书写系统切分为 [(片段, 是否西文)]，只在西文与中日韩字符之间切分
+
+    西文段从一个西文字符到其后最后一个西文字符（中间的空格、标点属于西文段），其余中性字符归入相邻的中日韩段，
+    开头与结尾只含中性字符的部分归入相邻的西文段。
+    只含一种书写系统时返回单个片段，不含西文与中日韩字符时“是否西文”为 None。
+    """
+    if not LATIN_RE.search(text):
+        return [(text, False if CJK_RE.search(text) else None)]
+    if not CJK_RE.search(text):
+        return [(text, True)]
+    segments = []
+    position = 0
+    for match in _LATIN_SPAN_RE.finditer(text):
+        start, end = match.span()
+        if start > position:
+            if CJK_RE.search(text, position, start):
+                segments.append((text[position:start], False))
+            else:
+                start = position
+        segments.append((text[start:end], True))
+        position = end
+    if position < len(text):
+        if CJK_RE.search(text, position):
+            segments.append((text[position:], False))
+        else:
+            segments[-1] = (segments[-1][0] + text[position:], True)
+    return segments
+
+
+def _text_element(r, text):
+    t = r.makeelement(W_T, {})
+    t.text = text
+    if text != text.strip():
+        t.set(XML_SPACE, 'preserve')
+    return t
+
+
+def split_run_by_script(r) -> List[Tuple[object, bool]]:
+    """
+    在书写系统变化处把 run 拆分为多个 run（r 为 w:r 元素），拆出的 run 复制 r 的属性与 rPr，依次插在 r 之后
+
+    制表符、换行等非文本内容随所在的段。含域、图片等内容的 run 不拆分。
+
+    Returns:
+        [(run, 是否含西文)]；不需要拆分时只有 r 本身
+    """
+    text = ''.join(t.text or '' for t in r.iterchildren(W_T))
+    if not LATIN_RE.search(text):
+        return [(r, False)]
+    if not CJK_RE.search(text) or not _is_mergeable(r):
+        return [(r, True)]
+
+    # 每段为 [是否西文, 内容元素]；第一个有书写系统的片段之前的中性内容并入第一段
+    segments = []
+    leading = []
+    for child in list(r):
+        if child.tag == W_RPR:
+            continue
+        r.remove(child)
+        pieces = script_segments(child.text or '') if child.tag == W_T else [(None, None)]
+        for piece, latin in pieces:
+            element = child if piece is None else _text_element(r, piece)
+            if latin is None or (segments and segments[-1][0] == latin):
+                (segments[-1][1] if segments else leading).append(element)
+            else:
+                segments.append([latin, leading + [element]])
+                leading = []
+
+    runs = []
+    shell = copy.deepcopy(r)
+    for latin, elements in segments:
+        run = copy.deepcopy(shell) if runs else r
+        run.extend(elements)
+        if runs:
+            runs[-1][0].addnext(run)
+        runs.append((run, latin))
+    return runs
@@ -0,0 +1,177 @@
+"""
+文档各 story 中段落的统一遍历
+doc.paragraphs 只包含正文中 w:body 的直接子段落，表格、文本框、页眉页脚、脚注/尾注中的段落都不在其中。
+python-docx 的 table.rows → row.cells → cell.paragraphs 对合并单元格是二次复杂度，并且每一层都创建包装对象。
+
+这里对每个部件只做一次 lxml 遍历（只在 C 层筛选出表格结构与段落元素），
+为每个段落给出位置标记 StoryLocation 与稳定的段落键，供扫描结果与 mappings 使用。
+"""
+from collections import namedtuple
+from typing import List, Tuple
+
+from docx.opc.constants import RELATIONSHIP_TYPE as RT
+from docx.oxml.ns import qn
+
+from doc_index import W_P, MC_FALLBACK
+
+W_BODY = qn('w:body')
+W_TBL = qn('w:tbl')
+W_TR = qn('w:tr')
+W_TC = qn('w:tc')
+W_TXBX_CONTENT = qn('w:txbxContent')
+W_FOOTNOTE = qn('w:footnote')
+W_ENDNOTE = qn('w:endnote')
+W_TYPE = qn('w:type')
+W_VAL = qn('w:val')
+W_TCPR = qn('w:tcPr')
+W_TRPR = qn('w:trPr')
+W_GRID_SPAN = qn('w:gridSpan')
+W_GRID_BEFORE = qn('w:gridBefore')
+
+# 各 story 部件的关系类型 → story 名
+STORY_RELTYPES = {
+    RT.HEADER: 'header',
+    RT.FOOTER: 'footer',
+    RT.FOOTNOTES: 'footnote',
+    RT.ENDNOTES: 'endnote',
+}
+
+# story: body/header/footer/footnote/endnote；part: zip 条目名
+# container: 段落所在的最内层容器 "table" / "textbox"，直接位于 story 中时为 None
+# table/row/col: container 为 "table" 时的表格序号（部件内按文档顺序）、行号与网格列号，否则为 None
+StoryLocation = namedtuple('StoryLocation', 'story part container table row col')
+
+
+def location_info(location: StoryLocation) -> dict:
+    """位置标记转为扫描结果中的 location 字段（省略为 None 的项）"""
+    return {name: value for name, value in location._asdict().items() if value is not None}
+
+
+def _int_child_val(parent, props_tag, child_tag, default):
+    props = parent.find(props_tag)
+    if props is None:
+        return default
+    child = props.find(child_tag)
+    if child is None:
+        return default
+    try:
+        return int(child.get(W_VAL))
+    except (TypeError, ValueError):
+        return default
+
+
+def _nearest(element, tag, index):
+    """element 的父元素（或隔着 w:sdt、w:customXml 等包装元素的最近 tag 祖先）在 index 中对应的值"""
+    parent = element.getparent()
+    if parent is not None and parent.tag == tag:
+        return index.get(parent)
+    for ancestor in element.iterancestors(tag):
+        return index.get(ancestor)
+    return None
+
+
+class StoryWalker:
+    """
+    按文档顺序遍历一个部件中的 story 段落
+
+    同一部件可以分多次遍历（流式引擎逐个传入 w:body 的子元素），
+    段落键与表格序号在多次遍历之间连续，与一次遍历整个部件的结果相同。
+
+    段落键为 "部件名:序号"，序号按文档顺序计数。以下段落不产生：
+    - w:body 的直接子段落（即 doc.paragraphs，仍按原有的整数索引处理）
+    - 脚注/尾注中的分隔符
+    mc:Fallback 中的兼容副本（如 VML 文本框）照常产生，但其键为 None，不能通过 mappings 单独指定。
+    """
+
+    def __init__(self, part_name: str, story: str):
+        self.part_name = part_name
+        self.story = story
+        self._count = 0
+        self._tables = 0
+
+    def walk(self, root) -> List[Tuple[object, StoryLocation, object]]:
+        """
+        遍历 root 的子树（root 自身不产生）
+
+        Returns:
+            [(段落键, StoryLocation, w:p 元素)]；先收集完再返回，调用方可以就地修改段落
+        """
+        tables = {}   # w:tbl → [序号, 当前行号]
+        rows = {}     # w:tr → [所属表格, 下一个单元格的网格列号]
+        cells = {}    # w:tc → (表格序号, 行号, 列号)
+        paragraphs = []
+        for element in root.iter(W_P, W_TBL, W_TR, W_TC):
+            tag = element.tag
+            if tag == W_TBL:
+                tables[element] = [self._tables, -1]
+                self._tables += 1
+            elif tag == W_TR:
+                table = _nearest(element, W_TBL, tables)
+                if table is not None:
+                    table[1] += 1
+                    rows[element] = [table, _int_child_val(element, W_TRPR, W_GRID_BEFORE, 0)]
+            elif tag == W_TC:
+                row = _nearest(element, W_TR, rows)
+                if row is not None:
+                    table, col = row
+                    row[1] = col + _int_child_val(element, W_TCPR, W_GRID_SPAN, 1)
+                    cells[element] = (table[0], table[1], col)
+            elif element is not root:
+                item = self._locate(element, root, cells)
+                if item is not None:
+                    paragraphs.append(item)
+        return paragraphs
+
+    def _locate(self, p, root, cells):
+        parent = p.getparent()
+        if parent is not None and parent.tag == W_BODY:
+            return None
+        container = None
+        cell = None
+        fallback = False
+        for ancestor in p.iterancestors():
+            tag = ancestor.tag
+            if tag == W_TC:
+                if container is None:
+                    container = 'table'
+                    cell = cells.get(ancestor)
+            elif tag == W_TXBX_CONTENT:
+                if container is None:
+                    container = 'textbox'
+            elif tag == MC_FALLBACK:
+                fallback = True
+            elif tag == W_FOOTNOTE or tag == W_ENDNOTE:
+                note_type = ancestor.get(W_TYPE)
+                if note_type is not None and note_type != 'normal':
+                    return None
+            if ancestor is root:
+                break
+        table, row, col = cell if cell is not None else (None, None, None)
+        location = StoryLocation(self.story, self.part_name, container, table, row, col)
+        if fallback:
+            return None, location, p
+        key = f'{self.part_name}:{self._count}'
+        self._count += 1
+        return key, location, p
+
+
+def dom_story_parts(document_part) -> List[Tuple[object, str, str]]:
+    """
+    python-docx 文档部件引用的页眉、页脚、脚注、尾注部件
+
+    Returns:
+        [(Part, zip 条目名, story 名)]，按关系文件中的顺序，同一部件只出现一次
+    """
+    parts = []
+    seen = set()
+    for rel in document_part.rels.values():
+        story = STORY_RELTYPES.get(rel.reltype)
+        if story is None or rel.is_external:
+            continue
+        part = rel.target_part
+        name = str(part.partname)[1:]
+        if name in seen:
+            continue
+        seen.add(name)
+        parts.append((part, name, story))
+    return parts
@@ -0,0 +1,299 @@
+"""
+流式文档引擎
+不构建完整的 python-docx 对象模型，而是用 lxml 增量解析主文档部件 (word/document.xml)，
+逐个处理 w:body 的子元素并立即写入输出包。处理过的元素会从树中移除，
+因此无论文档多大，内存中只保留当前元素。
+
+本模块只负责包与 XML 的读写，逐段落的格式化逻辑由调用方提供。
+"""
+import posixpath
+import zipfile
+from typing import Callable, Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+from lxml import etree
+from docx.opc.oxml import parse_xml as parse_rels_xml
+from docx.oxml.ns import qn
+from docx.oxml.parser import element_class_lookup, parse_xml
+from package_writer import rewrite_package
+
+W_BODY = qn('w:body')
+RT_OFFICE_DOCUMENT = 'http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument'
+RT_STYLES = 'http://schemas.openxmlformats.org/officeDocument/2006/relationships/styles'
+RT_NUMBERING = 'http://schemas.openxmlformats.org/officeDocument/2006/relationships/numbering'
+REL_TAG = '{http://schemas.openxmlformats.org/package/2006/relationships}Relationship'
+
+# 每次从压缩流读取的字节数
+CHUNK_SIZE = 64 * 1024
+
+XML_DECLARATION = b"<?xml version='1.0' encoding='UTF-8' standalone='yes'?>\n"
+
+
+def _rels_name(part_name: str) -> str:
+    directory, name = posixpath.split(part_name)
+    return posixpath.join(directory, '_rels', name + '.rels')
+
+
+def _qname(element) -> str:
+    local = etree.QName(element).localname
+    return f'{element.prefix}:{local}' if element.prefix else local
+
+
+def _start_tag(element) -> bytes:
+    """元素的开始标签（含命名空间声明与属性，不含子元素）"""
+    shell = etree.Element(element.tag, dict(element.attrib), nsmap=element.nsmap)
+    return etree.tostring(shell, encoding='UTF-8', xml_declaration=False)[:-2] + b'>'
+
+
+def _end_tag(element) -> bytes:
+    return f'</{_qname(element)}>'.encode('utf-8')
+
+
+def _strip_declarations(xml: bytes, declarations) -> bytes:
+    """
+    去掉子元素开始标签上与祖先相同的命名空间声明
+
+    lxml 单独序列化子树时会重复声明所有在作用域内的命名空间，
+    而这些声明已经写在文档根元素上。属性值中的 '>' 会被转义，因此第一个 '>' 即开始标签结束处。
+    """
+    end = xml.index(b'>')
+    head = xml[:end]
+    for declaration in declarations:
+        head = head.replace(declaration, b'', 1)
+    return head + xml[end:]
+
+
+def _namespace_declarations(nsmap) -> Tuple[bytes, ...]:
+    declarations = []
+    for prefix, uri in nsmap.items():
+        name = f'xmlns:{prefix}' if prefix else 'xmlns'
+        declarations.append(f' {name}="{uri}"'.encode('utf-8'))
+    return tuple(declarations)
+
+
+def _pending_nodes(element, include_self=False):
+    """element 之前（include_self 时含自身）尚未输出的注释与处理指令，按文档顺序产生 ("node", 节点)"""
+    nodes = []
+    node = element if include_self else element.getprevious()
+    while node is not None and not isinstance(node.tag, str):
+        nodes.append(node)
+        node = node.getprevious()
+    for node in reversed(nodes):
+        yield 'node', node
+
+
+class StreamingPackage:
+    """以只读方式打开 .docx 包，提供主文档的增量解析与流式重写"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._zip = zipfile.ZipFile(path)
+        self.main_part = self._related_part('', RT_OFFICE_DOCUMENT) or 'word/document.xml'
+        self.styles_part = self._related_part(self.main_part, RT_STYLES)
+        self.numbering_part = self._related_part(self.main_part, RT_NUMBERING)
+        # 解析 w:body 子元素片段所需的上下文（iter_main_part 产生根元素之后可用）
+        self.fragment_context = None
+
+    def close(self) -> None:
+        self._zip.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _related_part(self, source_part: str, reltype: str) -> Optional[str]:
+        """按关系类型查找 source_part 引用的部件名（source_part 为 '' 时查找包级关系）"""
+        for part_name, _ in self.related_parts(source_part, (reltype,)):
+            return part_name
+        return None
+
+    def related_parts(self, source_part: str, reltypes) -> List[Tuple[str, str]]:
+        """
+        source_part 引用的、关系类型属于 reltypes 的内部部件
+
+        Returns:
+            [(部件名, 关系类型)]，按关系文件中的顺序，同一部件只出现一次
+        """
+        rels_name = _rels_name(source_part) if source_part else '_rels/.rels'
+        try:
+            rels = parse_rels_xml(self._zip.read(rels_name))
+        except KeyError:
+            return []
+        parts = []
+        seen = set()
+        for rel in rels.iter(REL_TAG):
+            reltype = rel.get('Type')
+            if reltype not in reltypes or rel.get('TargetMode') == 'External':
+                continue
+            target = rel.get('Target')
+            if target.startswith('/'):
+                part_name = target[1:]
+            else:
+                part_name = posixpath.normpath(posixpath.join(posixpath.dirname(source_part), target))
+            if part_name not in seen:
+                seen.add(part_name)
+                parts.append((part_name, reltype))
+        return parts
+
+    def part_size(self, part_name: str) -> int:
+        """部件解压后的字节数"""
+        return self._zip.getinfo(part_name).file_size
+
+    def read_part(self, part_name: Optional[str]):
+        """完整解析一个较小的部件（如 styles.xml），返回 python-docx 自定义元素；部件不存在时返回 None"""
+        if part_name is None:
+            return None
+        try:
+            return parse_xml(self._zip.read(part_name))
+        except KeyError:
+            return None
+
+    def iter_body(self) -> Iterator[Tuple[str, object]]:
+        """
+        增量解析主文档，依次产生事件:
+            ("root", 文档根元素)      根元素开始，此时尚无子元素
+            ("child", 元素)          w:body 之前/之后的根元素子元素（如 w:background）
+            ("body", w:body 元素)    w:body 开始
+            ("body_child", 元素)     w:body 的一个完整子元素（w:p、w:tbl、w:sectPr 等）
+            ("body_end", w:body 元素)
+            ("node", 注释或处理指令)  位于上述元素之间的非元素节点，按文档顺序产生
+
+        调用方处理完一个元素后，该元素在下一次事件前被清空并从树中移除。
+        """
+        parser = etree.XMLPullParser(events=('start', 'end'), remove_blank_text=True,
+                                     resolve_entities=False, huge_tree=True)
+        parser.set_element_class_lookup(element_class_lookup)
+        root = None
+        body = None
+        depth = 0
+        with self._zip.open(self.main_part) as stream:
+            while True:
+                chunk = stream.read(CHUNK_SIZE)
+                if chunk:
+                    parser.feed(chunk)
+                else:
+                    parser.close()
+                for event, element in parser.read_events():
+                    if event == 'start':
+                        depth += 1
+                        if depth == 1:
+                            root = element
+                            yield 'root', element
+                        elif depth == 2 and element.tag == W_BODY:
+                            body = element
+                            yield 'body', element
+                        continue
+                    depth -= 1
+                    if depth == 2 and body is not None and element.getparent() is body:
+                        yield from _pending_nodes(element)
+                        yield 'body_child', element
+                        self._release(element)
+                    elif depth == 1 and element is body:
+                        if len(body):
+                            yield from _pending_nodes(body[-1], include_self=True)
+                        yield 'body_end', element
+                        body = None
+                    elif depth == 1:
+                        yield from _pending_nodes(element)
+                        yield 'child', element
+                        self._release(element)
+                if not chunk:
+                    break
+
+    @staticmethod
+    def _release(element) -> None:
+        """清空已处理的元素并移除其之前的兄弟元素（当前元素可能仍被解析器引用，保留空壳）"""
+        element.clear(keep_tail=True)
+        parent = element.getparent()
+        while element.getprevious() is not None:
+            del parent[0]
+
+    def rewrite(self, output_path: str, transform: Callable[[object], None],
+                replaced_parts: Optional[Dict[str, object]] = None) -> Dict[str, int]:
+        """
+        流式重写文档包
+
+        主文档的每个 w:body 子元素先交给 transform 就地修改，再立即序列化写入输出；
+        replaced_parts 中的部件用给定元素替换，其余部件原样复制压缩数据（见 package_writer.py）。
+
+        Returns:
+            部件写出统计，见 PackageWriter.stats
+        """
+        replaced = {name: serialize_part(element) for name, element in (replaced_parts or {}).items()}
+        streamed = {self.main_part: lambda stream: self._write_main_part(stream, transform)}
+        return rewrite_package(self.path, output_path, replaced, streamed)
+
+    def _write_main_part(self, stream, transform) -> None:
+        declarations = ()
+        for event, data in self.iter_main_part():
+            if event == 'body_child':
+                transform(data)
+                stream.write(serialize_body_child(data, declarations))
+            else:
+                stream.write(data)
+                if event == 'root':
+                    declarations = self.fragment_context.declarations
+
+    def iter_main_part(self) -> Iterator[Tuple[str, object]]:
+        """
+        按输出顺序依次产生主文档的内容:
+            ("markup", bytes)          原样写出的部分（XML 声明、各开始/结束标签、body 之外的元素、注释等）
+            ("root", bytes)            根元素的开始标签；之后 fragment_context 可用
+            ("body_child", 元素)       w:body 的一个子元素，由调用方处理后用 serialize_body_child 序列化
+        """
+        yield 'markup', XML_DECLARATION
+        root = None
+        for event, element in self.iter_body():
+            if event == 'root':
+                root = element
+                start = _start_tag(element)
+                self.fragment_context = FragmentContext(start, _end_tag(element),
+                                                        _namespace_declarations(element.nsmap))
+                yield 'root', start
+            elif event == 'body':
+                body_start = _strip_declarations(_start_tag(element), self.fragment_context.declarations)
+                self.fragment_context = self.fragment_context._replace(body_start=body_start,
+                                                                       body_end=_end_tag(element))
+                yield 'markup', body_start
+            elif event == 'body_end':
+                yield 'markup', _end_tag(element)
+            elif event == 'body_child':
+                yield 'body_child', element
+            else:
+                yield 'markup', _strip_declarations(etree.tostring(element, encoding='UTF-8'),
+                                                   self.fragment_context.declarations)
+        if root is not None:
+            yield 'markup', _end_tag(root)
+
+
+class FragmentContext(NamedTuple):
+    """
+    在单独的进程中解析 w:body 子元素片段所需的上下文：片段中省略了根元素上的命名空间声明，
+    需要放回根元素与 w:body 中解析
+    """
+    root_start: bytes
+    root_end: bytes
+    declarations: Tuple[bytes, ...]
+    body_start: bytes = b'<w:body>'
+    body_end: bytes = b'</w:body>'
+
+
+def serialize_body_child(element, declarations) -> bytes:
+    """w:body 子元素的序列化结果（省略与根元素相同的命名空间声明），与流式重写写出的内容相同"""
+    return _strip_declarations(etree.tostring(element, encoding='UTF-8'), declarations)
+
+
+def parse_body_fragments(context: FragmentContext, fragments: List[bytes]) -> List:
+    """把 serialize_body_child 产生的片段放回根元素与 w:body 中一次解析，按顺序返回这些子元素"""
+    parser = etree.XMLParser(remove_blank_text=True, resolve_entities=False, huge_tree=True)
+    parser.set_element_class_lookup(element_class_lookup)
+    xml = b''.join((context.root_start, context.body_start, *fragments, context.body_end, context.root_end))
+    root = etree.fromstring(xml, parser)
+    body = root.find(W_BODY)
+    return list(body)
+
+
+def serialize_part(element) -> bytes:
+    """与 python-docx 保存部件时相同的序列化方式"""
+    return etree.tostring(element, encoding='UTF-8', standalone=True)
@@ -0,0 +1,488 @@
+"""
+编译式样式计划
+每个格式化任务把规范（profile）按样式键编译一次，得到段落属性（w:pPr）与字符属性（w:rPr）的 XML 模板，
+之后对每个段落/run 直接把模板合并进 XML，不再逐个调用 python-docx 的属性 setter。
+
+合并语义与 python-docx 的 setter 保持一致（子元素按 schema 顺序插入、属性按设置顺序追加），
+因此与逐属性设置的参考实现生成完全相同的 XML（见 verify_style_plan.py）。
+
+样式模式下同一份模板写入 styles.xml 中对应的 w:style 定义，段落与 run 上只去掉被模板覆盖的直接格式。
+"""
+import copy
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from docx.enum.text import WD_ALIGN_PARAGRAPH, WD_LINE_SPACING
+from docx.oxml import OxmlElement
+from docx.oxml.ns import qn
+from docx.oxml.simpletypes import ST_HpsMeasure, ST_OnOff, ST_SignedTwipsMeasure, ST_TwipsMeasure
+from docx.shared import Emu, Pt, RGBColor, Twips
+
+# w:pPr / w:rPr 子元素的 schema 顺序（与 python-docx 的 CT_PPr / CT_RPr 一致）
+PPR_TAG_SEQ = (
+    'w:pStyle', 'w:keepNext', 'w:keepLines', 'w:pageBreakBefore', 'w:framePr', 'w:widowControl',
+    'w:numPr', 'w:suppressLineNumbers', 'w:pBdr', 'w:shd', 'w:tabs', 'w:suppressAutoHyphens',
+    'w:kinsoku', 'w:wordWrap', 'w:overflowPunct', 'w:topLinePunct', 'w:autoSpaceDE', 'w:autoSpaceDN',
+    'w:bidi', 'w:adjustRightInd', 'w:snapToGrid', 'w:spacing', 'w:ind', 'w:contextualSpacing',
+    'w:mirrorIndents', 'w:suppressOverlap', 'w:jc', 'w:textDirection', 'w:textAlignment',
+    'w:textboxTightWrap', 'w:outlineLvl', 'w:divId', 'w:cnfStyle', 'w:rPr', 'w:sectPr', 'w:pPrChange',
+)
+RPR_TAG_SEQ = (
+    'w:rStyle', 'w:rFonts', 'w:b', 'w:bCs', 'w:i', 'w:iCs', 'w:caps', 'w:smallCaps', 'w:strike',
+    'w:dstrike', 'w:outline', 'w:shadow', 'w:emboss', 'w:imprint', 'w:noProof', 'w:snapToGrid',
+    'w:vanish', 'w:webHidden', 'w:color', 'w:spacing', 'w:w', 'w:kern', 'w:position', 'w:sz',
+    'w:szCs', 'w:highlight', 'w:u', 'w:effect', 'w:bdr', 'w:shd', 'w:fitText', 'w:vertAlign',
+    'w:rtl', 'w:cs', 'w:em', 'w:lang', 'w:eastAsianLayout', 'w:specVanish', 'w:oMath',
+)
+
+# rFonts 中的主题字体属性优先于显式字体名，样式模式写入字体时需一并去掉
+THEME_FONT_ATTRS = tuple(qn(attr) for attr in ('w:asciiTheme', 'w:hAnsiTheme', 'w:eastAsiaTheme', 'w:cstheme'))
+W_RFONTS = qn('w:rFonts')
+
+ALIGNMENT_MAP = {
+    "left": WD_ALIGN_PARAGRAPH.LEFT,
+    "center": WD_ALIGN_PARAGRAPH.CENTER,
+    "right": WD_ALIGN_PARAGRAPH.RIGHT,
+    "justify": WD_ALIGN_PARAGRAPH.JUSTIFY,
+    "distribute": WD_ALIGN_PARAGRAPH.DISTRIBUTE
+}
+
+
+def _successors(tag_seq: Sequence[str], tag: str) -> Tuple[str, ...]:
+    """返回 schema 中位于 tag 之后的子元素（Clark 记法）"""
+    index = tag_seq.index(tag)
+    return tuple(qn(t) for t in tag_seq[index + 1:])
+
+
+def insert_in_order(parent, element, successors: Tuple[str, ...]) -> None:
+    """按 schema 顺序插入子元素（与 python-docx 的 insert_element_before 语义相同）"""
+    for successor_tag in successors:
+        successor = parent.find(successor_tag)
+        if successor is not None:
+            successor.addprevious(element)
+            return
+    parent.append(element)
+
+
+def get_or_add_child(parent, tag: str, tag_seq: Sequence[str]):
+    """查找子元素，不存在时按 schema 顺序新建"""
+    clark = qn(tag)
+    child = parent.find(clark)
+    if child is None:
+        child = OxmlElement(tag)
+        insert_in_order(parent, child, _successors(tag_seq, tag))
+    return child
+
+
+class ElementPatch:
+    """
+    针对 pPr/rPr 中单个子元素的补丁
+
+    mode:
+        'merge'   - 子元素存在时按顺序设置/删除属性，不存在时克隆模板
+        'replace' - 删除所有同名子元素后克隆模板
+        'delete'  - 删除所有同名子元素
+    keep: {属性: 取值集合}，已有属性的值在集合内时不覆盖（如 lineRule="atLeast"）
+    """
+    __slots__ = ('tag', 'mode', 'successors', 'attrs', 'remove', 'keep', 'template')
+
+    def __init__(self, tag: str, tag_seq: Sequence[str], mode: str = 'merge'):
+        self.tag = qn(tag)
+        self.mode = mode
+        self.successors = _successors(tag_seq, tag)
+        self.attrs: List[Tuple[str, str]] = []
+        self.remove: List[str] = []
+        self.keep: Dict[str, frozenset] = {}
+        self.template = OxmlElement(tag)
+
+    def set(self, attr: str, value: str, keep: Sequence[str] = ()) -> 'ElementPatch':
+        clark = qn(attr)
+        for i, (name, _) in enumerate(self.attrs):
+            if name == clark:
+                self.attrs[i] = (clark, value)
+                break
+        else:
+            self.attrs.append((clark, value))
+        if clark in self.remove:
+            self.remove.remove(clark)
+        if keep:
+            self.keep[clark] = frozenset(keep)
+        self.template.set(clark, value)
+        return self
+
+    def unset(self, *attrs: str) -> 'ElementPatch':
+        for attr in attrs:
+            clark = qn(attr)
+            self.attrs = [(name, value) for name, value in self.attrs if name != clark]
+            if clark not in self.remove:
+                self.remove.append(clark)
+            self.template.attrib.pop(clark, None)
+        return self
+
+    @property
+    def clears(self) -> bool:
+        """只删除内容的补丁（如 fontFamily/bold 为 None）：样式模式下只去掉直接格式，不修改样式定义"""
+        return self.mode == 'delete' or (self.mode == 'replace' and not len(self.template.attrib))
+
+    def apply(self, parent) -> None:
+        tag = self.tag
+        if self.mode != 'merge':
+            for child in parent.findall(tag):
+                parent.remove(child)
+            if self.mode == 'delete':
+                return
+            insert_in_order(parent, copy.deepcopy(self.template), self.successors)
+            return
+        child = parent.find(tag)
+        if child is None:
+            insert_in_order(parent, copy.deepcopy(self.template), self.successors)
+            return
+        attrib = child.attrib
+        keep = self.keep
+        for name, value in self.attrs:
+            if keep and attrib.get(name) in keep.get(name, ()):
+                continue
+            attrib[name] = value
+        for name in self.remove:
+            attrib.pop(name, None)
+
+    def strip(self, parent) -> None:
+        """从直接格式中去掉本补丁会设置或清除的内容，使样式定义中的值生效"""
+        tag = self.tag
+        if self.mode != 'merge':
+            for child in parent.findall(tag):
+                parent.remove(child)
+            return
+        child = parent.find(tag)
+        if child is None:
+            return
+        attrib = child.attrib
+        keep = self.keep
+        for name, _ in self.attrs:
+            # 与 apply 一致：需要保留的取值（如 lineRule="atLeast"）留在直接格式中
+            if keep and attrib.get(name) in keep.get(name, ()):
+                continue
+            attrib.pop(name, None)
+        for name in self.remove:
+            attrib.pop(name, None)
+        if not len(attrib) and not len(child):
+            parent.remove(child)
+
+
+class _PatchList:
+    """按首次出现顺序保存补丁，同一子元素的多次设置合并为一个补丁"""
+
+    def __init__(self, tag_seq):
+        self.tag_seq = tag_seq
+        self.patches: List[ElementPatch] = []
+        self._by_tag: Dict[str, ElementPatch] = {}
+
+    def merge(self, tag: str) -> ElementPatch:
+        patch = self._by_tag.get(tag)
+        if patch is None or patch.mode != 'merge':
+            patch = ElementPatch(tag, self.tag_seq)
+            self.patches.append(patch)
+            self._by_tag[tag] = patch
+        return patch
+
+    def replace(self, tag: str, mode: str = 'replace') -> ElementPatch:
+        patch = ElementPatch(tag, self.tag_seq, mode)
+        self.patches.append(patch)
+        self._by_tag[tag] = patch
+        return patch
+
+
+def _drop_theme_fonts(rPr) -> None:
+    rfonts = rPr.find(W_RFONTS)
+    if rfonts is None:
+        return
+    for attr in THEME_FONT_ATTRS:
+        rfonts.attrib.pop(attr, None)
+    if not len(rfonts.attrib):
+        rPr.remove(rfonts)
+
+
+class CompiledStyle:
+    """单个样式键编译后的段落/字符属性补丁"""
+    __slots__ = ('ppr_patches', 'rpr_patches', 'sets_fonts')
+
+    def __init__(self, ppr_patches: List[ElementPatch], rpr_patches: List[ElementPatch]):
+        self.ppr_patches = ppr_patches
+        self.rpr_patches = rpr_patches
+        self.sets_fonts = any(patch.tag == W_RFONTS for patch in rpr_patches)
+
+    def apply_paragraph(self, p) -> None:
+        """把段落属性模板合并进 w:p"""
+        if not self.ppr_patches:
+            return
+        pPr = p.get_or_add_pPr()
+        for patch in self.ppr_patches:
+            patch.apply(pPr)
+
+    def apply_run(self, r) -> None:
+        """把字符属性模板合并进 w:r"""
+        if not self.rpr_patches:
+            return
+        rPr = r.get_or_add_rPr()
+        for patch in self.rpr_patches:
+            patch.apply(rPr)
+
+    def apply_definition(self, style) -> None:
+        """
+        样式模式：把模板合并进 w:style 定义（style 为 CT_Style 元素）
+
+        只删除内容的补丁不写入定义：直接格式模式下这类配置只清除段落/run 上的格式，仍使用样式中的值。
+        """
+        ppr_patches = [patch for patch in self.ppr_patches if not patch.clears]
+        if ppr_patches:
+            pPr = style.get_or_add_pPr()
+            for patch in ppr_patches:
+                patch.apply(pPr)
+        rpr_patches = [patch for patch in self.rpr_patches if not patch.clears]
+        if rpr_patches:
+            rPr = style.get_or_add_rPr()
+            for patch in rpr_patches:
+                patch.apply(rPr)
+            if any(patch.tag == W_RFONTS for patch in rpr_patches):
+                _drop_theme_fonts(rPr)
+
+    def strip_paragraph(self, p) -> None:
+        """样式模式：去掉 w:p 上被样式定义覆盖的段落直接格式"""
+        pPr = p.pPr
+        if pPr is None:
+            return
+        for patch in self.ppr_patches:
+            patch.strip(pPr)
+        if not len(pPr) and not len(pPr.attrib):
+            p.remove(pPr)
+
+    def strip_run(self, r) -> None:
+        """样式模式：去掉 w:r 上被样式定义覆盖的字符直接格式，rPr 为空时一并删除"""
+        rPr = r.rPr
+        if rPr is None:
+            return
+        for patch in self.rpr_patches:
+            patch.strip(rPr)
+        if self.sets_fonts:
+            _drop_theme_fonts(rPr)
+        if not len(rPr) and not len(rPr.attrib):
+            r.remove(rPr)
+
+
+def compile_style(style_config: Dict) -> CompiledStyle:
+    """
+    把单个样式配置编译为补丁列表
+
+    补丁的顺序与 formatter.format_document 参考实现中 setter 的调用顺序一致。
+    """
+    ppr = _PatchList(PPR_TAG_SEQ)
+    rpr = _PatchList(RPR_TAG_SEQ)
+
+    # 对齐方式
+    if "alignment" in style_config:
+        alignment = ALIGNMENT_MAP.get(style_config["alignment"], WD_ALIGN_PARAGRAPH.LEFT)
+        ppr.merge('w:jc').set('w:val', WD_ALIGN_PARAGRAPH.to_xml(alignment))
+
+    # 首行缩进（字符单位），并清除绝对单位的缩进
+    if "firstLineIndent" in style_config:
+        indent_chars = style_config["firstLineIndent"]
+        ppr.merge('w:ind').set('w:firstLineChars', str(int(indent_chars * 100))).unset('w:firstLine', 'w:hanging')
+
+    # 行距：数值<=3 视为倍数，否则按磅数；同时禁用网格对齐。
+    # 无法转换为数值的配置只跳过该项（与参考实现相同，网格对齐仍被禁用）
+    if "lineSpacing" in style_config and style_config["lineSpacing"] is not None:
+        ls = style_config["lineSpacing"]
+        ppr.merge('w:snapToGrid').set('w:val', '0')
+        try:
+            if isinstance(ls, (int, float)) and ls <= 3:
+                line = ST_SignedTwipsMeasure.to_xml(Emu(float(ls) * Twips(240)))
+                rule = WD_LINE_SPACING.MULTIPLE
+            else:
+                line = ST_SignedTwipsMeasure.to_xml(Pt(float(ls)))
+                rule = WD_LINE_SPACING.EXACTLY
+        except (TypeError, ValueError, OverflowError):
+            line = None
+        if line is not None:
+            spacing = ppr.merge('w:spacing')
+            spacing.set('w:line', line)
+            if rule == WD_LINE_SPACING.MULTIPLE:
+                spacing.set('w:lineRule', WD_LINE_SPACING.to_xml(rule))
+            else:
+                spacing.set('w:lineRule', WD_LINE_SPACING.to_xml(rule),
+                            keep=(WD_LINE_SPACING.to_xml(WD_LINE_SPACING.AT_LEAST),))
+
+    # 段前段后间距（磅），清理“行”单位的间距属性
+    for key, attr, lines_attr in (("spaceBefore", 'w:before', 'w:beforeLines'),
+                                  ("spaceAfter", 'w:after', 'w:afterLines')):
+        if key in style_config and style_config[key] is not None:
+            try:
+                value = ST_TwipsMeasure.to_xml(Pt(float(style_config[key])))
+            except (TypeError, ValueError, OverflowError):
+                continue
+            ppr.merge('w:spacing').set(attr, value).unset(lines_attr)
+
+    # 字体（中文/西文字体统一设置）
+    if "fontFamily" in style_config:
+        font_name = style_config["fontFamily"]
+        if font_name is None:
+            rpr.replace('w:rFonts')
+        else:
+            rfonts = rpr.merge('w:rFonts')
+            for attr in ('w:ascii', 'w:hAnsi', 'w:eastAsia', 'w:cs'):
+                rfonts.set(attr, font_name)
+
+    # 字号（磅）
+    if "fontSize" in style_config:
+        rpr.merge('w:sz').set('w:val', ST_HpsMeasure.to_xml(Pt(style_config["fontSize"])))
+
+    # 加粗
+    if "bold" in style_config:
+        bold = style_config["bold"]
+        if bold is None:
+            rpr.replace('w:b', mode='delete')
+        elif bold == True:  # noqa: E712  与 python-docx 的默认值比较语义一致
+            rpr.merge('w:b').unset('w:val')
+        else:
+            rpr.merge('w:b').set('w:val', ST_OnOff.to_xml(bold))
+
+    # 颜色（十六进制），python-docx 会先删除原有颜色再新建
+    if "color" in style_config:
+        color_hex = style_config["color"].lstrip('#')
+        rgb = RGBColor(int(color_hex[0:2], 16), int(color_hex[2:4], 16), int(color_hex[4:6], 16))
+        rpr.replace('w:color').set('w:val', str(rgb))
+
+    return CompiledStyle(ppr.patches, rpr.patches)
+
+
+# 样式模式下被写入的样式会改变基于它的样式（如基于 Normal 的题注、目录、页眉）的继承值。
+# 按属性组记录：同组属性作为一个整体继承（如 firstLineChars 与 firstLine），组后为各级都未定义时的默认值
+INHERITED_GROUPS = {
+    ('w:pPr', 'w:jc'): ((('w:val',), {'w:val': 'left'}),),
+    ('w:pPr', 'w:ind'): ((('w:firstLineChars', 'w:firstLine', 'w:hanging', 'w:hangingChars'),
+                          {'w:firstLineChars': '0'}),),
+    ('w:pPr', 'w:snapToGrid'): ((('w:val',), {'w:val': '1'}),),
+    ('w:pPr', 'w:spacing'): ((('w:line',), {'w:line': '240'}), (('w:lineRule',), {'w:lineRule': 'auto'}),
+                             (('w:before', 'w:beforeLines', 'w:beforeAutospacing'), {'w:before': '0'}),
+                             (('w:after', 'w:afterLines', 'w:afterAutospacing'), {'w:after': '0'})),
+    ('w:rPr', 'w:rFonts'): ((('w:ascii', 'w:asciiTheme'), {}), (('w:hAnsi', 'w:hAnsiTheme'), {}),
+                            (('w:eastAsia', 'w:eastAsiaTheme'), {}), (('w:cs', 'w:cstheme'), {})),
+    ('w:rPr', 'w:sz'): ((('w:val',), {'w:val': '20'}),),
+    ('w:rPr', 'w:b'): ((('w:val',), {'w:val': '0'}),),
+    ('w:rPr', 'w:color'): ((('w:val', 'w:themeColor', 'w:themeTint', 'w:themeShade'), {'w:val': 'auto'}),),
+}
+# 开关属性：元素存在即表示已定义（<w:b/> 为开启）
+TOGGLE_TAGS = frozenset((qn('w:b'),))
+_TAG_SEQ = {'w:pPr': PPR_TAG_SEQ, 'w:rPr': RPR_TAG_SEQ}
+
+
+def _patched_groups(compiled: CompiledStyle) -> List[Tuple[str, str, int]]:
+    """编译样式写入定义时会改变的属性组 (容器, 子元素, 组序号)"""
+    groups = []
+    for container, patches in (('w:pPr', compiled.ppr_patches), ('w:rPr', compiled.rpr_patches)):
+        for patch in patches:
+            tag = next(t for t in _TAG_SEQ[container] if qn(t) == patch.tag)
+            if patch.clears:
+                continue
+            touched = {name for name, _ in patch.attrs} | set(patch.remove)
+            if patch.tag == W_RFONTS and compiled.sets_fonts:
+                # 写入字体时会一并去掉主题字体属性
+                touched.update(THEME_FONT_ATTRS)
+            for index, (attrs, _) in enumerate(INHERITED_GROUPS.get((container, tag), ())):
+                if patch.mode != 'merge' or touched.intersection(qn(attr) for attr in attrs):
+                    groups.append((container, tag, index))
+    return groups
+
+
+def _group_value(level, container: str, tag: str, attrs: Sequence[str]) -> Optional[Dict[str, str]]:
+    """某一级（样式或文档默认值）中属性组的取值，未定义时返回 None"""
+    props = level.find(qn(container)) if level is not None else None
+    child = props.find(qn(tag)) if props is not None else None
+    if child is None:
+        return None
+    values = {attr: child.get(qn(attr)) for attr in attrs if child.get(qn(attr)) is not None}
+    if values or child.tag in TOGGLE_TAGS:
+        return values
+    return None
+
+
+def pin_inherited_properties(styles_root, written: Dict[str, CompiledStyle]) -> int:
+    """
+    样式模式：在写入样式定义之前，把基于被写入样式的段落样式原先继承的取值显式写入其定义
+
+    例如正文写入 Normal 后，未设置首行缩进与间距的标题、题注、目录等样式不再继承正文的缩进与间距，
+    与直接格式模式的结果一致。written 为 {styleId: 编译样式}。
+
+    Returns:
+        写入了继承值的样式数量
+    """
+    if not written:
+        return 0
+    styles = {}
+    for style in styles_root.findall(qn('w:style')):
+        if style.get(qn('w:type'), 'paragraph') == 'paragraph' and style.get(qn('w:styleId')):
+            styles[style.get(qn('w:styleId'))] = style
+    defaults = styles_root.find(qn('w:docDefaults'))
+    default_levels = {}
+    if defaults is not None:
+        default_levels = {'w:pPr': defaults.find(qn('w:pPrDefault')), 'w:rPr': defaults.find(qn('w:rPrDefault'))}
+    patched = {style_id: _patched_groups(compiled) for style_id, compiled in written.items()}
+
+    # 先按原始定义计算所有取值，再统一写入（被写入的样式本身也可能基于另一个被写入的样式）
+    pins = []
+    for style_id, style in styles.items():
+        chain, seen = [], {style_id}
+        based_on = style.find(qn('w:basedOn'))
+        while based_on is not None and based_on.get(qn('w:val')) in styles and based_on.get(qn('w:val')) not in seen:
+            seen.add(based_on.get(qn('w:val')))
+            chain.append(styles[based_on.get(qn('w:val'))])
+            based_on = chain[-1].find(qn('w:basedOn'))
+        groups = []
+        for ancestor in chain:
+            groups.extend(group for group in patched.get(ancestor.get(qn('w:styleId')), ()) if group not in groups)
+        values = []
+        for container, tag, index in groups:
+            attrs, default = INHERITED_GROUPS[(container, tag)][index]
+            if _group_value(style, container, tag, attrs) is not None:
+                continue
+            for level in chain + [default_levels.get(container)]:
+                value = _group_value(level, container, tag, attrs)
+                if value is not None:
+                    break
+            else:
+                value = default
+            if value or qn(tag) in TOGGLE_TAGS:
+                values.append((container, tag, attrs, value))
+        if values:
+            pins.append((style, values))
+
+    for style, values in pins:
+        for container, tag, attrs, value in values:
+            props = style.get_or_add_pPr() if container == 'w:pPr' else style.get_or_add_rPr()
+            child = get_or_add_child(props, tag, _TAG_SEQ[container])
+            for attr in attrs:
+                child.attrib.pop(qn(attr), None)
+            for attr in attrs:
+                if attr in value:
+                    child.set(qn(attr), value[attr])
+    return len(pins)
+
+
+class StylePlan:
+    """
+    一个格式化任务的样式计划
+
+    样式键在第一次使用时才编译（与参考实现一样，只有实际用到的样式配置才会被校验）。
+    """
+
+    def __init__(self, styles_dict: Optional[Dict]):
+        self.styles_dict = styles_dict or {}
+        self._compiled: Dict[str, CompiledStyle] = {}
+
+    def get(self, style_key: str) -> Optional[CompiledStyle]:
+        compiled = self._compiled.get(style_key)
+        if compiled is None:
+            style_config = self.styles_dict.get(style_key)
+            if style_config is None:
+                return None
+            compiled = compile_style(style_config)
+            self._compiled[style_key] = compiled
+        return compiled
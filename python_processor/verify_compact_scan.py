@@ -0,0 +1,70 @@
+import json
+import os
+import sys
+import tempfile
+
+# 扫描缓存写入临时目录，不影响本机的缓存
+os.environ["FORMATTER_CACHE_DIR"] = tempfile.mkdtemp(prefix="verify-compact-scan-")
+
+from benchmarks.synthetic import generate
+from compact_scan import expand_structure
+from formatter import scan_headings
+from verify_stories import build_input
+
+
+def expand(input_path, compact, **kwargs):
+    """按区间的 offset/count 请求完整记录（命中扫描缓存），还原完整 structure"""
+    ranges = compact["bodyRanges"]
+    items = {offset: scan_headings(input_path, offset=offset, limit=count, **kwargs)["structure"]
+             for offset, count in zip(ranges["offset"], ranges["count"])}
+    return expand_structure(compact, items)
+
+
+def verify_compact_scan():
+    input_path = "temp_input_compact_scan.docx"
+    stories_path = "temp_input_compact_scan_stories.docx"
+    generate(input_path, 3000, seed=9)
+    build_input(stories_path)
+    all_passed = True
+
+    def check(name, condition, detail=""):
+        nonlocal all_passed
+        print(f"{'✓' if condition else '✗'} {name}{'' if condition else ' ' + detail}")
+        all_passed = all_passed and condition
+
+    full = scan_headings(input_path)
+    compact = scan_headings(input_path, compact=True)
+    full_size = len(json.dumps(full, ensure_ascii=False).encode("utf-8"))
+    compact_size = len(json.dumps(compact, ensure_ascii=False).encode("utf-8"))
+    records = compact["records"]
+    check(f"紧凑结果 {compact_size // 1024}KB（完整结果 {full_size // 1024}KB），"
+          f"{len(records['index'])} 条完整记录、{len(compact['bodyRanges']['start'])} 个正文区间",
+          compact["success"] and compact["format"] == "compact" and compact_size * 5 < full_size)
+
+    check("完整记录只包含标题候选与有手动编号的段落",
+          all(style != "body" or numbering is not None
+              for style, numbering in zip(records["suggestedStyle"], records["manualNumbering"])))
+
+    ranges = compact["bodyRanges"]
+    check("区间的 count 之和与完整记录数等于 total",
+          sum(ranges["count"]) + len(records["index"]) == compact["total"] == len(full["structure"]))
+
+    check("按区间展开后与完整 structure 一致", expand(input_path, compact) == full["structure"])
+
+    # story 段落的 index 为段落键，不与正文段落合并到同一区间
+    full = scan_headings(stories_path, stories=True)
+    compact = scan_headings(stories_path, stories=True, compact=True)
+    ranges = compact["bodyRanges"]
+    check("包含 story 段落时展开后一致，区间不跨正文与 story 段落",
+          expand(stories_path, compact, stories=True) == full["structure"]
+          and all(type(start) is type(end) for start, end in zip(ranges["start"], ranges["end"])),
+          json.dumps(compact, ensure_ascii=False))
+
+    for path in (input_path, stories_path):
+        if os.path.exists(path):
+            os.remove(path)
+    return all_passed
+
+
+if __name__ == "__main__":
+    sys.exit(0 if verify_compact_scan() else 1)
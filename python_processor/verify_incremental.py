@@ -0,0 +1,95 @@
+import os
+import sys
+import tempfile
+import zipfile
+
+# 状态缓存写入临时目录，不影响本机的缓存
+os.environ["FORMATTER_CACHE_DIR"] = tempfile.mkdtemp(prefix="verify-incremental-")
+
+from benchmarks.synthetic import generate
+from formatter import format_document
+from verify_style_plan import STYLE_FULL
+
+NUMBERING = {
+    "heading1": {"enabled": True, "counterType": "一", "prefix": "第", "suffix": "章"},
+    "heading2": {"enabled": True, "counterType": "1", "cascade": True, "separator": "."},
+}
+PROFILES = {
+    "自动编号": {"styles": {"body": STYLE_FULL,
+                            "heading1": dict(STYLE_FULL, bold=False, numbering=NUMBERING["heading1"]),
+                            "heading2": dict(STYLE_FULL, fontSize=15, numbering=NUMBERING["heading2"])}},
+    "特殊规则": {"styles": {"body": STYLE_FULL, "heading1": dict(STYLE_FULL, alignment="center")},
+                 "specialRules": {"autoTimesNewRoman": True, "resetIndentsAndSpacing": True,
+                                  "pictureLineSpacing": True, "pictureCenterAlign": True,
+                                  "removeManualNumberPrefixes": True}},
+}
+
+
+def read_parts(path):
+    with zipfile.ZipFile(path) as z:
+        return {name: z.read(name) for name in z.namelist()}
+
+
+def verify_incremental():
+    input_path = "temp_input_incremental.docx"
+    first_path = "temp_output_incremental_1.docx"
+    second_path = "temp_output_incremental_2.docx"
+    full_path = "temp_output_incremental_full.docx"
+    info = generate(input_path, 300, seed=7)
+    base_mappings = info["mappings"]
+    heading_keys = [key for key, value in base_mappings.items() if value.startswith("heading")]
+    all_passed = True
+
+    def check(name, condition, detail=""):
+        nonlocal all_passed
+        print(f"{'✓' if condition else '✗'} {name}{'' if condition else ' ' + detail}")
+        all_passed = all_passed and condition
+
+    for profile_name, profile in PROFILES.items():
+        options = {"incremental": True}
+        first = format_document(input_path, profile, first_path, base_mappings, options=options)
+        check(f"{profile_name}: 首次格式化记录状态", first["success"] and first["incremental"]["mode"] == "full",
+              str(first.get("incremental") or first.get("error")))
+
+        # 修改三个映射：一个标题改为正文（后续自动编号随之变化）、两个正文改为标题；另加一处文本替换
+        mappings = dict(base_mappings)
+        mappings[heading_keys[1]] = "body"
+        mappings["5"] = "heading2"
+        mappings["40"] = "heading1"
+        replacements = {"12": "替换后的段落 Replaced 42"}
+        cases = [
+            ("修改映射与文本替换", first_path, mappings, replacements, profile, "incremental"),
+            # 以上一次增量的结果为基础继续增量，输出写回同一文件
+            ("链式增量", second_path, base_mappings, {}, profile, "incremental"),
+            ("没有任何修改", first_path, base_mappings, {}, profile, "incremental"),
+            ("规范变化时完整格式化", first_path, mappings, replacements,
+             dict(profile, locationStyles={"table": "body"}), "full"),
+        ]
+        for case_name, previous, case_mappings, case_replacements, case_profile, expected_mode in cases:
+            case_options = dict(options, previousOutput=previous)
+            result = format_document(input_path, case_profile, second_path, case_mappings, case_replacements,
+                                     options=case_options)
+            full = format_document(input_path, case_profile, full_path, case_mappings, case_replacements)
+            incremental = result.get("incremental", {})
+            same = result["success"] and full["success"] and read_parts(second_path) == read_parts(full_path)
+            check(f"{profile_name} / {case_name}: {incremental.get('mode')}，跳过 {incremental.get('skipped')} 段，"
+                  f"输出与完整格式化一致",
+                  same and incremental.get("mode") == expected_mode
+                  and result["images"] == full["images"], str(incremental))
+
+        # 上一次的输出被修改后不能增量
+        with open(first_path, "ab") as f:
+            f.write(b"\0")
+        modified = format_document(input_path, profile, second_path, base_mappings,
+                                   options=dict(options, previousOutput=first_path))
+        check(f"{profile_name}: 输出被修改后完整格式化", modified.get("incremental", {}).get("reason") == "noState",
+              str(modified.get("incremental")))
+
+    for path in (input_path, first_path, second_path, full_path):
+        if os.path.exists(path):
+            os.remove(path)
+    return all_passed
+
+
+if __name__ == "__main__":
+    sys.exit(0 if verify_incremental() else 1)
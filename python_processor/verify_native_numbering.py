@@ -0,0 +1,98 @@
+import os
+import sys
+import tempfile
+
+# 状态缓存与输出缓存写入临时目录，不影响本机的缓存
+os.environ["FORMATTER_CACHE_DIR"] = tempfile.mkdtemp(prefix="verify-native-numbering-")
+
+from docx import Document
+
+from benchmarks.synthetic import generate
+from formatter import format_document
+from native_numbering import (LIST_NAME, W_ABSTRACT_NUM, W_NAME, W_VAL, level_text, native_unsupported,
+                              _numbering_configs)
+from verify_incremental import PROFILES, read_parts
+
+
+def list_definitions(path):
+    numbering = Document(path).part.numbering_part.element
+    return [a for a in numbering.iterchildren(W_ABSTRACT_NUM)
+            if a.find(W_NAME) is not None and a.find(W_NAME).get(W_VAL) == LIST_NAME]
+
+
+def verify_native_numbering():
+    input_path = "temp_input_native_numbering.docx"
+    dom_path = "temp_output_native_dom.docx"
+    stream_path = "temp_output_native_stream.docx"
+    text_path = "temp_output_native_text.docx"
+    again_path = "temp_output_native_again.docx"
+    info = generate(input_path, 300, seed=7)
+    mappings = info["mappings"]
+    profile = PROFILES["自动编号"]
+    options = {"numberingMode": "native", "outputCache": False}
+    all_passed = True
+
+    def check(name, condition, detail=""):
+        nonlocal all_passed
+        print(f"{'✓' if condition else '✗'} {name}{'' if condition else ' ' + detail}")
+        all_passed = all_passed and condition
+
+    # lvlText 与文本模式的编号规则对应
+    configs = _numbering_configs(profile["styles"])
+    texts = [level_text(configs, level) for level in range(2)]
+    check("一级 第%1章、二级 %1.%2（一级中文计数显示为阿拉伯数字）",
+          texts == [("第%1章", False), ("%1.%2", True)], str(texts))
+
+    dom = format_document(input_path, profile, dom_path, mappings, options=dict(options, engine="dom"))
+    stream = format_document(input_path, profile, stream_path, mappings, options=dict(options, engine="stream"))
+    text = format_document(input_path, profile, text_path, mappings, options={"outputCache": False})
+    check("DOM 与流式引擎输出一致", dom["success"] and stream["success"]
+          and read_parts(dom_path) == read_parts(stream_path), str(dom.get("error") or stream.get("error")))
+
+    # 标题不再插入编号文本，改为引用列表；文本模式中带编号的段落数与引用列表的段落数相同
+    native_doc, text_doc = Document(dom_path), Document(text_path)
+    listed = [i for i, p in enumerate(native_doc.paragraphs) if p._p.pPr is not None and p._p.pPr.numPr is not None]
+    numbered = [i for i, key in mappings.items() if key in ("heading1", "heading2")]
+    same_text = all(text_doc.paragraphs[i].text.endswith(native_doc.paragraphs[i].text) for i in listed)
+    check(f"{len(listed)} 个标题引用列表，且没有插入编号文本",
+          sorted(listed) == sorted(int(i) for i in numbered) and dom["numbering"]["paragraphs"] == len(listed)
+          and same_text, str(dom.get("numbering")))
+
+    # 再次格式化已格式化的输出：复用原有的列表定义
+    again = format_document(dom_path, profile, again_path, mappings, options=dict(options, engine="dom"))
+    check("再次格式化复用列表定义", again["numbering"]["numId"] == dom["numbering"]["numId"]
+          and len(list_definitions(again_path)) == 1, str(again.get("numbering")))
+
+    # 增量格式化与完整格式化一致
+    incremental_options = dict(options, incremental=True)
+    format_document(input_path, profile, dom_path, mappings, options=incremental_options)
+    changed = dict(mappings, **{"5": "heading1"})
+    result = format_document(input_path, profile, stream_path, changed,
+                             options=dict(incremental_options, previousOutput=dom_path))
+    full = format_document(input_path, profile, again_path, changed, options=options)
+    check(f"增量格式化（跳过 {result['incremental'].get('skipped')} 段）与完整格式化一致",
+          result["incremental"]["mode"] == "incremental" and read_parts(stream_path) == read_parts(again_path)
+          and result["numbering"] == full["numbering"], str(result.get("incremental")))
+
+    # 二级级联中文计数的一级且自身不是阿拉伯数字：isLgl 会把 一/I 也显示为阿拉伯数字，退回文本模式
+    check("二级为阿拉伯数字时可以使用原生列表", native_unsupported(profile["styles"]) is None)
+    for counter_type in ("一", "I"):
+        styles = dict(profile["styles"], heading2=dict(profile["styles"]["heading2"], numbering=dict(
+            profile["styles"]["heading2"]["numbering"], counterType=counter_type)))
+        child_profile = dict(profile, styles=styles)
+        native = format_document(input_path, child_profile, dom_path, mappings, options=options)
+        text = format_document(input_path, child_profile, text_path, mappings, options={"outputCache": False})
+        heading2 = next(p.text for i, p in enumerate(Document(dom_path).paragraphs)
+                        if mappings.get(str(i)) == "heading2")
+        check(f"二级计数方式为 {counter_type} 时退回文本模式（{heading2[:8]}），与文本模式输出一致",
+              native["success"] and native["numbering"]["mode"] == "text"
+              and read_parts(dom_path) == read_parts(text_path), str(native.get("numbering")))
+
+    for path in (input_path, dom_path, stream_path, text_path, again_path):
+        if os.path.exists(path):
+            os.remove(path)
+    return all_passed
+
+
+if __name__ == "__main__":
+    sys.exit(0 if verify_native_numbering() else 1)
@@ -0,0 +1,95 @@
+import errno
+import glob
+import os
+import sys
+import tempfile
+import time
+
+# 输出缓存写入临时目录，不影响本机的缓存
+os.environ["FORMATTER_CACHE_DIR"] = tempfile.mkdtemp(prefix="verify-output-cache-")
+
+from benchmarks.synthetic import generate
+from formatter import format_document
+import output_cache
+from output_cache import get_output_cache
+from verify_incremental import PROFILES
+
+
+def read_bytes(path):
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def verify_output_cache():
+    input_path = "temp_input_output_cache.docx"
+    first_path = "temp_output_cache_1.docx"
+    second_path = "temp_output_cache_2.docx"
+    info = generate(input_path, 300, seed=11)
+    profile = PROFILES["特殊规则"]
+    mappings = info["mappings"]
+    cache_dir = os.path.join(os.environ["FORMATTER_CACHE_DIR"], "output")
+    all_passed = True
+
+    def check(name, condition, detail=""):
+        nonlocal all_passed
+        print(f"{'✓' if condition else '✗'} {name}{'' if condition else ' ' + detail}")
+        all_passed = all_passed and condition
+
+    first = format_document(input_path, profile, first_path, mappings)
+    check("首次格式化未命中", first["success"] and first.get("cacheHit") is False, str(first.get("error")))
+
+    start = time.perf_counter()
+    second = format_document(input_path, profile, second_path, mappings)
+    elapsed = (time.perf_counter() - start) * 1000
+    check(f"相同请求命中缓存（{elapsed:.1f}ms），输出与结果一致",
+          second.get("cacheHit") is True and read_bytes(first_path) == read_bytes(second_path)
+          and second["images"] == first["images"] and second["rules"] == first["rules"], str(second))
+
+    changed = format_document(input_path, profile, second_path, dict(mappings, **{"3": "heading1"}))
+    check("mappings 变化时不命中", changed.get("cacheHit") is False)
+
+    disabled = format_document(input_path, profile, second_path, mappings, options={"outputCache": False})
+    check("outputCache 为 false 时不使用缓存", disabled["success"] and "cacheHit" not in disabled)
+
+    incremental = format_document(input_path, profile, second_path, mappings, options={"incremental": True})
+    check("增量模式不使用缓存", incremental["success"] and "cacheHit" not in incremental)
+
+    # 缓存文件被修改后删除该条目并重新格式化
+    for path in glob.glob(os.path.join(cache_dir, "*.docx")):
+        with open(path, "ab") as f:
+            f.write(b"\0")
+    tampered = format_document(input_path, profile, second_path, mappings)
+    check("缓存文件被修改后重新格式化", tampered.get("cacheHit") is False
+          and read_bytes(first_path) == read_bytes(second_path))
+
+    # 闲置超过 max_age 的条目被淘汰
+    old = time.time() - 30 * 24 * 3600
+    for path in glob.glob(os.path.join(cache_dir, "*")):
+        os.utime(path, (old, old))
+    get_output_cache().evict()
+    check("闲置过久的条目被淘汰", not os.listdir(cache_dir), str(os.listdir(cache_dir)))
+
+    # 写入缓存时的 I/O 错误（如磁盘已满）不影响格式化结果
+    original_hash = output_cache.hash_file
+
+    def failing_hash(path):
+        if os.path.abspath(path) == os.path.abspath(second_path):
+            raise OSError(errno.ENOSPC, "No space left on device")
+        return original_hash(path)
+
+    output_cache.hash_file = failing_hash
+    try:
+        unwritable = format_document(input_path, profile, second_path, dict(mappings, **{"5": "heading2"}))
+    finally:
+        output_cache.hash_file = original_hash
+    check("写入缓存失败时格式化仍然成功", unwritable["success"] and unwritable.get("cacheHit") is False,
+          str(unwritable.get("error")))
+
+    for path in (input_path, first_path, second_path):
+        if os.path.exists(path):
+            os.remove(path)
+    return all_passed
+
+
+if __name__ == "__main__":
+    sys.exit(0 if verify_output_cache() else 1)
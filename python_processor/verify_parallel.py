@@ -0,0 +1,67 @@
+import filecmp
+import os
+import sys
+
+import formatter
+from benchmarks.bench_scaling import ALL_RULES
+from benchmarks.synthetic import generate
+from formatter import format_document
+from verify_incremental import PROFILES
+
+
+def verify_parallel():
+    input_path = "temp_input_parallel.docx"
+    sequential_path = "temp_output_parallel_sequential.docx"
+    parallel_path = "temp_output_parallel.docx"
+    info = generate(input_path, 3000, seed=12)
+    mappings = info["mappings"]
+    headings = [key for key, value in mappings.items() if value.startswith("heading")]
+    text_replacements = {headings[0]: "新的标题", headings[1]: "", "3": "替换正文"}
+    profile = dict(PROFILES["自动编号"], specialRules=ALL_RULES)
+    # 缩小块的下限，小文档也分成多块
+    formatter.PARALLEL_MIN_CHUNK_BYTES = 16 * 1024
+    all_passed = True
+
+    def check(name, condition, detail=""):
+        nonlocal all_passed
+        print(f"{'✓' if condition else '✗'} {name}{'' if condition else ' ' + detail}")
+        all_passed = all_passed and condition
+
+    cases = {
+        "文本编号": {},
+        "原生编号": {"numberingMode": "native"},
+        "合并 run": {"coalesceRuns": True},
+        "样式模式": {"formatMode": "styles"},
+        "低内存模式": {"lowMemory": True},
+    }
+    for name, options in cases.items():
+        options = dict(options, outputCache=False)
+        sequential = format_document(input_path, profile, sequential_path, mappings, text_replacements,
+                                     options=dict(options, engine="stream"))
+        parallel = format_document(input_path, profile, parallel_path, mappings, text_replacements,
+                                   options=dict(options, parallelWorkers=3))
+        # memory.peakRssMb 为进程的峰值内存、ruleTimings 为耗时，不参与比较
+        same_result = all(sequential[key] == parallel.get(key)
+                          for key in sequential if key not in ("outputPath", "memory", "ruleTimings"))
+        check(f"{name}：{parallel.get('parallel')} 输出与逐段处理逐字节相同",
+              parallel["success"] and filecmp.cmp(sequential_path, parallel_path, shallow=False) and same_result,
+              str(parallel.get("error")))
+
+    # 纯图片段落映射为标题时不推进编号计数，前缀扫描与逐段处理一致
+    pictures = list(sequential["images"]["paragraphs"])
+    picture_mappings = dict(mappings, **{key: "heading2" for key in pictures})
+    format_document(input_path, profile, sequential_path, picture_mappings,
+                    options={"engine": "stream", "outputCache": False})
+    format_document(input_path, profile, parallel_path, picture_mappings,
+                    options={"parallelWorkers": 2, "outputCache": False})
+    check(f"{len(pictures)} 个图片段落映射为标题时输出一致",
+          filecmp.cmp(sequential_path, parallel_path, shallow=False))
+
+    for path in (input_path, sequential_path, parallel_path):
+        if os.path.exists(path):
+            os.remove(path)
+    return all_passed
+
+
+if __name__ == "__main__":
+    sys.exit(0 if verify_parallel() else 1)
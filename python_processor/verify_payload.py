@@ -0,0 +1,92 @@
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+# 输出缓存与状态缓存写入临时目录，不影响本机的缓存
+os.environ["FORMATTER_CACHE_DIR"] = tempfile.mkdtemp(prefix="verify-payload-")
+
+from benchmarks.synthetic import generate
+from formatter import format_document
+from payload import encode_ranges, parse_mappings
+from verify_incremental import PROFILES, read_parts
+
+
+def verify_payload():
+    input_path = "temp_input_payload.docx"
+    dict_path = "temp_output_payload_dict.docx"
+    ranges_path = "temp_output_payload_ranges.docx"
+    payload_path = "temp_payload.json"
+    info = generate(input_path, 2000, seed=3)
+    profile = PROFILES["自动编号"]
+    all_passed = True
+
+    def check(name, condition, detail=""):
+        nonlocal all_passed
+        print(f"{'✓' if condition else '✗'} {name}{'' if condition else ' ' + detail}")
+        all_passed = all_passed and condition
+
+    # 界面发送的是逐段的完整字典（正文段落也有 body 条目）
+    full = {str(i): info["mappings"].get(str(i), "body") for i in range(info["paragraphs"])}
+    encoded = encode_ranges(full)
+    ranges = parse_mappings(encoded)
+    check("区间形式与逐段字典查找结果一致",
+          all(ranges.get(key, "body") == value for key, value in full.items())
+          and dict(ranges) == {key: value for key, value in full.items() if value != "body"})
+
+    # 2 万段落的 payload 大小与解析时间
+    large = {str(i): "body" for i in range(20000)}
+    large.update({str(i): "heading2" for i in range(0, 20000, 40)})
+    dict_json, ranges_json = json.dumps(large), json.dumps(encode_ranges(large))
+    start = time.perf_counter()
+    dict(json.loads(dict_json))
+    dict_ms = (time.perf_counter() - start) * 1000
+    start = time.perf_counter()
+    parse_mappings(json.loads(ranges_json))
+    ranges_ms = (time.perf_counter() - start) * 1000
+    check(f"2 万段落：字典 {len(dict_json) // 1024}KB / {dict_ms:.1f}ms，"
+          f"区间 {len(ranges_json) // 1024}KB / {ranges_ms:.1f}ms", len(ranges_json) * 10 < len(dict_json))
+
+    options = {"outputCache": False}
+    by_dict = format_document(input_path, profile, dict_path, full, options=options)
+    by_ranges = format_document(input_path, profile, ranges_path, encoded["ranges"], options=options)
+    check("区间形式与字典形式的输出一致", by_dict["success"] and by_ranges["success"]
+          and read_parts(dict_path) == read_parts(ranges_path), str(by_ranges.get("error")))
+    reference = read_parts(dict_path)
+
+    # 增量状态保存区间形式，下一次只重新处理变化的段落
+    incremental = dict(options, incremental=True)
+    format_document(input_path, profile, dict_path, encoded, options=incremental)
+    changed = dict(full, **{"7": "heading1"})
+    result = format_document(input_path, profile, ranges_path, encode_ranges(changed),
+                             options=dict(incremental, previousOutput=dict_path))
+    check(f"增量格式化（重新处理 {result['incremental'].get('restyled')} 段）",
+          result["incremental"]["mode"] == "incremental", str(result.get("incremental")))
+
+    overlapping = format_document(input_path, profile, ranges_path, [[0, 5, "heading1"], [5, 6, "heading2"]],
+                                  options=options)
+    check("区间重叠时返回错误", not overlapping["success"] and "重叠" in overlapping["error"],
+          str(overlapping))
+
+    # 命令行：payload 从标准输入或文件读取
+    payload = json.dumps({"profile": profile, "mappings": encoded, "options": options}, ensure_ascii=False)
+    with open(payload_path, "w", encoding="utf-8") as f:
+        f.write(payload)
+    for source, stdin in (("-", payload), (payload_path, None)):
+        os.remove(ranges_path)
+        completed = subprocess.run([sys.executable, "formatter.py", "format", input_path, ranges_path, source],
+                                   input=stdin, capture_output=True, text=True, encoding="utf-8")
+        result = json.loads(completed.stdout.strip().splitlines()[-1])
+        check(f"命令行 payload 为 {'标准输入' if source == '-' else '文件'}",
+              result["success"] and read_parts(ranges_path) == reference, completed.stdout + completed.stderr)
+
+    for path in (input_path, dict_path, ranges_path, payload_path):
+        if os.path.exists(path):
+            os.remove(path)
+    return all_passed
+
+
+if __name__ == "__main__":
+    sys.exit(0 if verify_payload() else 1)
@@ -0,0 +1,106 @@
+import glob
+import os
+import signal
+import sys
+import tempfile
+import threading
+
+# 输出缓存写入临时目录，不影响本机的缓存
+os.environ["FORMATTER_CACHE_DIR"] = tempfile.mkdtemp(prefix="verify-progress-")
+
+import progress
+from benchmarks.synthetic import generate
+from docx import Document
+from formatter import _progress_session, format_document
+from package_writer import save_document
+from verify_incremental import PROFILES
+
+
+def verify_progress():
+    input_path = "temp_input_progress.docx"
+    output_path = "temp_output_progress.docx"
+    cancel_path = "temp_progress.cancel"
+    info = generate(input_path, 3000, seed=5)
+    profile = PROFILES["特殊规则"]
+    mappings = info["mappings"]
+    all_passed = True
+
+    def check(name, condition, detail=""):
+        nonlocal all_passed
+        print(f"{'✓' if condition else '✗'} {name}{'' if condition else ' ' + detail}")
+        all_passed = all_passed and condition
+
+    # 进度事件：每个阶段开始时一条（未启用 stories 时没有该阶段），阶段内按间隔节流，done 不超过 total
+    events = []
+    with progress.session(events.append, interval=0.05):
+        result = format_document(input_path, profile, output_path, mappings,
+                                 options={"engine": "dom", "outputCache": False})
+    phases = [e["phase"] for e in events if e["done"] == 0]
+    paragraphs = [e for e in events if e["phase"] == "paragraphs"]
+    check(f"DOM 引擎发出 {len(events)} 条进度事件，阶段 {phases}",
+          result["success"] and phases == ["open", "styles", "paragraphs", "save"]
+          and all(e["type"] == "progress" and (e["total"] is None or e["done"] <= e["total"]) for e in events)
+          and len(paragraphs) < result.get("paragraphs", 3000), str(result.get("error")))
+
+    events = []
+    with progress.session(events.append, interval=10):
+        format_document(input_path, profile, output_path, mappings,
+                        options={"engine": "stream", "outputCache": False})
+    check("间隔较长时每个阶段只发出开始事件", all(e["done"] == 0 for e in events), str(events))
+
+    # 取消：哨兵文件出现后在下一段停止，不写出输出文件
+    os.remove(output_path)
+    for engine in ("dom", "stream"):
+        if os.path.exists(cancel_path):
+            os.remove(cancel_path)
+        timer = threading.Timer(0.3, lambda: open(cancel_path, "w").close())
+        timer.start()
+        with progress.session(cancel_file=cancel_path):
+            result = format_document(input_path, profile, output_path, mappings,
+                                     options={"engine": engine, "outputCache": False})
+        timer.join()
+        leftovers = [name for name in os.listdir(".") if name.startswith(output_path)]
+        check(f"{engine} 引擎取消后停止（已完成 {result.get('completed')}），没有留下输出",
+              result.get("cancelled") is True and result["success"] is False and not leftovers,
+              str(result) + str(leftovers))
+
+    # 未开启会话时不检查哨兵文件
+    result = format_document(input_path, profile, output_path, mappings, options={"outputCache": False})
+    check("未开启进度会话时正常完成", result["success"] and os.path.exists(output_path))
+
+    # 只有命令行入口把 SIGINT / SIGTERM 改为取消，作为库调用时不替换调用方的信号处理
+    handler = signal.getsignal(signal.SIGINT)
+    with _progress_session({"cancel_file": cancel_path}):
+        kept = signal.getsignal(signal.SIGINT) is handler
+    with _progress_session({"cancel_file": cancel_path}, handle_signals=True):
+        replaced = signal.getsignal(signal.SIGINT) is not handler
+    check("未指定 handle_signals 时不替换信号处理", kept and replaced and signal.getsignal(signal.SIGINT) is handler)
+
+    # 新增了部件时整体保存：同样先写临时文件，中途取消不会留下写了一半的输出
+    os.remove(output_path)
+    doc = Document(input_path)
+    doc.sections[0].header.add_paragraph("页眉")
+    stats = save_document(doc, input_path, output_path, [])
+    check("整体保存写出完整的输出", os.path.exists(output_path) and stats["encodedParts"] > 0, str(stats))
+    os.remove(output_path)
+
+    def interrupted_save(stream):
+        stream.write(b"PK\x03\x04")
+        raise KeyboardInterrupt()
+
+    doc.save = interrupted_save
+    try:
+        save_document(doc, input_path, output_path, [])
+    except KeyboardInterrupt:
+        pass
+    leftovers = glob.glob("*.docx.tmp")
+    check("整体保存被中断时没有留下输出与临时文件", not os.path.exists(output_path) and not leftovers, str(leftovers))
+
+    for path in (input_path, output_path, cancel_path):
+        if os.path.exists(path):
+            os.remove(path)
+    return all_passed
+
+
+if __name__ == "__main__":
+    sys.exit(0 if verify_progress() else 1)
@@ -0,0 +1,114 @@
+import os
+import sys
+import tempfile
+import time
+import zipfile
+
+# 输出缓存写入临时目录，不影响本机的缓存
+os.environ["FORMATTER_CACHE_DIR"] = tempfile.mkdtemp(prefix="verify-script-split-")
+
+from docx import Document
+from docx.oxml.ns import qn
+from formatter import format_document
+from runs import LATIN_RE, script_segments
+
+PROFILE = {
+    "styles": {"body": {"fontFamily": "宋体", "fontSize": 12}},
+    "specialRules": {"autoTimesNewRoman": True},
+}
+
+# (文本, 期望的切分)
+SEGMENT_CASES = [
+    ("纯中文段落", [("纯中文段落", False)]),
+    ("English only", [("English only", True)]),
+    ("版本 Python 3.11 发布", [("版本 ", False), ("Python 3.11", True), (" 发布", False)]),
+    ("(Note)：说明", [("(Note", True), (")：说明", False)]),
+    ("第1章", [("第", False), ("1", True), ("章", False)]),
+    ("……", [("……", None)]),
+]
+
+
+def build_input(path):
+    doc = Document()
+    doc.add_paragraph("纯中文的正文段落")
+    doc.add_paragraph("English paragraph 2024")
+    mixed = doc.add_paragraph()
+    mixed.add_run("使用 Python 3.11 与“Word”处理文档").bold = True
+    mixed.add_run("，再保存")
+    doc.add_paragraph("第1章 概述")
+    doc.save(path)
+
+
+def run_fonts(path):
+    """输出文档各 run 的 (文本, 西文字体是否为 Times New Roman)"""
+    doc = Document(path)
+    runs = []
+    for para in doc.paragraphs:
+        for run in para.runs:
+            r_fonts = run._element.rPr.rFonts if run._element.rPr is not None else None
+            runs.append((run.text, r_fonts is not None and r_fonts.get(qn('w:ascii')) == 'Times New Roman'))
+    return runs
+
+
+def verify_script_split():
+    input_path = "temp_input_script_split.docx"
+    dom_path = "temp_output_script_split_dom.docx"
+    stream_path = "temp_output_script_split_stream.docx"
+    again_path = "temp_output_script_split_again.docx"
+    build_input(input_path)
+    all_passed = True
+
+    def check(name, condition, detail=""):
+        nonlocal all_passed
+        print(f"{'✓' if condition else '✗'} {name}{'' if condition else ' ' + detail}")
+        all_passed = all_passed and condition
+
+    for text, expected in SEGMENT_CASES:
+        segments = script_segments(text)
+        check(f"切分 {text!r}", segments == expected, str(segments))
+
+    # 逐字符比较与预编译正则的分类耗时
+    texts = ["使用 Python 3.11 与 Word 处理文档，" * 3, "纯中文的一段比较长的正文内容" * 3] * 20000
+    start = time.perf_counter()
+    by_chars = [any(('A' <= ch <= 'Z') or ('a' <= ch <= 'z') or ('0' <= ch <= '9') for ch in text) for text in texts]
+    chars_ms = (time.perf_counter() - start) * 1000
+    start = time.perf_counter()
+    by_regex = [LATIN_RE.search(text) is not None for text in texts]
+    regex_ms = (time.perf_counter() - start) * 1000
+    check(f"{len(texts)} 个 run 的分类：逐字符 {chars_ms:.1f}ms，正则 {regex_ms:.1f}ms", by_chars == by_regex)
+
+    options = {"outputCache": False}
+    dom = format_document(input_path, PROFILE, dom_path, {}, options=dict(options, engine="dom"))
+    stream = format_document(input_path, PROFILE, stream_path, {}, options=dict(options, engine="stream"))
+    check("格式化成功", dom["success"] and stream["success"], str(dom.get("error") or stream.get("error")))
+
+    rules = dom["rules"]["autoTimesNewRoman"]
+    check(f"计数 {rules}，分类耗时 {dom['ruleTimings']['autoTimesNewRoman']['classifyMs']}ms",
+          rules == {"runs": 4, "splits": 2} and "classifyMs" in stream["ruleTimings"]["autoTimesNewRoman"],
+          str(dom["ruleTimings"]))
+
+    fonts = run_fonts(dom_path)
+    check("只有西文段使用 Times New Roman，中文段（含弯引号）保持原字体", fonts == [
+        ("纯中文的正文段落", False), ("English paragraph 2024", True),
+        ("使用 ", False), ("Python 3.11", True), (" 与“", False), ("Word", True), ("”处理文档", False), ("，再保存", False),
+        ("第", False), ("1", True), ("章 概述", False),
+    ], str(fonts))
+    check("段落文本不变",
+          [p.text for p in Document(dom_path).paragraphs] == [p.text for p in Document(input_path).paragraphs])
+
+    with zipfile.ZipFile(dom_path) as dom_zip, zipfile.ZipFile(stream_path) as stream_zip:
+        check("两种引擎的 document.xml 一致",
+              dom_zip.read("word/document.xml") == stream_zip.read("word/document.xml"))
+
+    again = format_document(dom_path, PROFILE, again_path, {}, options=options)
+    check("再次格式化时不再拆分", again["success"] and again["rules"]["autoTimesNewRoman"].get("splits", 0) == 0
+          and run_fonts(again_path) == fonts, str(again.get("rules")))
+
+    for path in (input_path, dom_path, stream_path, again_path):
+        if os.path.exists(path):
+            os.remove(path)
+    return all_passed
+
+
+if __name__ == "__main__":
+    sys.exit(0 if verify_script_split() else 1)
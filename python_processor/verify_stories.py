@@ -0,0 +1,107 @@
+import os
+import sys
+import zipfile
+from docx import Document
+from docx.oxml import parse_xml
+from formatter import format_document, scan_headings
+from verify_style_plan import PROFILES
+
+# 段落中的文本框：mc:Choice 与 mc:Fallback 各有一份内容
+TEXTBOX_XML = (
+    '<w:r %s><mc:AlternateContent><mc:Choice Requires="wps"><w:drawing><wp:anchor><a:graphic><a:graphicData>'
+    '<wps:wsp><wps:txbx><w:txbxContent><w:p><w:r><w:t>文本框 Text</w:t></w:r></w:p></w:txbxContent></wps:txbx></wps:wsp>'
+    '</a:graphicData></a:graphic></wp:anchor></w:drawing></mc:Choice><mc:Fallback><w:pict><v:shape><v:textbox>'
+    '<w:txbxContent><w:p><w:r><w:t>文本框 Text</w:t></w:r></w:p></w:txbxContent></v:textbox></v:shape></w:pict>'
+    '</mc:Fallback></mc:AlternateContent></w:r>'
+) % ' '.join(f'xmlns:{prefix}="{uri}"' for prefix, uri in (
+    ('w', 'http://schemas.openxmlformats.org/wordprocessingml/2006/main'),
+    ('mc', 'http://schemas.openxmlformats.org/markup-compatibility/2006'),
+    ('wps', 'http://schemas.microsoft.com/office/word/2010/wordprocessingShape'),
+    ('wp', 'http://schemas.openxmlformats.org/drawingml/2006/wordprocessingDrawing'),
+    ('a', 'http://schemas.openxmlformats.org/drawingml/2006/main'),
+    ('v', 'urn:schemas-microsoft-com:vml'),
+))
+
+
+def build_input(path):
+    doc = Document()
+    doc.add_paragraph('正文 body')._p.append(parse_xml(TEXTBOX_XML))
+    table = doc.add_table(rows=2, cols=3)
+    table.cell(0, 0).merge(table.cell(0, 1))
+    for r in range(2):
+        for c in range(3):
+            table.cell(r, c).paragraphs[0].add_run(f'单元格 {r}{c}')
+    table.cell(1, 0).add_table(rows=1, cols=2).cell(0, 1).text = '嵌套表格'
+    doc.add_paragraph('结尾 end')
+    header = doc.sections[0].header
+    header.paragraphs[0].text = '页眉 Header'
+    doc.sections[0].footer.paragraphs[0].text = '页脚 Footer'
+    doc.save(path)
+
+
+# 期望的 story 段落：(段落键, 文本, 位置)
+EXPECTED = [
+    ("word/document.xml:0", "文本框 Text", {"story": "body", "container": "textbox"}),
+    ("word/document.xml:1", "单元格 00单元格 01", {"story": "body", "container": "table", "table": 0, "row": 0, "col": 0}),
+    ("word/document.xml:2", "单元格 02", {"story": "body", "container": "table", "table": 0, "row": 0, "col": 2}),
+    ("word/document.xml:3", "单元格 10", {"story": "body", "container": "table", "table": 0, "row": 1, "col": 0}),
+    ("word/document.xml:5", "嵌套表格", {"story": "body", "container": "table", "table": 1, "row": 0, "col": 1}),
+    ("word/document.xml:7", "单元格 11", {"story": "body", "container": "table", "table": 0, "row": 1, "col": 1}),
+    ("word/document.xml:8", "单元格 12", {"story": "body", "container": "table", "table": 0, "row": 1, "col": 2}),
+    ("word/header1.xml:0", "页眉 Header", {"story": "header"}),
+    ("word/footer1.xml:0", "页脚 Footer", {"story": "footer"}),
+]
+
+
+def read_parts(path):
+    with zipfile.ZipFile(path) as z:
+        return {name: z.read(name) for name in z.namelist()}
+
+
+def verify_stories():
+    input_path = "temp_input_stories.docx"
+    output_paths = {"dom": "temp_output_stories_dom.docx", "stream": "temp_output_stories_stream.docx"}
+    build_input(input_path)
+    all_passed = True
+
+    for engine in ("dom", "stream"):
+        result = scan_headings(input_path, use_cache=False, engine=engine, stories=True)
+        found = [(item["index"], item["text"], {k: v for k, v in item["location"].items() if k != "part"})
+                 for item in result["structure"] if "location" in item]
+        if found == EXPECTED:
+            print(f"✓ 扫描 {engine}: {len(found)} 个 story 段落的键与位置正确")
+        else:
+            print(f"✗ 扫描 {engine}: story 段落不符\n  {found}")
+            all_passed = False
+
+    for name, profile in PROFILES.items():
+        profile = dict(profile, locationStyles={"table": "body", "textbox": "heading1", "header": "body"})
+        mappings = {"word/footer1.xml:0": "heading1"}
+        results = {engine: format_document(input_path, profile, path, mappings,
+                                           options={"engine": engine, "outputCache": False})
+                   for engine, path in output_paths.items()}
+        if not all(r["success"] for r in results.values()):
+            print(f"✗ {name}: 格式化失败 {[r.get('error') for r in results.values()]}")
+            all_passed = False
+            continue
+        dom_parts = read_parts(output_paths["dom"])
+        stream_parts = read_parts(output_paths["stream"])
+        # 另有文本框在 mc:Fallback 中的副本，以及嵌套表格的空单元格和其后的空段落（扫描结果不含空段落）
+        expected_count = len(EXPECTED) + 3
+        counts = [r["stories"]["paragraphs"] for r in results.values()]
+        changed = all(dom_parts[part] != data for part, data in read_parts(input_path).items()
+                      if part in ("word/header1.xml", "word/footer1.xml"))
+        if dom_parts == stream_parts and counts == [expected_count] * 2 and changed:
+            print(f"✓ {name}: 两种引擎处理了 {expected_count} 个 story 段落，输出一致")
+        else:
+            print(f"✗ {name}: 输出不一致或段落数不符 {counts}")
+            all_passed = False
+
+    for path in (input_path, *output_paths.values()):
+        if os.path.exists(path):
+            os.remove(path)
+    return all_passed
+
+
+if __name__ == "__main__":
+    sys.exit(0 if verify_stories() else 1)
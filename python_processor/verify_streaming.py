@@ -0,0 +1,62 @@
+import os
+import sys
+import zipfile
+from formatter import format_document, scan_headings
+from verify_style_plan import PROFILES, build_input
+
+
+def read_parts(path):
+    with zipfile.ZipFile(path) as z:
+        return {name: z.read(name) for name in z.namelist()}
+
+
+def verify_streaming():
+    input_path = "temp_input_stream.docx"
+    dom_path = "temp_output_dom.docx"
+    stream_path = "temp_output_stream.docx"
+
+    paragraph_count = build_input(input_path)
+    mappings = {str(i): ("heading1" if i % 2 else "body") for i in range(paragraph_count)}
+    text_replacements = {"2": "替换后的文本 text"}
+
+    all_passed = True
+    dom_scan = scan_headings(input_path, use_cache=False, engine="dom")
+    stream_scan = scan_headings(input_path, use_cache=False, engine="stream")
+    if dom_scan["structure"] == stream_scan["structure"]:
+        print(f"✓ 扫描: 两种引擎识别结果一致 ({len(dom_scan['structure'])} 项)")
+    else:
+        print("✗ 扫描: 识别结果不一致")
+        all_passed = False
+
+    for name, profile in PROFILES.items():
+        for options in ({}, {"coalesceRuns": True}):
+            dom = format_document(input_path, profile, dom_path, mappings, text_replacements,
+                                  options=dict(options, engine="dom", outputCache=False))
+            stream = format_document(input_path, profile, stream_path, mappings, text_replacements,
+                                     options=dict(options, engine="stream", outputCache=False))
+            label = f"{name} {options or ''}".strip()
+            if not (dom["success"] and stream["success"]):
+                print(f"✗ {label}: 格式化失败 {dom.get('error')} / {stream.get('error')}")
+                all_passed = False
+                continue
+
+            dom_parts = read_parts(dom_path)
+            stream_parts = read_parts(stream_path)
+            same = (sorted(dom_parts) == sorted(stream_parts)
+                    and dom_parts["word/document.xml"] == stream_parts["word/document.xml"]
+                    and dom_parts["word/styles.xml"] == stream_parts["word/styles.xml"]
+                    and dom["images"] == stream["images"] and dom.get("runs") == stream.get("runs"))
+            if same:
+                print(f"✓ {label}: 两种引擎输出的 document.xml / styles.xml 完全一致")
+            else:
+                print(f"✗ {label}: 输出不一致")
+                all_passed = False
+
+    for path in (input_path, dom_path, stream_path):
+        if os.path.exists(path):
+            os.remove(path)
+    return all_passed
+
+
+if __name__ == "__main__":
+    sys.exit(0 if verify_streaming() else 1)
@@ -0,0 +1,186 @@
+import os
+import sys
+import time
+import zipfile
+from docx import Document
+from docx.oxml import parse_xml
+from docx.oxml.ns import nsdecls, qn
+from formatter import format_document
+from style_plan import INHERITED_GROUPS
+
+# 带有各种既有格式的段落/run，用于覆盖合并逻辑的分支
+PARAGRAPH_XML = [
+    # 已有行单位间距、最小行距、悬挂缩进、右对齐与自动编号
+    '<w:p %s><w:pPr><w:numPr><w:ilvl w:val="0"/><w:numId w:val="1"/></w:numPr>'
+    '<w:spacing w:beforeLines="50" w:afterLines="50" w:line="300" w:lineRule="atLeast"/>'
+    '<w:ind w:left="420" w:hanging="420"/><w:jc w:val="right"/></w:pPr>'
+    '<w:r><w:t>1.1 已有格式的段落 Mixed 123</w:t></w:r></w:p>',
+    # 主题字体、主题颜色、取消加粗、已有字号
+    '<w:p %s><w:r><w:rPr><w:rFonts w:eastAsiaTheme="minorEastAsia" w:eastAsia="宋体"/><w:b w:val="0"/>'
+    '<w:color w:val="FF0000" w:themeColor="accent1"/><w:sz w:val="18"/></w:rPr><w:t>主题格式</w:t></w:r>'
+    '<w:r><w:t>无属性 run ABC</w:t></w:r><w:r><w:rPr><w:i/></w:rPr><w:t xml:space="preserve"> </w:t></w:r></w:p>',
+    # 只有首行缩进（绝对单位）
+    '<w:p %s><w:pPr><w:ind w:firstLine="640"/></w:pPr><w:r><w:t>第二段 text</w:t></w:r></w:p>',
+    # 无 run 的空段落
+    '<w:p %s/>',
+]
+
+STYLE_FULL = {
+    "fontFamily": "仿宋", "fontSize": 16, "bold": True, "color": "#1A2B3C", "alignment": "justify",
+    "firstLineIndent": 2, "lineSpacing": 28, "spaceBefore": 6, "spaceAfter": 3,
+}
+
+PROFILES = {
+    "完整配置": {"styles": {"body": STYLE_FULL, "heading1": dict(STYLE_FULL, lineSpacing=1.5, bold=False)}},
+    "特殊规则": {
+        "styles": {"body": STYLE_FULL, "heading1": dict(STYLE_FULL, alignment="unknown", firstLineIndent=0)},
+        "specialRules": {"autoTimesNewRoman": True, "resetIndentsAndSpacing": True,
+                         "pictureLineSpacing": True, "pictureCenterAlign": True,
+                         "removeManualNumberPrefixes": True},
+    },
+    "部分配置": {"styles": {"body": {"fontSize": 10.5, "bold": None}, "heading1": {"fontFamily": None, "color": "000000"}}},
+    # 无法转换为数值的行距/间距只跳过该项，其余配置照常应用
+    "格式错误的数值": {"styles": {"body": dict(STYLE_FULL, lineSpacing="1.5倍", spaceBefore="六"),
+                               "heading1": dict(STYLE_FULL, lineSpacing="28", spaceAfter=[3])}},
+}
+
+# 样式模式与直接格式模式的有效格式对比：标题配置不含缩进与间距
+STYLES_MODE_PROFILES = {
+    "标题未设置缩进与间距": {"styles": {"body": STYLE_FULL,
+                                "heading1": {"fontFamily": "黑体", "fontSize": 22, "alignment": "center"}}},
+    "部分配置": PROFILES["部分配置"],
+}
+# 文档中未使用、但基于 Normal 或标题样式的样式定义也应保持原有的继承值
+INHERITING_STYLES = ("Caption", "Header", "Heading2", "TOC1")
+
+
+def build_input(path, paragraph_xml=PARAGRAPH_XML):
+    doc = Document()
+    body = doc.element.body
+    for i in range(3):
+        for xml in paragraph_xml:
+            body.insert(len(body) - 1, parse_xml(xml % nsdecls('w')))
+    doc.save(path)
+    return len(doc.paragraphs)
+
+
+def document_xml(path):
+    with zipfile.ZipFile(path) as z:
+        return z.read('word/document.xml')
+
+
+def verify_style_plan():
+    input_path = "temp_input_plan.docx"
+    reference_path = "temp_output_reference.docx"
+    compiled_path = "temp_output_compiled.docx"
+
+    paragraph_count = build_input(input_path)
+    # 交替映射到 body / heading1，覆盖两个样式键
+    mappings = {str(i): ("heading1" if i % 2 else "body") for i in range(paragraph_count)}
+
+    all_passed = True
+    for name, profile in PROFILES.items():
+        start = time.perf_counter()
+        reference = format_document(input_path, profile, reference_path, mappings,
+                                    options={"styleEngine": "reference"})
+        reference_ms = (time.perf_counter() - start) * 1000
+        start = time.perf_counter()
+        compiled = format_document(input_path, profile, compiled_path, mappings)
+        compiled_ms = (time.perf_counter() - start) * 1000
+
+        if not (reference["success"] and compiled["success"]):
+            print(f"✗ {name}: 格式化失败 {reference.get('error')} / {compiled.get('error')}")
+            all_passed = False
+            continue
+
+        if document_xml(reference_path) == document_xml(compiled_path):
+            print(f"✓ {name}: 两种模式输出的 document.xml 完全一致 "
+                  f"(参考 {reference_ms:.1f}ms, 编译 {compiled_ms:.1f}ms)")
+        else:
+            print(f"✗ {name}: 输出不一致")
+            all_passed = False
+
+    for path in (input_path, reference_path, compiled_path):
+        if os.path.exists(path):
+            os.remove(path)
+    return all_passed
+
+
+def _resolve(levels, container, tag, attrs, default):
+    """按层级（直接格式、样式链、文档默认值）取属性组的有效值"""
+    for level in levels:
+        props = level.find(qn(container)) if level is not None else None
+        child = props.find(qn(tag)) if props is not None else None
+        if child is None:
+            continue
+        values = {attr: child.get(qn(attr)) for attr in attrs if child.get(qn(attr)) is not None}
+        if values or tag == 'w:b':
+            return values
+    return default
+
+
+def effective_formatting(path):
+    """解析样式继承链，返回各段落、run 与 INHERITING_STYLES 中样式的有效格式"""
+    doc = Document(path)
+    root = doc.styles.element
+    by_id = {style.get(qn('w:styleId')): style for style in root.findall(qn('w:style'))}
+    defaults = root.find(qn('w:docDefaults'))
+    default_levels = {'w:pPr': defaults.find(qn('w:pPrDefault')), 'w:rPr': defaults.find(qn('w:rPrDefault'))}
+
+    def chain(style_id):
+        styles = []
+        while style_id in by_id and by_id[style_id] not in styles:
+            styles.append(by_id[style_id])
+            based_on = by_id[style_id].find(qn('w:basedOn'))
+            style_id = based_on.get(qn('w:val')) if based_on is not None else None
+        return styles
+
+    def resolve(levels, container):
+        return [_resolve(levels + [default_levels[container]], c, tag, attrs, default)
+                for (c, tag), groups in INHERITED_GROUPS.items() if c == container
+                for attrs, default in groups]
+
+    result = []
+    for para in doc.paragraphs:
+        styles = chain(para.style.style_id)
+        result.append(resolve([para._p] + styles, 'w:pPr'))
+        result.extend(resolve([r] + styles, 'w:rPr') for r in para._p.findall(qn('w:r')))
+    for style_id in INHERITING_STYLES:
+        styles = chain(style_id)
+        result.append((style_id, resolve(styles, 'w:pPr'), resolve(styles, 'w:rPr')))
+    return result
+
+
+def verify_styles_mode():
+    input_path = "temp_input_styles_mode.docx"
+    direct_path = "temp_output_direct.docx"
+    styles_path = "temp_output_styles.docx"
+
+    # 样式模式会去掉 run 上的主题字体（有意与直接格式模式不同），对比时不使用带主题字体的段落
+    paragraph_count = build_input(input_path, [xml for xml in PARAGRAPH_XML if 'Theme' not in xml])
+    mappings = {str(i): ("heading1" if i % 2 else "body") for i in range(paragraph_count)}
+
+    all_passed = True
+    for name, profile in STYLES_MODE_PROFILES.items():
+        direct = format_document(input_path, profile, direct_path, mappings)
+        styled = format_document(input_path, profile, styles_path, mappings, options={"formatMode": "styles"})
+        if not (direct["success"] and styled["success"]):
+            print(f"✗ 样式模式 {name}: 格式化失败 {direct.get('error')} / {styled.get('error')}")
+            all_passed = False
+            continue
+        if effective_formatting(direct_path) == effective_formatting(styles_path):
+            print(f"✓ 样式模式 {name}: 段落、run 与派生样式的有效格式与直接格式模式一致")
+        else:
+            print(f"✗ 样式模式 {name}: 有效格式与直接格式模式不一致")
+            all_passed = False
+
+    for path in (input_path, direct_path, styles_path):
+        if os.path.exists(path):
+            os.remove(path)
+    return all_passed
+
+
+if __name__ == "__main__":
+    passed = verify_style_plan()
+    passed = verify_styles_mode() and passed
+    sys.exit(0 if passed else 1)
@@ -0,0 +1,177 @@
+"""
+常驻格式化进程（serve 模式）
+在一个长期存活的解释器中处理请求，避免每次点击都重新启动 PyInstaller 进程、重新导入 python-docx/lxml。
+
+协议：标准输入/输出上的按行分隔 JSON（NDJSON），每行一个 JSON-RPC 2.0 风格的消息。
+
+请求:
+    {"jsonrpc": "2.0", "id": 1, "method": "scan_headings", "params": {"input_path": "...", "base_font_size": 16}}
+
+响应（与请求 id 对应）:
+    {"jsonrpc": "2.0", "id": 1, "result": {...}}
+    {"jsonrpc": "2.0", "id": 1, "error": {"code": -32602, "message": "..."}}
+
+事件（由进程主动发出）:
+    {"event": "ready", "pid": 1234}
+    {"event": "recycle", "reason": "max_jobs" | "max_rss", "jobs": 200, "rssMb": 812.5}
+    {"event": "record", "id": 1, "data": {...}}   处理请求 1 的过程中产生的一条记录（如流式扫描、
+                                                    params.progress 为 true 时的进度事件），先于该请求的响应
+
+收到 recycle 事件后进程会正常退出，调用方应重新启动一个新的 worker。
+"""
+import contextlib
+import gc
+import json
+import os
+import sys
+import traceback
+from typing import Callable, Dict, Optional
+
+from procinfo import current_rss_mb
+
+# JSON-RPC 2.0 标准错误码
+PARSE_ERROR = -32700
+INVALID_REQUEST = -32600
+METHOD_NOT_FOUND = -32601
+INVALID_PARAMS = -32602
+INTERNAL_ERROR = -32603
+
+DEFAULT_MAX_JOBS = 200
+DEFAULT_MAX_RSS_MB = 1024
+
+
+class InvalidParams(Exception):
+    """请求参数缺失或不合法"""
+
+
+def require_params(params: Dict, *names: str) -> None:
+    """检查必填参数，缺失时抛出 InvalidParams"""
+    missing = [name for name in names if params.get(name) in (None, '')]
+    if missing:
+        raise InvalidParams(f"缺少必要参数: {', '.join(missing)}")
+
+
+class FormatterWorker:
+    """
+    NDJSON 请求循环
+
+    Args:
+        handlers: {方法名: 处理函数}，处理函数接收 params 字典并返回可 JSON 序列化的结果；
+                  带有 streaming = True 属性的处理函数额外接收 notify 回调，每次调用发出一个 record 事件
+        max_jobs: 处理多少个任务后主动回收进程（ping/shutdown 不计入）
+        max_rss_mb: 任务结束后常驻内存超过该值（MB）时主动回收进程
+    """
+
+    def __init__(self, handlers: Dict[str, Callable[[Dict], Dict]],
+                 max_jobs: int = DEFAULT_MAX_JOBS, max_rss_mb: float = DEFAULT_MAX_RSS_MB,
+                 stdin=None, stdout=None):
+        self.handlers = handlers
+        self.max_jobs = max_jobs
+        self.max_rss_mb = max_rss_mb
+        self.stdin = stdin if stdin is not None else sys.stdin
+        self.stdout = stdout if stdout is not None else sys.stdout
+        self.jobs = 0
+        self._running = True
+
+    def _write(self, message: Dict) -> None:
+        self.stdout.write(json.dumps(message, ensure_ascii=False) + '\n')
+        self.stdout.flush()
+
+    def _respond(self, request_id, result=None, error_code: Optional[int] = None, error_message: str = '') -> None:
+        message = {"jsonrpc": "2.0", "id": request_id}
+        if error_code is None:
+            message["result"] = result
+        else:
+            message["error"] = {"code": error_code, "message": error_message}
+        self._write(message)
+
+    def _builtin(self, method: str, params: Dict):
+        """内置方法：ping / shutdown"""
+        if method == 'ping':
+            return {"pong": True, "pid": os.getpid(), "jobs": self.jobs, "rssMb": current_rss_mb()}
+        if method == 'shutdown':
+            self._running = False
+            return {"shutdown": True, "jobs": self.jobs}
+        return None
+
+    def handle_line(self, line: str) -> None:
+        """处理一行请求；任何异常都只影响当前请求"""
+        try:
+            request = json.loads(line)
+        except ValueError as e:
+            self._respond(None, error_code=PARSE_ERROR, error_message=f"JSON 解析失败: {e}")
+            return
+
+        if not isinstance(request, dict) or not isinstance(request.get('method'), str):
+            request_id = request.get('id') if isinstance(request, dict) else None
+            self._respond(request_id, error_code=INVALID_REQUEST, error_message="请求缺少 method 字段")
+            return
+
+        request_id = request.get('id')
+        method = request['method']
+        params = request.get('params') or {}
+        if not isinstance(params, dict):
+            self._respond(request_id, error_code=INVALID_PARAMS, error_message="params 必须是对象")
+            return
+
+        builtin_result = self._builtin(method, params)
+        if builtin_result is not None:
+            self._respond(request_id, builtin_result)
+            return
+
+        handler = self.handlers.get(method)
+        if handler is None:
+            self._respond(request_id, error_code=METHOD_NOT_FOUND, error_message=f"未知命令: {method}")
+            return
+
+        self.jobs += 1
+        try:
+            # 处理函数中的 print 一律转到 stderr，保证 stdout 只包含协议消息
+            with contextlib.redirect_stdout(sys.stderr):
+                if getattr(handler, 'streaming', False):
+                    result = handler(params, lambda data: self._write({"event": "record", "id": request_id, "data": data}))
+                else:
+                    result = handler(params)
+        except InvalidParams as e:
+            self._respond(request_id, error_code=INVALID_PARAMS, error_message=str(e))
+        except Exception as e:
+            traceback.print_exc(file=sys.stderr)
+            self._respond(request_id, error_code=INTERNAL_ERROR, error_message=str(e))
+        else:
+            self._respond(request_id, result)
+        finally:
+            gc.collect()
+
+    def _recycle_reason(self) -> Optional[str]:
+        """判断是否需要回收进程"""
+        if self.max_jobs and self.jobs >= self.max_jobs:
+            return 'max_jobs'
+        if self.max_rss_mb:
+            rss = current_rss_mb()
+            if rss is not None and rss > self.max_rss_mb:
+                return 'max_rss'
+        return None
+
+    def serve(self) -> str:
+        """
+        运行请求循环，直到 shutdown、stdin 关闭或触发回收
+
+        Returns:
+            退出原因: 'shutdown' | 'eof' | 'max_jobs' | 'max_rss'
+        """
+        self._write({"event": "ready", "pid": os.getpid()})
+        while self._running:
+            line = self.stdin.readline()
+            if not line:
+                return 'eof'
+            line = line.strip()
+            if not line:
+                continue
+            jobs_before = self.jobs
+            self.handle_line(line)
+            if self.jobs != jobs_before:
+                reason = self._recycle_reason()
+                if reason:
+                    self._write({"event": "recycle", "reason": reason, "jobs": self.jobs, "rssMb": current_rss_mb()})
+                    return reason
+        return 'shutdown'
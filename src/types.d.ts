@@ -4,7 +4,7 @@ declare global {
   interface Window {
     electronAPI: {
       openFile: () => Promise<string | null>
-      scanHeadings: (inputPath: string, baseFontSize?: number) => Promise<{
+      scanHeadings: (inputPath: string, baseFontSize?: number, page?: { offset?: number; limit?: number }) => Promise<{
         success: boolean
         structure?: Array<{
           index: number
@@ -12,8 +12,13 @@ declare global {
           style: string
           suggested_key: string
         }>
+        total?: number
+        offset?: number
+        limit?: number | null
+        hasMore?: boolean
         error?: string
       }>
+      onScanRecord: (callback: (record: { index: number; text: string; style: string; suggested_key: string }) => void) => () => void
       formatDocument: (inputPath: string, payload: any) => Promise<{
         success: boolean
         message: string